@@ -1,27 +1,109 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, send_file, session
+import time
+IMPORT_STARTED = time.perf_counter()  # For the startup timing report
+
+from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, send_file, session, Response, g
 import re
 import json
 import os
-import pandas as pd
+import numpy as np
 import traceback
 from werkzeug.utils import secure_filename
+from werkzeug.security import safe_join
 import io
 import hashlib
 import secrets
+import threading
+import sys
+import bisect
+import itertools
+import mmap
+import multiprocessing
+import struct
+import tempfile
+import sqlite3
+import queue
+import csv
+import gzip
+import click
+from collections import OrderedDict, Counter
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+try:
+    import fcntl
+except ImportError:  # Windows: data writers are only serialized within a process
+    fcntl = None
+try:
+    import brotli
+except ImportError:  # Responses are only gzip-compressed
+    brotli = None
 
 app = Flask(__name__)
 app.secret_key = 'your-secret-key-here-change-this-in-production'
 
 # Configuration
 UPLOAD_FOLDER = 'uploads'
-ALLOWED_EXTENSIONS = {'xlsx', 'xls'}
-DATA_FILE = 'colleges_data.json'
+ALLOWED_EXTENSIONS = {'xlsx', 'xls', 'csv', 'parquet'}
+DATA_FILE = 'colleges_data.json'  # JSON import/export copy of the data
+SNAPSHOT_FILE = 'colleges_data.snapshot'  # Binary snapshot the app loads and saves
+SQLITE_FILE = 'colleges_data.db'  # Used instead of the snapshot when STORAGE_BACKEND is 'sqlite'
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'snapshot')  # 'snapshot' or 'sqlite'
+STORAGE_LOCK_FILE = 'colleges_data.lock'  # Serializes data writers across worker processes
+SQLITE_POOL_SIZE = 4  # Connections per worker for the sqlite backend
 ADMIN_CREDENTIALS_FILE = 'admin_credentials.json'
+SEARCH_CACHE_SIZE = 2048  # Max cached /search responses
+SEARCH_CACHE_TTL = 600  # Seconds before a cached response expires
+COMPRESS_MIN_BYTES = 512  # Cached responses smaller than this are sent uncompressed
+MAX_BATCH_QUERIES = 1000  # Max queries accepted by /search/batch in one request
+MAX_FILTER_VALUES = 100  # Max values in one multi-value /search filter
+MAX_TEXT_QUERY = 100  # Max length of a college name/place query
+DEFAULT_SUGGEST_LIMIT = 10  # Suggestions returned by /colleges/suggest
+MAX_SUGGEST_LIMIT = 50
+MIN_TRIGRAM_SIMILARITY = 0.5  # Share of a query's trigrams a fuzzy match must contain
+SEARCH_SORTS = ("distance", "probability", "score")  # /search orders: closest cutoff, admission chance or preference score
+MIN_ADMISSION_SPREAD = 0.1  # Floor on the spread of predicted log closing ranks (about 10%)
+PROBABILITY_SCALE = 1000000  # Probabilities and scores are sorted and paged as integers at this scale
+DEFAULT_SEARCH_LIMIT = 50  # Page size when a cursor is given without a limit
+MAX_SEARCH_LIMIT = 1000  # Largest page /search will return in one response
+DEFAULT_BROWSE_LIMIT = 50  # Page size of the admin browse API
+MAX_BROWSE_LIMIT = 500
+EXPORT_CHUNK_ROWS = 500  # Rows serialized per chunk of a streamed export
+EXPORT_CHUNK_BYTES = 1 << 16  # Bytes per chunk when streaming an xlsx export from disk
+INGEST_CHUNK_ROWS = 5000  # Rows per chunk when streaming an upload
+JOB_FOLDER = 'jobs'  # Upload job records, one JSON file per job, shared by every worker process
+MAX_INGEST_JOBS = 50  # Finished upload jobs kept for /admin/jobs
+MAX_VALIDATION_ISSUES = 10000  # Issues kept per upload validation report; later ones are only counted
+MAX_JOB_ISSUES = 20  # Issues shown with an upload job; the rest are in its report workbook
+MAX_SIMULATION_RUNS = 64  # Monte-Carlo runs one /admin/simulate request may ask for
+MAX_SIMULATION_PREFERENCES = 100  # Preferences per candidate the simulator reads
+SIMULATION_WORKERS = os.cpu_count() or 1  # Processes running simulation runs in parallel
+SHARD_FOLDER = 'shards'  # Pre-rendered /search answers written by `flask export-shards`
+SHARD_URL = os.environ.get('SHARD_URL', '/shards')  # Where the front end fetches shards, e.g. a CDN
+SHARD_MIN_BUCKET = 1000  # Ranks covered by the narrowest shard
+SHARD_BUCKET_SHARE = 0.05  # Past 20k, shards cover this share of their first rank
+SHARD_WORKERS = os.cpu_count() or 1  # Processes rendering shards in parallel
+SHARD_FORMAT = 1  # Bump when the shard layout changes, so every shard is rendered again
+# Share of each branch's seats per category in the allocation simulator.
+# OC seats are open to every category; GIRLS_SEAT_SHARE of every category's
+# seats is reserved for girls.
+SEAT_QUOTAS = {"OC": 0.40, "BC-A": 0.07, "BC-B": 0.10, "BC-C": 0.01, "BC-D": 0.07, "BC-E": 0.04,
+               "SC": 0.15, "ST": 0.06, "EWS": 0.10}
+GIRLS_SEAT_SHARE = 1 / 3
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')  # Bearer token that may read /admin/metrics without a session
+PROFILE_SLOW_REQUESTS = os.environ.get('PROFILE_SLOW_REQUESTS') == '1'  # Sample request stacks (off by default)
+PROFILE_INTERVAL = 0.005  # Seconds between stack samples
+PROFILE_MIN_SECONDS = 0.25  # Only requests at least this slow are saved
+PROFILE_KEEP = 20  # Slowest request profiles kept on disk
+PROFILE_FOLDER = 'profiles'
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+app.config['SEARCH_CACHE_SIZE'] = SEARCH_CACHE_SIZE
+app.config['SEARCH_CACHE_TTL'] = SEARCH_CACHE_TTL
+app.config['STORAGE_BACKEND'] = STORAGE_BACKEND
 
 # Create uploads directory if not exists
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+os.makedirs(JOB_FOLDER, exist_ok=True)
 
 # Default admin credentials (change these in production)
 DEFAULT_ADMIN_USERNAME = "admin"
@@ -80,50 +162,21 @@ def load_colleges_data():
         print(f"Error loading data: {e}")
         return {"institutes": []}
 
-def save_colleges_data(data):
+def save_colleges_data(data, table=None, generation=0):
+    """
+    Persist data to the configured storage. table is the cutoff table
+    already built for data, if the caller has one; otherwise it is built here.
+    """
     try:
-        with open(DATA_FILE, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        if table is None:
+            table = build_cutoff_table([row for institute in data["institutes"]
+                                        for row in flatten_institute(institute)])
+        storage.save(data["institutes"], table, generation)
         return True
     except Exception as e:
         print(f"Error saving data: {e}")
         return False
 
-# Initialize data
-colleges_data = load_colleges_data()
-admin_credentials = load_admin_credentials()
-
-# Process data with error handling
-def process_colleges_data():
-    colleges = []
-    try:
-        for institute in colleges_data["institutes"]:
-            for branch in institute.get("branches", []):
-                college = {
-                    "name": institute["name"],
-                    "inst_code": institute["inst_code"],
-                    "place": institute["place"],
-                    "branch": branch["name"],
-                    "branch_code": branch["branch_code"],
-                    "tuition_fee": branch.get("tuition_fee", "Not Available"),
-                    "affiliated_to": branch.get("affiliated_to", "Not Specified"),
-                    "cutoffs": branch.get("cutoffs", {}),
-                    "college_type": institute["college_type"],
-                    "co_ed": institute["co_ed"],
-                    "year_established": institute.get("year_established", "N/A"),
-                    "website": institute.get("website", ""),
-                    "facilities": ", ".join(institute.get("facilities", [])),
-                    "seats": branch.get("seats", "N/A"),
-                    "duration": branch.get("duration", "N/A")
-                }
-                colleges.append(college)
-        return colleges
-    except Exception as e:
-        print(f"Error processing college data: {e}")
-        return []
-
-colleges = process_colleges_data()
-
 # Categories mapping
 categories = {
     "OC": ["OC_BOYS", "OC_GIRLS"],
@@ -137,18 +190,987 @@ categories = {
     "EWS": ["EWS_GEN_OU", "EWS_GIRLS_OU"]
 }
 
+# Flat list of cutoff keys, in the same order search() walks the categories
+CUTOFF_KEYS = [key for keys in categories.values() for key in keys]
+CUTOFF_CATEGORIES = [category for category, keys in categories.items() for _ in keys]
+
+# Marks a missing or unparseable cutoff in the cutoff matrix. Rank windows
+# always start at 1, so this value can never fall inside one.
+MISSING_CUTOFF = -1
+INT32_MIN, INT32_MAX = int(np.iinfo(np.int32).min), int(np.iinfo(np.int32).max)
+
+# Serializes writers (upload jobs, clear) that replace the live data.
+# Searches never take it: they read whole snapshots that are swapped in
+# with a single assignment.
+data_lock = threading.Lock()
+colleges_data_lock = threading.Lock()
+admin_credentials = None  # Loaded by warm_up()
+
+# Process data with error handling
+def flatten_institute(institute):
+    """Return the flattened search rows (one per branch) for an institute"""
+    return [{
+        "name": institute["name"],
+        "inst_code": institute["inst_code"],
+        "place": institute["place"],
+        "dist_code": institute.get("dist_code", ""),
+        "branch": branch["name"],
+        "branch_code": branch["branch_code"],
+        "tuition_fee": branch.get("tuition_fee", "Not Available"),
+        "affiliated_to": branch.get("affiliated_to", "Not Specified"),
+        "cutoffs": branch.get("cutoffs", {}),
+        "history": branch.get("history", []),
+        "college_type": institute["college_type"],
+        "co_ed": institute["co_ed"],
+        "year_established": institute.get("year_established", "N/A"),
+        "website": institute.get("website", ""),
+        "facilities": ", ".join(institute.get("facilities", [])),
+        "seats": branch.get("seats", "N/A"),
+        "duration": branch.get("duration", "N/A")
+    } for branch in institute.get("branches", [])]
+
+def parse_cutoff(value):
+    """Convert a raw cutoff value to an int, or MISSING_CUTOFF if it is unusable"""
+    try:
+        cutoff_rank = int(value)
+    except (ValueError, TypeError, OverflowError):
+        return MISSING_CUTOFF
+    if not INT32_MIN <= cutoff_rank <= INT32_MAX:
+        return MISSING_CUTOFF
+    return cutoff_rank
+
+def encode_column(values):
+    """Encode a list of strings as (int32 codes, {value: code})"""
+    index = {}
+    codes = np.fromiter((index.setdefault(value, len(index)) for value in values),
+                        dtype=np.int32, count=len(values))
+    return codes, index
+
+def build_cutoff_matrix(colleges):
+    """Parse the cutoffs of flattened rows into an int32 rows x CUTOFF_KEYS matrix"""
+    ranks = np.full((len(colleges), len(CUTOFF_KEYS)), MISSING_CUTOFF, dtype=np.int32)
+    for row, college in enumerate(colleges):
+        cutoffs = college.get("cutoffs") or {}
+        for col, cutoff_key in enumerate(CUTOFF_KEYS):
+            if cutoff_key in cutoffs:
+                ranks[row, col] = parse_cutoff(cutoffs[cutoff_key])
+    return ranks
+
+def build_cutoff_table(colleges):
+    """
+    Build the columnar form of the flattened colleges list used by search():
+    an int32 matrix of rows x CUTOFF_KEYS, categorical codes for the branch
+    and college_type filters, and sorted rank indexes over the matrix
+    """
+    branch_codes, branch_index = encode_column([college["branch"] for college in colleges])
+    type_codes, type_index = encode_column([college["college_type"] for college in colleges])
+    return assemble_cutoff_table(colleges, build_cutoff_matrix(colleges),
+                                 branch_codes, branch_index, type_codes, type_index)
+
+def assemble_cutoff_table(colleges, ranks, branch_codes, branch_index, type_codes, type_index, rank_index=None):
+    """Wrap the columns of a cutoff table and build its rank indexes (unless given)"""
+    if rank_index is None:
+        rank_index = {
+            "all": build_rank_index(ranks),
+            "branch": build_rank_index(ranks, branch_codes),
+            "type": build_rank_index(ranks, type_codes),
+            "branch_type": build_rank_index(ranks, branch_codes * len(type_index) + type_codes)
+        }
+    return {
+        "colleges": colleges,
+        "ranks": ranks,
+        "branch_codes": branch_codes,
+        "branch_index": branch_index,
+        "type_codes": type_codes,
+        "type_index": type_index,
+        "rank_index": rank_index
+    }
+
+def patch_cutoff_table(table, old_institutes, new_institutes):
+    """
+    Build the cutoff table for new_institutes from the one built for
+    old_institutes. Institutes carried over as the same objects keep their
+    rows, matrix rows, codes and rank index entries; only new or changed
+    institutes are flattened, parsed and merged into the sorted indexes.
+    The columns are still copied once, and if a replace upload reordered
+    the institutes the indexes are re-sorted instead.
+    """
+    old_spans = {}
+    position = 0
+    for institute in old_institutes:
+        count = len(institute.get("branches", []))
+        old_spans[id(institute)] = (position, position + count)
+        position += count
+    if position != len(table["colleges"]):
+        # The table does not line up with old_institutes; start over
+        return build_cutoff_table([row for institute in new_institutes
+                                   for row in flatten_institute(institute)])
+
+    # A snapshot's rows are built on access, which costs more than
+    # flattening the institute again
+    reuse_rows = isinstance(table["colleges"], list)
+    colleges, sources = [], []
+    for institute in new_institutes:
+        span = old_spans.get(id(institute))
+        if span is not None:
+            colleges.extend(table["colleges"][span[0]:span[1]] if reuse_rows else flatten_institute(institute))
+            sources.append(np.arange(span[0], span[1], dtype=np.int64))
+        else:
+            rows = flatten_institute(institute)
+            colleges.extend(rows)
+            sources.append(np.full(len(rows), -1, dtype=np.int64))
+    sources = np.concatenate(sources) if sources else np.empty(0, dtype=np.int64)
+    fresh = np.flatnonzero(sources < 0)
+    kept = np.flatnonzero(sources >= 0)
+
+    ranks = np.full((len(colleges), len(CUTOFF_KEYS)), MISSING_CUTOFF, dtype=np.int32)
+    ranks[kept] = table["ranks"][sources[kept]]
+    branch_codes = np.zeros(len(colleges), dtype=np.int32)
+    branch_codes[kept] = table["branch_codes"][sources[kept]]
+    type_codes = np.zeros(len(colleges), dtype=np.int32)
+    type_codes[kept] = table["type_codes"][sources[kept]]
+
+    branch_index = dict(table["branch_index"])
+    type_index = dict(table["type_index"])
+    fresh_rows = [colleges[row] for row in fresh.tolist()]
+    if fresh_rows:
+        ranks[fresh] = build_cutoff_matrix(fresh_rows)
+        branch_codes[fresh] = [branch_index.setdefault(college["branch"], len(branch_index))
+                               for college in fresh_rows]
+        type_codes[fresh] = [type_index.setdefault(college["college_type"], len(type_index))
+                             for college in fresh_rows]
+
+    row_map = np.full(len(table["colleges"]), -1, dtype=np.int64)
+    row_map[sources[kept]] = kept
+    if np.any(np.diff(row_map[row_map >= 0]) <= 0):
+        # Carried-over institutes changed order; re-sort the indexes
+        return assemble_cutoff_table(colleges, ranks, branch_codes, branch_index, type_codes, type_index)
+    old_index = table["rank_index"]
+    branch_type_codes = branch_codes * len(type_index) + type_codes
+    rank_index = {
+        "all": patch_rank_index(old_index["all"], row_map, ranks, fresh),
+        "branch": patch_rank_index(old_index["branch"], row_map, ranks, fresh, branch_codes),
+        "type": patch_rank_index(old_index["type"], row_map, ranks, fresh, type_codes),
+        # A new college type renumbers every (branch, type) group
+        "branch_type": (patch_rank_index(old_index["branch_type"], row_map, ranks, fresh, branch_type_codes)
+                        if len(type_index) == len(table["type_index"])
+                        else build_rank_index(ranks, branch_type_codes))
+    }
+    return assemble_cutoff_table(colleges, ranks, branch_codes, branch_index, type_codes, type_index,
+                                 rank_index)
+
+def build_rank_index(ranks, group_codes=None):
+    """
+    Build sorted (cutoff_rank, row) runs, one per (cutoff column, group code),
+    stored back to back in two flat arrays. offsets maps each
+    (column, group) to its [start, end) slice, so a rank window is answered
+    by bisecting a single run.
+    """
+    rows, cols = np.nonzero(ranks != MISSING_CUTOFF)
+    values = ranks[rows, cols]
+    groups = group_codes[rows] if group_codes is not None else np.zeros(len(rows), dtype=np.int32)
+
+    # Sort on one packed uint64 key, (col, group) above the offset cutoff
+    # rank; the stable sort keeps equal ranks in row order
+    run_ids = cols.astype(np.uint64) * np.uint64(int(groups.max(initial=0)) + 1) + groups.astype(np.uint64)
+    keys = (run_ids << np.uint64(32)) | (values.astype(np.int64) - INT32_MIN).astype(np.uint64)
+    order = np.argsort(keys, kind="stable")
+    rows, cols, values, groups = rows[order], cols[order], values[order], groups[order]
+
+    return {"ranks": values, "rows": rows.astype(np.int64), "offsets": run_offsets(cols, groups)}
+
+def run_offsets(cols, groups):
+    """Map each (column, group) run of sorted index entries to its [start, end) slice"""
+    offsets = {}
+    if len(cols):
+        starts = np.flatnonzero((np.diff(cols) != 0) | (np.diff(groups) != 0)) + 1
+        starts = np.concatenate(([0], starts))
+        ends = np.concatenate((starts[1:], [len(cols)]))
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            offsets[(int(cols[start]), int(groups[start]))] = (start, end)
+    return offsets
+
+def patch_rank_index(index, row_map, ranks, fresh, group_codes=None):
+    """
+    Patch a build_rank_index() index after its rows were renumbered.
+    row_map maps each old row to its new row (-1 once dropped) and keeps the
+    surviving rows in order; fresh lists the new rows of ranks. Surviving
+    entries keep their order, and only the fresh rows' entries are sorted
+    and merged into their runs.
+    """
+    runs = sorted(index["offsets"].items(), key=lambda item: item[1])
+    run_keys = np.array([key for key, _ in runs], dtype=np.int64).reshape(-1, 2)
+    lengths = np.array([end - start for _, (start, end) in runs], dtype=np.int64)
+    rows = row_map[index["rows"]]
+    keep = rows >= 0
+    rows, values = rows[keep], index["ranks"][keep]
+    cols = np.repeat(run_keys[:, 0], lengths)[keep]
+    groups = np.repeat(run_keys[:, 1], lengths)[keep]
+
+    fresh_rows, fresh_cols = np.nonzero(ranks[fresh] != MISSING_CUTOFF)
+    fresh_rows = fresh[fresh_rows]
+    fresh_values = ranks[fresh_rows, fresh_cols]
+    fresh_groups = (group_codes[fresh_rows] if group_codes is not None
+                    else np.zeros(len(fresh_rows), dtype=np.int64)).astype(np.int64)
+    order = np.lexsort((fresh_rows, fresh_values, fresh_groups, fresh_cols))
+    fresh_rows, fresh_cols = fresh_rows[order], fresh_cols[order].astype(np.int64)
+    fresh_values, fresh_groups = fresh_values[order], fresh_groups[order]
+
+    # Bisect the fresh entries in on the packed key build_rank_index() sorts
+    # on; within a run of equal ranks they go in row order
+    width = np.uint64(max(int(groups.max(initial=0)), int(fresh_groups.max(initial=0))) + 1)
+    def packed(cols, groups, values):
+        run_ids = cols.astype(np.uint64) * width + groups.astype(np.uint64)
+        return (run_ids << np.uint64(32)) | (values.astype(np.int64) - INT32_MIN).astype(np.uint64)
+    keys, fresh_keys = packed(cols, groups, values), packed(fresh_cols, fresh_groups, fresh_values)
+    positions = np.searchsorted(keys, fresh_keys, side="left")
+    tie_ends = np.searchsorted(keys, fresh_keys, side="right")
+    for i in np.flatnonzero(tie_ends > positions).tolist():
+        positions[i] += np.searchsorted(rows[positions[i]:tie_ends[i]], fresh_rows[i])
+
+    return {
+        "ranks": np.insert(values, positions, fresh_values),
+        "rows": np.insert(rows, positions, fresh_rows),
+        "offsets": run_offsets(np.insert(cols, positions, fresh_cols),
+                               np.insert(groups, positions, fresh_groups))
+    }
+
+def rank_index_range(index, col, group, lower_bound, upper_bound):
+    """Return the [start, end) slice of a rank index run inside the rank window"""
+    start, end = index["offsets"].get((col, group), (0, 0))
+    if start == end:
+        return start, end
+    run = index["ranks"][start:end]
+    return (start + int(np.searchsorted(run, lower_bound, side="left")),
+            start + int(np.searchsorted(run, upper_bound, side="right")))
+
+# Binary snapshot format (all integers little-endian):
+#
+#   magic (8 bytes) | version (u32) | header length (u32) | header (JSON)
+#   followed by 64-byte aligned, fixed-width column blocks
+#
+# The header lists each column's dtype, shape and offset, so a loader can
+# np.frombuffer() every column straight out of a read-only mmap. Rows are
+# the flattened branches, in institute order, and the sorted rank indexes
+# are stored as well so loading does no sorting. Every non-numeric field is
+# stored as an int32 id into a deduplicated value table of JSON-encoded
+# values (value_offsets/value_bytes); ABSENT_VALUE marks a key the source
+# dict did not have.
+#
+# The header also carries a generation number, bumped by every write. Each
+# worker process maps the same file, so the pages are shared through the OS
+# page cache, and remaps it when another worker publishes a new one.
+SNAPSHOT_MAGIC = b"EAPSNAP\0"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_ALIGNMENT = 64
+ABSENT_VALUE = -1
+CUTOFFS_FROM_MATRIX = -1  # Branch cutoffs are exactly what the matrix holds
+CUTOFFS_ABSENT = -2  # Branch had no "cutoffs" key
+
+INSTITUTE_FIELDS = ("inst_code", "name", "place", "dist_code", "co_ed", "college_type",
+                    "year_established", "website", "facilities")
+BRANCH_FIELDS = ("branch_code", "name", "tuition_fee", "affiliated_to", "seats", "duration")
+
+def write_snapshot(path, institutes, table, generation=0):
+    """Atomically write institutes and their cutoff table to a snapshot file"""
+    value_ids = {}
+
+    def value_id(value):
+        text = json.dumps(value, ensure_ascii=False)
+        return value_ids.setdefault(text, len(value_ids))
+
+    def field_ids(source, fields):
+        return [value_id(source[field]) if field in source else ABSENT_VALUE for field in fields]
+
+    def extra_id(source, known):
+        extra = {key: value for key, value in source.items() if key not in known}
+        return value_id(extra) if extra else ABSENT_VALUE
+
+    ranks = table["ranks"]
+    institute_columns, branch_columns = [], []
+    row_institute, branch_start = [], [0]
+    institute_known = set(INSTITUTE_FIELDS) | {"branches"}
+    branch_known = set(BRANCH_FIELDS) | {"cutoffs"}
+    row = 0
+    for position, institute in enumerate(institutes):
+        institute_columns.append(field_ids(institute, INSTITUTE_FIELDS) + [extra_id(institute, institute_known)])
+        for branch in institute.get("branches", []):
+            if "cutoffs" not in branch:
+                cutoffs_id = CUTOFFS_ABSENT
+            elif cutoffs_match_matrix(branch["cutoffs"], ranks[row]):
+                cutoffs_id = CUTOFFS_FROM_MATRIX
+            else:
+                cutoffs_id = value_id(branch["cutoffs"])
+            branch_columns.append(field_ids(branch, BRANCH_FIELDS) +
+                                  [extra_id(branch, branch_known), cutoffs_id])
+            row_institute.append(position)
+            row += 1
+        branch_start.append(row)
+    if row != len(ranks):
+        raise ValueError("Cutoff table does not match the institutes being saved")
+
+    value_bytes = [text.encode('utf-8') for text in value_ids]
+    value_offsets = np.zeros(len(value_bytes) + 1, dtype='<i8')
+    np.cumsum([len(blob) for blob in value_bytes], out=value_offsets[1:])
+
+    columns = {
+        "ranks": np.ascontiguousarray(ranks, dtype='<i4'),
+        "branch_codes": np.asarray(table["branch_codes"], dtype='<i4'),
+        "type_codes": np.asarray(table["type_codes"], dtype='<i4'),
+        "row_institute": np.asarray(row_institute, dtype='<i4'),
+        "branch_fields": np.asarray(branch_columns, dtype='<i4').reshape(row, len(BRANCH_FIELDS) + 2),
+        "institute_fields": np.asarray(institute_columns, dtype='<i4').reshape(len(institutes), len(INSTITUTE_FIELDS) + 1),
+        "branch_start": np.asarray(branch_start, dtype='<i8'),
+        "value_offsets": value_offsets,
+        "value_bytes": np.frombuffer(b"".join(value_bytes), dtype=np.uint8)
+    }
+    history_years, history_ranks = table_history(table)
+    if history_years:
+        columns["history_ranks"] = np.ascontiguousarray(history_ranks, dtype='<i4')
+    for name, index in table["rank_index"].items():
+        columns[f"rank_index.{name}.ranks"] = np.asarray(index["ranks"], dtype='<i4')
+        columns[f"rank_index.{name}.rows"] = np.asarray(index["rows"], dtype='<i8')
+        columns[f"rank_index.{name}.runs"] = np.asarray(
+            [(col, group, start, end) for (col, group), (start, end) in index["offsets"].items()],
+            dtype='<i8').reshape(-1, 4)
+
+    header = {
+        "generation": generation,
+        "created_at": time.time(),
+        "institutes": len(institutes),
+        "rows": row,
+        "branch_vocab": list(table["branch_index"]),
+        "type_vocab": list(table["type_index"]),
+        "history_years": history_years,
+        "columns": {}
+    }
+    # Column offsets are relative to the data section, which starts at the
+    # first aligned position after the header
+    offset = 0
+    for name, array in columns.items():
+        header["columns"][name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset = align_offset(offset + array.nbytes)
+    header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    data_start = align_offset(len(SNAPSHOT_MAGIC) + 8 + len(header_bytes))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix='.snapshot-', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(SNAPSHOT_MAGIC + struct.pack('<II', SNAPSHOT_VERSION, len(header_bytes)) + header_bytes)
+            for name, array in columns.items():
+                f.write(b"\0" * (data_start + header["columns"][name]["offset"] - f.tell()))
+                f.write(array.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def stat_identity(stat):
+    """What identifies one published version of a file: os.replace() gives it a new inode"""
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+def snapshot_identity(path=SNAPSHOT_FILE):
+    """Identity of the file currently at path, or None if there is none"""
+    try:
+        return stat_identity(os.stat(path))
+    except OSError:
+        return None
+
+@contextmanager
+def storage_write_lock():
+    """Hold the cross-process data writer lock"""
+    if fcntl is None:
+        yield
+        return
+    with open(STORAGE_LOCK_FILE, 'a') as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+def align_offset(offset):
+    return (offset + SNAPSHOT_ALIGNMENT - 1) // SNAPSHOT_ALIGNMENT * SNAPSHOT_ALIGNMENT
+
+def matrix_cutoffs(rank_row):
+    """Cutoffs dict for one cutoff matrix row, skipping missing entries"""
+    return {key: cutoff_rank for key, cutoff_rank in zip(CUTOFF_KEYS, rank_row.tolist())
+            if cutoff_rank != MISSING_CUTOFF}
+
+def cutoffs_match_matrix(cutoffs, rank_row):
+    """Whether matrix_cutoffs(rank_row) rebuilds cutoffs exactly, key order and types included"""
+    return (cutoffs == matrix_cutoffs(rank_row) and
+            all(type(value) is int for value in cutoffs.values()) and
+            list(cutoffs) == [key for key in CUTOFF_KEYS if key in cutoffs])
+
+def read_snapshot(path):
+    """
+    Map a snapshot file read-only and return its header and columns. The
+    arrays are views into the mapping; nothing is copied.
+    """
+    header_start = len(SNAPSHOT_MAGIC) + 8
+    with open(path, 'rb') as f:
+        stat = os.fstat(f.fileno())
+        if stat.st_size < header_start:
+            raise ValueError(f"{path} is not a colleges snapshot")
+        identity = stat_identity(stat)
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if mapping[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+        raise ValueError(f"{path} is not a colleges snapshot")
+    version, header_length = struct.unpack_from('<II', mapping, len(SNAPSHOT_MAGIC))
+    if version != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version {version}")
+    if header_start + header_length > len(mapping):
+        raise ValueError(f"{path} is truncated")
+    header = json.loads(mapping[header_start:header_start + header_length].decode('utf-8'))
+    data_start = align_offset(header_start + header_length)
+
+    columns = {}
+    for name, spec in header["columns"].items():
+        count = int(np.prod(spec["shape"]))
+        if data_start + spec["offset"] + count * np.dtype(spec["dtype"]).itemsize > len(mapping):
+            raise ValueError(f"{path} is truncated")
+        columns[name] = np.frombuffer(mapping, dtype=spec["dtype"], count=count,
+                                      offset=data_start + spec["offset"]).reshape(spec["shape"])
+    return {"path": path, "identity": identity, "mapping": mapping, "header": header, "columns": columns,
+            "values": SnapshotValues(columns["value_offsets"], columns["value_bytes"])}
+
+class SnapshotValues:
+    """Lazily decoded view of a snapshot's value table"""
+
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+        self.scalars = {}
+
+    def __getitem__(self, value_id):
+        value = self.scalars.get(value_id, self)
+        if value is self:
+            start, end = int(self.offsets[value_id]), int(self.offsets[value_id + 1])
+            value = json.loads(self.blob[start:end].tobytes().decode('utf-8'))
+            # Lists and dicts are decoded fresh each time so callers never share them
+            if not isinstance(value, (list, dict)):
+                self.scalars[value_id] = value
+        return value
+
+def snapshot_institute(snapshot, position, with_branches=True):
+    """Rebuild one institute dict from a snapshot"""
+    values = snapshot["values"]
+    fields = snapshot["columns"]["institute_fields"][position].tolist()
+    institute = {field: values[value_id] for field, value_id in zip(INSTITUTE_FIELDS, fields)
+                 if value_id != ABSENT_VALUE}
+    if fields[-1] != ABSENT_VALUE:
+        institute.update(values[fields[-1]])
+    if with_branches:
+        start, end = snapshot["columns"]["branch_start"][position:position + 2].tolist()
+        institute["branches"] = [snapshot_branch(snapshot, row) for row in range(start, end)]
+    return institute
+
+def snapshot_branch(snapshot, row):
+    """Rebuild one branch dict from a snapshot"""
+    values = snapshot["values"]
+    fields = snapshot["columns"]["branch_fields"][row].tolist()
+    branch = {field: values[value_id] for field, value_id in zip(BRANCH_FIELDS, fields)
+              if value_id != ABSENT_VALUE}
+    extra_id, cutoffs_id = fields[-2], fields[-1]
+    if cutoffs_id == CUTOFFS_FROM_MATRIX:
+        branch["cutoffs"] = matrix_cutoffs(snapshot["columns"]["ranks"][row])
+    elif cutoffs_id != CUTOFFS_ABSENT:
+        branch["cutoffs"] = values[cutoffs_id]
+    if extra_id != ABSENT_VALUE:
+        branch.update(values[extra_id])
+    return branch
+
+def snapshot_institutes(snapshot):
+    return [snapshot_institute(snapshot, position) for position in range(snapshot["header"]["institutes"])]
+
+class SnapshotRows:
+    """
+    Read-only, list-like view of the flattened colleges rows in a snapshot.
+    Rows are built on first access and then kept for the life of the
+    mapping, so loading a snapshot does not create one dict per branch up
+    front, and a row that several hits share is built once. Callers must
+    not change the rows they get.
+    """
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.row_institute = snapshot["columns"]["row_institute"]
+        # Filled without a lock: two threads building one row store equal dicts
+        self.rows = [None] * len(self.row_institute)
+
+    def __len__(self):
+        return len(self.row_institute)
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self[row]
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self[position] for position in range(*row.indices(len(self)))]
+        college = self.rows[row]
+        if college is None:
+            if row < 0:
+                row += len(self)
+            institute = snapshot_institute(self.snapshot, int(self.row_institute[row]), with_branches=False)
+            institute["branches"] = [snapshot_branch(self.snapshot, row)]
+            college = self.rows[row] = flatten_institute(institute)[0]
+        return college
+
+def load_snapshot_table(snapshot):
+    """Build the cutoff table straight from a snapshot's columns"""
+    columns = snapshot["columns"]
+    header = snapshot["header"]
+    rank_index = {}
+    for name in ("all", "branch", "type", "branch_type"):
+        runs = columns[f"rank_index.{name}.runs"].tolist()
+        rank_index[name] = {
+            "ranks": columns[f"rank_index.{name}.ranks"],
+            "rows": columns[f"rank_index.{name}.rows"],
+            "offsets": {(col, group): (start, end) for col, group, start, end in runs}
+        }
+    table = assemble_cutoff_table(
+        SnapshotRows(snapshot), columns["ranks"],
+        columns["branch_codes"], {value: code for code, value in enumerate(header["branch_vocab"])},
+        columns["type_codes"], {value: code for code, value in enumerate(header["type_vocab"])},
+        rank_index)
+    table.update(snapshot=snapshot, identity=snapshot["identity"],
+                 generation=snapshot["header"].get("generation", 0))
+    if "history_years" in header:
+        history_years = header["history_years"]
+        table["history"] = (history_years, columns["history_ranks"] if history_years else
+                            np.empty((0,) + columns["ranks"].shape, dtype=np.int32))
+    return table
+
+class SnapshotStorage:
+    """Stores the data as a binary snapshot file, see write_snapshot()"""
+
+    name = 'snapshot'
+
+    def __init__(self, path):
+        self.path = path
+
+    def modified(self):
+        """mtime of the stored data, or None if nothing has been stored"""
+        return os.path.getmtime(self.path) if os.path.exists(self.path) else None
+
+    def identity(self):
+        """Changes whenever any worker stores new data"""
+        return snapshot_identity(self.path)
+
+    def generation(self):
+        return read_snapshot(self.path)["header"].get("generation", 0) if os.path.exists(self.path) else 0
+
+    def load(self):
+        """Return (colleges_data or None, cutoff table) for the stored data"""
+        return None, load_snapshot_table(read_snapshot(self.path))
+
+    def save(self, institutes, table, generation=0):
+        write_snapshot(self.path, institutes, table, generation)
+
+    def published_table(self, table):
+        """The live table for data just saved from table: the new mapping"""
+        return load_snapshot_table(read_snapshot(self.path))
+
+    def counts(self, table):
+        if "snapshot" in table:
+            header = table["snapshot"]["header"]
+            return header["institutes"], header["rows"]
+        institutes = get_colleges_data()["institutes"]
+        return len(institutes), sum(len(institute.get("branches", [])) for institute in institutes)
+
+    def stats(self, table):
+        return {"backend": self.name,
+                "bytes": len(table["snapshot"]["mapping"]) if "snapshot" in table else 0}
+
+# SQLite schema. Every institute and branch keeps its fields as JSON in
+# `data` so they round-trip exactly; the columns searched on are copied out
+# next to it. Branch ids are the flattened row numbers search results are
+# ordered by. cutoffs holds one row per parsed cutoff matrix entry; a
+# branch whose cutoffs dict is exactly those entries (cutoffs_from_table)
+# does not repeat it in `data`.
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS institutes (
+    id INTEGER PRIMARY KEY,
+    inst_code TEXT,
+    name TEXT,
+    college_type TEXT,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS branches (
+    id INTEGER PRIMARY KEY,
+    institute_id INTEGER NOT NULL REFERENCES institutes (id),
+    branch_code TEXT,
+    name TEXT,
+    data TEXT NOT NULL,
+    cutoffs_from_table INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cutoffs (
+    branch_id INTEGER NOT NULL REFERENCES branches (id),
+    col INTEGER NOT NULL,
+    cutoff_key TEXT NOT NULL,
+    rank INTEGER NOT NULL,
+    PRIMARY KEY (branch_id, col)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cutoffs_key_rank ON cutoffs (cutoff_key, rank);
+CREATE INDEX IF NOT EXISTS branches_name ON branches (name);
+CREATE INDEX IF NOT EXISTS branches_institute ON branches (institute_id);
+CREATE INDEX IF NOT EXISTS institutes_college_type ON institutes (college_type);
+"""
+
+class SqlitePool:
+    """
+    Small pool of autocommit SQLite connections in WAL mode, so searches
+    keep reading the last committed data while an upload writes
+    """
+
+    def __init__(self, path, size):
+        self.path = path
+        self.size = size
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.pid = os.getpid()
+        self.idle = queue.LifoQueue()
+        self.created = 0
+
+    def connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SQLITE_SCHEMA)
+        return conn
+
+    @contextmanager
+    def connection(self):
+        with self.lock:
+            # Connections must not be shared with a forked worker
+            if self.pid != os.getpid():
+                self.reset()
+            pool = self.idle
+            create = pool.empty() and self.created < self.size
+            if create:
+                self.created += 1
+        conn = self.connect() if create else pool.get()
+        try:
+            yield conn
+        finally:
+            pool.put(conn)
+
+class SqliteStorage:
+    """
+    Stores the data in normalized institutes/branches/cutoffs tables. The
+    app still keeps a cutoff table in memory for the index page and batch
+    searches, but /search runs as an indexed query against the database.
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, path, pool_size):
+        self.path = path
+        self.pool = SqlitePool(path, pool_size)
+
+    def modified(self):
+        if self.identity() is None:
+            return None
+        return max(os.path.getmtime(path) for path in (self.path, self.path + '-wal') if os.path.exists(path))
+
+    def identity(self):
+        """The stored generation; None until data has been saved"""
+        if not os.path.exists(self.path):
+            return None
+        with self.pool.connection() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        return int(row[0]) if row else None
+
+    def generation(self):
+        return self.identity() or 0
+
+    def load(self):
+        with self.pool.connection() as conn:
+            # One read transaction, so all three tables come from the same commit
+            conn.execute("BEGIN")
+            try:
+                generation = conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+                institutes = [json.loads(data) for (data,) in
+                              conn.execute("SELECT data FROM institutes ORDER BY id")]
+                branches = conn.execute(
+                    "SELECT institute_id, data, cutoffs_from_table FROM branches ORDER BY id").fetchall()
+                cutoffs = np.array(conn.execute("SELECT branch_id, col, rank FROM cutoffs").fetchall(),
+                                   dtype=np.int64).reshape(-1, 3)
+            finally:
+                conn.execute("COMMIT")
+
+        ranks = np.full((len(branches), len(CUTOFF_KEYS)), MISSING_CUTOFF, dtype=np.int32)
+        ranks[cutoffs[:, 0], cutoffs[:, 1]] = cutoffs[:, 2]
+        for institute in institutes:
+            institute["branches"] = []
+        for row, (institute_id, data, cutoffs_from_table) in enumerate(branches):
+            branch = json.loads(data)
+            if cutoffs_from_table:
+                branch["cutoffs"] = matrix_cutoffs(ranks[row])
+            institutes[institute_id]["branches"].append(branch)
+
+        colleges = [row for institute in institutes for row in flatten_institute(institute)]
+        branch_codes, branch_index = encode_column([college["branch"] for college in colleges])
+        type_codes, type_index = encode_column([college["college_type"] for college in colleges])
+        table = assemble_cutoff_table(colleges, ranks, branch_codes, branch_index, type_codes, type_index)
+        generation = int(generation[0]) if generation else None
+        table.update(sqlite=self, identity=generation, generation=generation or 0)
+        return {"institutes": institutes}, table
+
+    def save(self, institutes, table, generation=0):
+        """Replace the stored data in a single transaction"""
+        ranks = table["ranks"]
+        institute_rows, branch_rows = [], []
+        row = 0
+        for position, institute in enumerate(institutes):
+            fields = {key: value for key, value in institute.items() if key != "branches"}
+            institute_rows.append((position, institute.get("inst_code"), institute.get("name"),
+                                   institute.get("college_type"), json.dumps(fields, ensure_ascii=False)))
+            for branch in institute.get("branches", []):
+                from_table = "cutoffs" in branch and cutoffs_match_matrix(branch["cutoffs"], ranks[row])
+                fields = {key: value for key, value in branch.items() if not (from_table and key == "cutoffs")}
+                branch_rows.append((row, position, branch.get("branch_code"), branch.get("name"),
+                                    json.dumps(fields, ensure_ascii=False), int(from_table)))
+                row += 1
+        if row != len(ranks):
+            raise ValueError("Cutoff table does not match the institutes being saved")
+        filled_rows, filled_cols = np.nonzero(ranks != MISSING_CUTOFF)
+        cutoff_rows = zip(filled_rows.tolist(), filled_cols.tolist(),
+                          [CUTOFF_KEYS[col] for col in filled_cols.tolist()], ranks[filled_rows, filled_cols].tolist())
+
+        with self.pool.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM cutoffs")
+                conn.execute("DELETE FROM branches")
+                conn.execute("DELETE FROM institutes")
+                conn.executemany("INSERT INTO institutes VALUES (?, ?, ?, ?, ?)", institute_rows)
+                conn.executemany("INSERT INTO branches VALUES (?, ?, ?, ?, ?, ?)", branch_rows)
+                conn.executemany("INSERT INTO cutoffs VALUES (?, ?, ?, ?)", cutoff_rows)
+                conn.execute("INSERT OR REPLACE INTO meta VALUES ('generation', ?)", (str(generation),))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def published_table(self, table):
+        """The live table for data just saved from table: table itself, backed by this store"""
+        generation = self.identity()
+        return dict(table, sqlite=self, identity=generation, generation=generation or 0)
+
+    def counts(self, table):
+        with self.pool.connection() as conn:
+            return (conn.execute("SELECT COUNT(*) FROM institutes").fetchone()[0],
+                    conn.execute("SELECT COUNT(*) FROM branches").fetchone()[0])
+
+    def stats(self, table):
+        return {"backend": self.name,
+                "bytes": sum(os.path.getsize(path) for path in (self.path, self.path + '-wal')
+                             if os.path.exists(path)),
+                "pool_size": self.pool.size,
+                "connections": self.pool.created}
+
+    def find_hits(self, rank, lower_bound, upper_bound, selected_category="", selected_branch="",
+                  college_type="", limit=None, after=None):
+        """find_hits() as one indexed query, using cutoffs (cutoff_key, rank)"""
+        empty = np.empty(0, dtype=np.int64)
+        keys = [CUTOFF_KEYS[col] for col in category_columns(selected_category)]
+        lower_bound, upper_bound = clamp_window(lower_bound, upper_bound)
+        if not keys or lower_bound > upper_bound or (after and any(abs(value) >= 2 ** 63 for value in after)):
+            return empty, empty, empty
+
+        sql = "SELECT c.branch_id, c.col, c.rank FROM cutoffs c"
+        conditions = [f"c.cutoff_key IN ({', '.join('?' * len(keys))})", "c.rank BETWEEN ? AND ?"]
+        params = keys + [lower_bound, upper_bound]
+        if selected_branch or college_type:
+            sql += " JOIN branches b ON b.id = c.branch_id"
+        if selected_branch:
+            conditions.append("b.name = ?")
+            params.append(selected_branch)
+        if college_type:
+            sql += " JOIN institutes i ON i.id = b.institute_id"
+            conditions.append("i.college_type = ?")
+            params.append(college_type)
+        if after is not None:
+            conditions.append("(ABS(c.rank - ?), c.branch_id, c.col) > (?, ?, ?)")
+            params += [rank, *after]
+        sql += f" WHERE {' AND '.join(conditions)} ORDER BY ABS(c.rank - ?), c.branch_id, c.col"
+        params.append(rank)
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        with metrics.timer("search_stage_seconds", stage="match"), self.pool.connection() as conn:
+            hits = np.array(conn.execute(sql, params).fetchall(), dtype=np.int64).reshape(-1, 3)
+        return hits[:, 0], hits[:, 1], hits[:, 2]
+
+def create_storage(backend):
+    """The storage for a STORAGE_BACKEND name"""
+    if backend == 'snapshot':
+        return SnapshotStorage(SNAPSHOT_FILE)
+    if backend == 'sqlite':
+        return SqliteStorage(SQLITE_FILE, SQLITE_POOL_SIZE)
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+storage = create_storage(app.config['STORAGE_BACKEND'])
+
+def table_generation(table):
+    """Generation of the stored data a cutoff table was loaded from (0 if none)"""
+    return table.get("generation", 0)
+
+def table_identity(table):
+    return table.get("identity")
+
+def load_initial_data(timings=None):
+    """
+    Return (colleges_data, cutoff_table) at startup. The stored data is used
+    unless the JSON file is newer (a manual import), in which case the JSON
+    is loaded and stored as the next generation. A new sqlite store starts
+    from the snapshot file, if there is one. colleges_data is None when it
+    can be rebuilt from the snapshot on demand.
+
+    timings, if given, receives the seconds spent per phase.
+    """
+    timings = {} if timings is None else timings
+    started = time.perf_counter()
+    stored_mtime = storage.modified()
+    json_mtime = os.path.getmtime(DATA_FILE) if os.path.exists(DATA_FILE) else None
+
+    if stored_mtime is not None and (json_mtime is None or stored_mtime >= json_mtime):
+        try:
+            loaded = storage.load()
+            timings["load"] = time.perf_counter() - started
+            return loaded
+        except Exception as e:
+            print(f"Error loading {storage.name} data, falling back to JSON: {e}")
+
+    source_mtime = json_mtime
+    if json_mtime is None and stored_mtime is None and storage.name != 'snapshot' and os.path.exists(SNAPSHOT_FILE):
+        data = {"institutes": snapshot_institutes(read_snapshot(SNAPSHOT_FILE))}
+        source_mtime = os.path.getmtime(SNAPSHOT_FILE)
+    else:
+        data = load_colleges_data()
+    timings["load"] = time.perf_counter() - started
+    started = time.perf_counter()
+    table = build_cutoff_table([row for institute in data["institutes"]
+                                for row in flatten_institute(institute)])
+    timings["index"] = time.perf_counter() - started
+    if source_mtime is not None:
+        started = time.perf_counter()
+        try:
+            with storage_write_lock():
+                # Another worker starting up may have imported it already
+                if (storage.modified() or -1) < source_mtime:
+                    storage.save(data["institutes"], table, storage.generation() + 1)
+                table = storage.published_table(table)
+        except Exception as e:
+            print(f"Error storing imported data: {e}")
+        timings["store"] = time.perf_counter() - started
+    return data, table
+
+def get_colleges_data():
+    """Return colleges_data, rebuilding it from the loaded snapshot on first use"""
+    global colleges_data
+    if colleges_data is None:
+        with colleges_data_lock:
+            if colleges_data is None:
+                colleges_data = {"institutes": snapshot_institutes(cutoff_table["snapshot"])}
+    return colleges_data
+
+def publish_data(data, table):
+    """
+    Store data and its cutoff table as the next generation and swap it in
+    as the live data of this worker. The caller holds data_lock and
+    storage_write_lock(), and has called sync_data() first.
+
+    Both backends store the whole dataset on every save, so unlike
+    patch_cutoff_table() this still costs time in proportion to the data.
+    """
+    global colleges_data, cutoff_table, colleges
+    if not save_colleges_data(data, table, data_generation + 1):
+        return False
+    published = storage.published_table(table)
+    # Searches pick up cutoff_table in one read, so they see either all old
+    # or all new data
+    with colleges_data_lock:
+        colleges_data = data
+        cutoff_table = published
+        colleges = published["colleges"]
+    bump_data_generation(table_generation(published))
+    return True
+
+def sync_data():
+    """
+    Load the stored data if another worker has stored a newer generation
+    since this worker last loaded it. The caller holds data_lock.
+    """
+    global colleges_data, cutoff_table, colleges
+    identity = storage.identity()
+    if identity is None or identity == table_identity(cutoff_table):
+        return False
+    data, table = storage.load()
+    with colleges_data_lock:
+        colleges_data = data
+        cutoff_table = table
+        colleges = table["colleges"]
+    bump_data_generation(table_generation(table))
+    print(f"Loaded {storage.name} generation {data_generation} (pid {os.getpid()})")
+    return True
+
+# Data is loaded by warm_up(), on the first request at the latest, so
+# spawning a worker only pays for imports
+colleges_data = None
+cutoff_table = None
+colleges = []
+startup_timings = {}
+
+def warm_up():
+    """
+    Load the data and admin credentials if this worker has not yet. Runs
+    before the first request is handled; a server can also call it right
+    after starting a worker so that request does not wait for the load.
+    """
+    global admin_credentials, colleges_data, cutoff_table, colleges
+    if cutoff_table is not None:
+        return
+    with data_lock:
+        if cutoff_table is not None:
+            return
+        started = time.perf_counter()
+        admin_credentials = load_admin_credentials()
+        data, table = load_initial_data(startup_timings)
+        with colleges_data_lock:
+            colleges_data = data
+            cutoff_table = table
+            colleges = table["colleges"]
+        bump_data_generation(table_generation(table))
+        startup_timings["warm_up"] = time.perf_counter() - started
+    print(f"Worker {os.getpid()} ready ({storage.name}, generation {data_generation}): " +
+          ", ".join(f"{phase} {seconds * 1000:.0f}ms" for phase, seconds in startup_timings.items()))
+
 def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 def get_college_stats():
     """Get statistics about colleges data"""
-    total_colleges = len(colleges_data["institutes"])
-    total_branches = sum(len(institute.get("branches", [])) for institute in colleges_data["institutes"])
-    return total_colleges, total_branches
+    return storage.counts(cutoff_table)
 
 def create_template_excel():
     """Create and return an Excel template file in the specified format"""
+    import pandas as pd
     try:
         # Create sample template data in the exact order specified
         template_data = {
@@ -188,7 +1210,8 @@ def create_template_excel():
             'EWS GEN OU': [30771, 82588, 19000],
             'EWS GIRLS OU': [38034, 82588, 21000],
             'Tuition Fee': [60000, 55000, 50000],
-            'Affiliated To': ['JNTUH', 'JNTUH', 'JNTUK']
+            'Affiliated To': ['JNTUH', 'JNTUH', 'JNTUK'],
+            'Seats': [180, 120, 60]
         }
         
         # Create DataFrame with the exact column order
@@ -238,223 +1261,1755 @@ def create_template_excel():
         traceback.print_exc()
         return None
 
-def process_excel_file(filepath):
+# Upload column headers mapped to our internal field names
+UPLOAD_COLUMN_MAPPING = {
+    'Inst Code': 'inst_code',
+    'Institute Name': 'institute_name', 
+    'Place': 'place',
+    'Dist Code': 'dist_code',
+    'Co Education': 'co_ed',
+    'College Type': 'college_type',
+    'Year of Estab': 'year_established',
+    'Branch Code': 'branch_code',
+    'Branch Name': 'branch_name',
+    'OC BOYS': 'OC_BOYS',
+    'OC GIRLS': 'OC_GIRLS',
+    'BC_A BOYS': 'BC_A_BOYS',
+    'BC_A GIRLS': 'BC_A_GIRLS',
+    'BC_B BOYS': 'BC_B_BOYS',
+    'BC_B GIRLS': 'BC_B_GIRLS',
+    'BC_C BOYS': 'BC_C_BOYS',
+    'BC_C GIRLS': 'BC_C_GIRLS',
+    'BC_D BOYS': 'BC_D_BOYS',
+    'BC_D GIRLS': 'BC_D_GIRLS',
+    'BC_E BOYS': 'BC_E_BOYS',
+    'BC_E GIRLS': 'BC_E_GIRLS',
+    'SC BOYS': 'SC_BOYS',
+    'SC GIRLS': 'SC_GIRLS',
+    'ST BOYS': 'ST_BOYS',
+    'ST GIRLS': 'ST_GIRLS',
+    'EWS GEN OU': 'EWS_GEN_OU',
+    'EWS GIRLS OU': 'EWS_GIRLS_OU',
+    'Tuition Fee': 'tuition_fee',
+    'Affiliated To': 'affiliated_to',
+    'Seats': 'seats'
+}
+
+UPLOAD_MODES = ('replace', 'upsert')
+
+UPLOAD_REQUIRED_COLUMNS = ['inst_code', 'institute_name', 'place', 'dist_code', 'co_ed',
+                           'college_type', 'branch_code', 'branch_name', 'tuition_fee']
+
+def iter_upload_chunks(filepath):
     """
-    Process Excel file and return (success, message)
-    Handles the specific column format provided
+    Yield the rows of an uploaded file as DataFrames of at most
+    INGEST_CHUNK_ROWS rows, using the original column headers. Each
+    DataFrame is indexed by sheet row number (the header is row 1).
+
+    xlsx is read with openpyxl in read-only mode and CSV/Parquet in batches,
+    so memory stays bounded by the chunk size. Legacy .xls has no streaming
+    reader and is loaded whole.
     """
-    try:
-        print(f"Processing Excel file: {filepath}")
-        
-        # Read Excel file
+    import pandas as pd
+    extension = filepath.rsplit('.', 1)[1].lower()
+
+    if extension == 'xlsx':
+        from openpyxl import load_workbook
+        workbook = load_workbook(filepath, read_only=True, data_only=True)
+        try:
+            rows = workbook.worksheets[0].iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                return
+            columns = [column if column is not None else f"Unnamed: {position}"
+                       for position, column in enumerate(header)]
+            chunk, row_numbers = [], []
+            for row_number, row in enumerate(rows, start=2):
+                if all(value is None for value in row):
+                    continue
+                chunk.append(row)
+                row_numbers.append(row_number)
+                if len(chunk) >= INGEST_CHUNK_ROWS:
+                    yield pd.DataFrame(chunk, columns=columns, index=row_numbers)
+                    chunk, row_numbers = [], []
+            yield pd.DataFrame(chunk, columns=columns, index=row_numbers)
+        finally:
+            workbook.close()
+
+    elif extension == 'xls':
         df = pd.read_excel(filepath)
-        print(f"Excel file loaded successfully. Shape: {df.shape}")
-        print(f"Columns: {list(df.columns)}")
-        
-        # Map the expected column names to our internal format
-        column_mapping = {
-            'Inst Code': 'inst_code',
-            'Institute Name': 'institute_name', 
-            'Place': 'place',
-            'Dist Code': 'dist_code',
-            'Co Education': 'co_ed',
-            'College Type': 'college_type',
-            'Year of Estab': 'year_established',
-            'Branch Code': 'branch_code',
-            'Branch Name': 'branch_name',
-            'OC BOYS': 'OC_BOYS',
-            'OC GIRLS': 'OC_GIRLS',
-            'BC_A BOYS': 'BC_A_BOYS',
-            'BC_A GIRLS': 'BC_A_GIRLS',
-            'BC_B BOYS': 'BC_B_BOYS',
-            'BC_B GIRLS': 'BC_B_GIRLS',
-            'BC_C BOYS': 'BC_C_BOYS',
-            'BC_C GIRLS': 'BC_C_GIRLS',
-            'BC_D BOYS': 'BC_D_BOYS',
-            'BC_D GIRLS': 'BC_D_GIRLS',
-            'BC_E BOYS': 'BC_E_BOYS',
-            'BC_E GIRLS': 'BC_E_GIRLS',
-            'SC BOYS': 'SC_BOYS',
-            'SC GIRLS': 'SC_GIRLS',
-            'ST BOYS': 'ST_BOYS',
-            'ST GIRLS': 'ST_GIRLS',
-            'EWS GEN OU': 'EWS_GEN_OU',
-            'EWS GIRLS OU': 'EWS_GIRLS_OU',
-            'Tuition Fee': 'tuition_fee',
-            'Affiliated To': 'affiliated_to'
-        }
-        
-        # Rename columns to internal format
-        df_renamed = df.rename(columns=column_mapping)
-        
-        # Check required columns
-        required_columns = ['inst_code', 'institute_name', 'place', 'dist_code', 'co_ed', 
-                           'college_type', 'branch_code', 'branch_name', 'tuition_fee']
-        
-        missing_columns = [col for col in required_columns if col not in df_renamed.columns]
-        if missing_columns:
-            return False, f"Missing required columns: {', '.join(missing_columns)}"
-        
-        # Convert DataFrame to our required format
-        institutes = []
-        
-        # Group by institute
-        for inst_code, group in df_renamed.groupby('inst_code'):
-            print(f"Processing institute: {inst_code}")
-            
-            institute_data = {
+        df.index += 2
+        yield df
+
+    elif extension == 'csv':
+        # Chunks keep counting rows from the start of the file
+        for df in pd.read_csv(filepath, chunksize=INGEST_CHUNK_ROWS):
+            df.index += 2
+            yield df
+
+    elif extension == 'parquet':
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError("Parquet uploads require the pyarrow package")
+        first_row = 2
+        for batch in pq.ParquetFile(filepath).iter_batches(batch_size=INGEST_CHUNK_ROWS):
+            df = batch.to_pandas()
+            df.index = pd.RangeIndex(first_row, first_row + len(df))
+            first_row += len(df)
+            yield df
+
+    else:
+        raise ValueError(f"Unsupported file type: .{extension}")
+
+def coerce_numeric_column(series):
+    """
+    Coerce a column to float64 in one pass. Returns (values, blank) where
+    blank marks cells that were empty (NaN, '' or 'nan'); cells that are
+    present but not numbers come back as NaN with blank False.
+    """
+    import pandas as pd
+    blank = series.isna().to_numpy(copy=True)
+    if series.dtype == object:
+        text = series.astype(str).str.strip()
+        blank |= text.isin(['', 'nan']).to_numpy()
+        values = pd.to_numeric(text.where(~blank), errors='coerce')
+    else:
+        values = pd.to_numeric(series, errors='coerce')
+    values = values.to_numpy(dtype=np.float64, na_value=np.nan, copy=True)
+    values[~np.isfinite(values)] = np.nan
+    return values, blank
+
+def column_values(df, column, default=None):
+    """Return a column as a list of Python values, with NaN replaced by default"""
+    if column not in df.columns:
+        return [default] * len(df)
+    series = df[column]
+    return series.astype(object).where(series.notna(), default).tolist()
+
+def transform_upload_chunk(df, institutes):
+    """
+    Fold one renamed chunk of upload rows into institutes, a dict of
+    inst_code -> institute (in first-seen order). Cutoffs and fees are
+    coerced column-wise; the first row of each institute supplies its
+    metadata, as before. Returns the number of rows used.
+    """
+    df = df[df['inst_code'].notna()]
+    if df.empty:
+        return 0
+
+    # Fees and years: blank or non-numeric -> 0
+    fees, _ = coerce_numeric_column(df['tuition_fee'])
+    fees = np.nan_to_num(np.trunc(fees), nan=0).astype(np.int64).tolist()
+    if 'year_established' in df.columns:
+        years, _ = coerce_numeric_column(df['year_established'])
+        years = np.nan_to_num(np.trunc(years), nan=0).astype(np.int64).tolist()
+    else:
+        years = [0] * len(df)
+
+    # Cutoffs: blank -> left out, present but unparseable -> 0
+    cutoff_columns = [key for key in CUTOFF_KEYS if key in df.columns]
+    cutoff_values = np.zeros((len(df), len(cutoff_columns)), dtype=np.int64)
+    cutoff_present = np.zeros((len(df), len(cutoff_columns)), dtype=bool)
+    for position, column in enumerate(cutoff_columns):
+        values, blank = coerce_numeric_column(df[column])
+        cutoff_values[:, position] = np.nan_to_num(np.trunc(values), nan=0)
+        cutoff_present[:, position] = ~blank
+
+    # Seats are optional: blank -> left out, present but not a number -> 0
+    if 'seats' in df.columns:
+        seat_values, seats_blank = coerce_numeric_column(df['seats'])
+        seats = [None if blank else count for count, blank in
+                 zip(np.nan_to_num(np.trunc(seat_values), nan=0).astype(np.int64).tolist(), seats_blank.tolist())]
+    else:
+        seats = [None] * len(df)
+
+    affiliations = column_values(df, 'affiliated_to', 'JNTUH')
+    rows = zip(column_values(df, 'inst_code'), column_values(df, 'institute_name'),
+               column_values(df, 'place'), column_values(df, 'dist_code'), column_values(df, 'co_ed'),
+               column_values(df, 'college_type'), years, column_values(df, 'branch_code'),
+               column_values(df, 'branch_name'), fees, affiliations, seats,
+               cutoff_values.tolist(), cutoff_present.tolist())
+
+    for (inst_code, name, place, dist_code, co_ed, college_type, year, branch_code, branch_name,
+         fee, affiliated_to, seat_count, values, present) in rows:
+        institute = institutes.get(inst_code)
+        if institute is None:
+            institute = institutes[inst_code] = {
                 "inst_code": inst_code,
-                "name": group['institute_name'].iloc[0],
-                "place": group['place'].iloc[0],
-                "dist_code": group['dist_code'].iloc[0],
-                "co_ed": group['co_ed'].iloc[0],
-                "college_type": group['college_type'].iloc[0],
-                "year_established": int(group['year_established'].iloc[0]) if 'year_established' in group.columns and pd.notna(group['year_established'].iloc[0]) else 0,
+                "name": name,
+                "place": place,
+                "dist_code": dist_code,
+                "co_ed": co_ed,
+                "college_type": college_type,
+                "year_established": year,
                 "branches": []
             }
-            
-            # Process branches
-            branch_count = 0
-            for _, row in group.iterrows():
-                branch_data = {
-                    "branch_code": row['branch_code'],
-                    "name": row['branch_name'],
-                    "tuition_fee": int(row['tuition_fee']) if pd.notna(row['tuition_fee']) else 0,
-                    "affiliated_to": row.get('affiliated_to', 'JNTUH') if 'affiliated_to' in row and pd.notna(row.get('affiliated_to')) else 'JNTUH',
-                    "cutoffs": {}
-                }
-                
-                # Add cutoff ranks
-                cutoff_columns = [col for col in row.index if col in [
-                    'OC_BOYS', 'OC_GIRLS', 'BC_A_BOYS', 'BC_A_GIRLS', 
-                    'BC_B_BOYS', 'BC_B_GIRLS', 'BC_C_BOYS', 'BC_C_GIRLS',
-                    'BC_D_BOYS', 'BC_D_GIRLS', 'BC_E_BOYS', 'BC_E_GIRLS',
-                    'SC_BOYS', 'SC_GIRLS', 'ST_BOYS', 'ST_GIRLS',
-                    'EWS_GEN_OU', 'EWS_GIRLS_OU'
-                ]]
-                
-                for col in cutoff_columns:
-                    if col in row and pd.notna(row[col]):
-                        try:
-                            branch_data["cutoffs"][col] = int(row[col])
-                        except (ValueError, TypeError):
-                            try:
-                                clean_value = str(row[col]).strip()
-                                if clean_value and clean_value != 'nan':
-                                    branch_data["cutoffs"][col] = int(float(clean_value))
-                            except:
-                                branch_data["cutoffs"][col] = 0
-                
-                institute_data["branches"].append(branch_data)
-                branch_count += 1
-            
-            institutes.append(institute_data)
-            print(f"Added institute {inst_code} with {branch_count} branches")
-        
-        print(f"Processed {len(institutes)} institutes total")
-        
-        # Update the data
-        colleges_data["institutes"] = institutes
-        
-        # Save to JSON file
-        if save_colleges_data(colleges_data):
-            return True, f"Successfully processed {len(institutes)} institutes with {sum(len(inst['branches']) for inst in institutes)} branches"
-        else:
-            return False, "Failed to save data to file"
-        
-    except Exception as e:
-        error_msg = f"Error processing Excel file: {str(e)}"
-        print(error_msg)
-        traceback.print_exc()
-        return False, error_msg
+        branch = {
+            "branch_code": branch_code,
+            "name": branch_name,
+            "tuition_fee": fee,
+            "affiliated_to": affiliated_to,
+            "cutoffs": {column: value for column, value, is_present
+                        in zip(cutoff_columns, values, present) if is_present}
+        }
+        if seat_count is not None:
+            branch["seats"] = seat_count
+        institute["branches"].append(branch)
+    return len(df)
 
-# Public Routes
-@app.route('/')
-def index():
-    try:
-        branch_names = sorted(list(set(college["branch"] for college in colleges)))
-        return render_template('index.html', 
-                            categories=categories.keys(), 
-                            branch_names=branch_names,
-                            college_types=sorted(list(set(college["college_type"] for college in colleges))))
-    except Exception as e:
-        print(f"Error in index route: {e}")
-        return "An error occurred", 500
+# Upload validation rules -> (severity, description). Errors stop an upload
+# before anything is committed; warnings are reported alongside it.
+VALIDATION_RULES = {
+    "missing_value": ("error", "Required value is blank"),
+    "invalid_number": ("error", "Not a number of zero or more; it would be read as 0"),
+    "invalid_cutoff": ("error", f"Cutoff must be a whole rank from 1 to {INT32_MAX}"),
+    "duplicate_branch": ("error", "Same institute and branch code as an earlier row"),
+    "inconsistent_institute": ("error", "Institute details differ from its first row"),
+    "cutoff_order": ("warning", "Closes at a better rank than the cutoff it should follow")
+}
+VALIDATION_REQUIRED_FIELDS = ("inst_code", "institute_name", "branch_code", "branch_name")
+# Fields every row of an institute must agree on
+VALIDATION_INSTITUTE_FIELDS = ("institute_name", "place", "dist_code", "co_ed", "college_type", "year_established")
+# Optional number fields; blanks are allowed
+VALIDATION_NUMBER_FIELDS = ("tuition_fee", "year_established", "seats")
+UPLOAD_HEADERS = {field: header for header, field in UPLOAD_COLUMN_MAPPING.items()}
 
-@app.route('/search', methods=['POST'])
-def search():
-    try:
-        data = request.get_json()
-        if not data or not isinstance(data, dict):
-            return jsonify({"error": "Invalid or missing JSON data"}), 400
-            
-        rank_str = data.get('rank', '')
-        selected_category = data.get('category', '')
-        selected_branch = data.get('branch', '')
-        college_type = data.get('college_type', '')
-        
-        if not rank_str:
-            return jsonify({"error": "Rank parameter is required"}), 400
-            
-        try:
-            rank = int(rank_str)
-            if rank <= 0:
-                return jsonify({"error": "Rank must be a positive integer"}), 400
-        except ValueError:
-            return jsonify({"error": "Rank must be a valid integer"}), 400
-        
-        # Calculate bounds
-        threshold = max(1000, int(rank * 0.1))
-        lower_bound = max(1, rank - threshold)
-        upper_bound = rank + threshold
-        
-        results = []
-        
-        for college in colleges:
-            # Apply filters
-            if selected_branch and college["branch"] != selected_branch:
-                continue
-            if college_type and college["college_type"] != college_type:
+def upload_text(series):
+    """
+    Upload cells as stripped strings ('' when blank), with whole floats
+    written as ints. Only the distinct values of the column are converted.
+    """
+    import pandas as pd
+    ids, uniques = pd.factorize(series)
+    texts = [str(int(value)) if isinstance(value, float) and value.is_integer() else str(value).strip()
+             for value in uniques.tolist()]
+    # Blank cells have id -1, the '' at the end
+    return pd.Series(np.array(texts + [''], dtype=object)[ids], index=series.index)
+
+class UploadValidator:
+    """
+    Checks the renamed chunks of one upload against VALIDATION_RULES before
+    any of it is committed. Every rule runs column-wise over a whole chunk;
+    duplicate branches and institute details are compared across chunks
+    with the first row each was seen on.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.counts = dict.fromkeys(VALIDATION_RULES, 0)
+        self.issues = []
+        self.branch_rows = {}  # inst_code + branch_code -> first row
+        self.institute_rows = {}  # inst_code -> first row
+        self.institute_values = {field: {} for field in VALIDATION_INSTITUTE_FIELDS}  # field -> inst_code -> value
+
+    def flag(self, rule, field, mask, df, details=None):
+        """
+        Count an issue of rule on field for every row of df where mask is set
+        and keep up to MAX_VALIDATION_ISSUES of them. details, if given, maps
+        the positions of kept rows to a note on each.
+        """
+        count = int(np.count_nonzero(mask))
+        if not count:
+            return
+        self.counts[rule] += count
+        room = MAX_VALIDATION_ISSUES - len(self.issues)
+        if room <= 0:
+            return
+        severity, message = VALIDATION_RULES[rule]
+        positions = np.flatnonzero(mask)[:room]
+        rows = df.index[positions].tolist()
+        values = column_values(df.iloc[positions], field)
+        notes = details(positions) if details else itertools.repeat(None)
+        for row, value, note in zip(rows, values, notes):
+            self.issues.append({
+                "row": row,
+                "column": UPLOAD_HEADERS.get(field, field),
+                "rule": rule,
+                "severity": severity,
+                "message": f"{message} ({note})" if note else message,
+                "value": value if value is None or isinstance(value, (str, int, float, bool)) else str(value)
+            })
+
+    def validate(self, df):
+        """Check one chunk of upload rows, renamed to internal field names"""
+        import pandas as pd
+        self.rows += len(df)
+        texts = {field: upload_text(df[field]) for field in VALIDATION_REQUIRED_FIELDS + VALIDATION_INSTITUTE_FIELDS
+                 if field in df.columns}
+        present = {}
+        for field in VALIDATION_REQUIRED_FIELDS:
+            present[field] = (texts[field] != '').to_numpy()
+            self.flag("missing_value", field, ~present[field], df)
+
+        for field in VALIDATION_NUMBER_FIELDS:
+            if field in df.columns:
+                values, blank = coerce_numeric_column(df[field])
+                self.flag("invalid_number", field, ~blank & ~(values >= 0), df)
+
+        cutoffs = {}
+        for field in CUTOFF_KEYS:
+            if field in df.columns:
+                values, blank = coerce_numeric_column(df[field])
+                valid = (values >= 1) & (values <= INT32_MAX) & (values == np.trunc(values))
+                self.flag("invalid_cutoff", field, ~blank & ~valid, df)
+                cutoffs[field] = np.where(valid, values, np.nan)
+        # Girls seats close after the general ones of their category, and
+        # reserved categories after OC
+        oc_field = categories["OC"][0]
+        for category, (general, girls) in categories.items():
+            pairs = [(girls, general)] + ([(general, oc_field)] if category != "OC" else [])
+            for field, before in pairs:
+                if field in cutoffs and before in cutoffs:
+                    self.flag("cutoff_order", field, cutoffs[field] < cutoffs[before], df,
+                              lambda positions, before=before: [f"{UPLOAD_HEADERS[before]} is {value:.0f}"
+                                                                for value in cutoffs[before][positions]])
+
+        codes = texts["inst_code"]
+        keyed = present["inst_code"] & present["branch_code"]
+        keys = (codes + "\x1f" + texts["branch_code"])[keyed]
+        repeated = (keys.duplicated() | keys.isin(self.branch_rows)).to_numpy()
+        self.branch_rows.update(zip(keys[~repeated].tolist(), keys.index[~repeated].tolist()))
+        first_rows = np.zeros(len(df), dtype=np.int64)
+        first_rows[keyed] = keys.map(self.branch_rows).to_numpy()
+        duplicates = np.zeros(len(df), dtype=bool)
+        duplicates[keyed] = repeated
+        self.flag("duplicate_branch", "branch_code", duplicates, df,
+                  lambda positions: [f"first on row {row}" for row in first_rows[positions].tolist()])
+
+        # Institute details are compared per distinct inst_code with the
+        # first row it was seen on, in this chunk or an earlier one
+        ids, inst_codes = pd.factorize(codes.where(present["inst_code"]))
+        inst_codes = inst_codes.tolist()
+        first_positions = np.full(len(inst_codes), len(df))
+        np.minimum.at(first_positions, ids[ids >= 0], np.flatnonzero(ids >= 0))
+        new = [(code, position) for code, position in zip(inst_codes, first_positions.tolist())
+               if code not in self.institute_rows]
+        self.institute_rows.update((code, df.index[position]) for code, position in new)
+        institute_rows = np.array([self.institute_rows[code] for code in inst_codes] + [0])[ids]
+        for field in VALIDATION_INSTITUTE_FIELDS:
+            if field not in df.columns:
                 continue
-                
-            cutoffs = college.get("cutoffs", {})
-            
-            if selected_category:
-                # Search only in selected category
-                category_keys = categories.get(selected_category, [])
-                for cutoff_key in category_keys:
-                    if cutoff_key in cutoffs:
-                        try:
-                            cutoff_rank = int(cutoffs[cutoff_key])
-                            if lower_bound <= cutoff_rank <= upper_bound:
-                                result = create_result(college, cutoff_rank, selected_category, cutoff_key)
-                                results.append(result)
-                        except (ValueError, TypeError):
-                            continue
-            else:
-                # Search in all categories
-                for category, cutoff_keys in categories.items():
-                    for cutoff_key in cutoff_keys:
-                        if cutoff_key in cutoffs:
-                            try:
-                                cutoff_rank = int(cutoffs[cutoff_key])
-                                if lower_bound <= cutoff_rank <= upper_bound:
-                                    result = create_result(college, cutoff_rank, category, cutoff_key)
-                                    results.append(result)
-                            except (ValueError, TypeError):
-                                continue
-        
-        # Sort results by proximity to the input rank
-        results.sort(key=lambda x: abs(x["cutoff_rank"] - rank))
-        
-        return jsonify({
-            "success": True,
-            "count": len(results),
-            "results": results
+            values = texts[field].to_numpy()
+            known = self.institute_values[field]
+            known.update((code, values[position]) for code, position in new)
+            expected = np.array([known[code] for code in inst_codes] + [''], dtype=object)[ids]
+            self.flag("inconsistent_institute", field, (ids >= 0) & (values != expected), df,
+                      lambda positions, expected=expected: [f"row {row} has '{value}'" for row, value in
+                                                            zip(institute_rows[positions].tolist(), expected[positions])])
+
+    def report(self):
+        """
+        {"rows", "errors", "warnings", "rules": {rule: count}, "issues":
+        [{row, column, rule, severity, message, value}] by row, "truncated"}
+        """
+        errors = sum(count for rule, count in self.counts.items() if VALIDATION_RULES[rule][0] == "error")
+        warnings = sum(self.counts.values()) - errors
+        return {
+            "rows": self.rows,
+            "errors": errors,
+            "warnings": warnings,
+            "rules": {rule: count for rule, count in self.counts.items() if count},
+            "issues": sorted(self.issues, key=lambda issue: issue["row"]),
+            "truncated": len(self.issues) < errors + warnings
+        }
+
+def format_validation(validation):
+    """One-line summary of an UploadValidator report"""
+    if not validation["rules"]:
+        return "no validation issues"
+    rules = ", ".join(f"{rule} {count}" for rule, count in validation["rules"].items())
+    return f"{validation['errors']} validation errors, {validation['warnings']} warnings ({rules})"
+
+def write_validation_workbook(filepath, validation, path):
+    """
+    Write an annotated copy of an upload to path: its rows as uploaded plus
+    an Issues column, with the cells that have issues filled and commented,
+    and an Issues sheet listing every kept issue.
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.comments import Comment
+    from openpyxl.styles import Font, PatternFill
+
+    fills = {"error": PatternFill(start_color="F8CBAD", end_color="F8CBAD", fill_type="solid"),
+             "warning": PatternFill(start_color="FFE699", end_color="FFE699", fill_type="solid")}
+    bold = Font(bold=True)
+    cell_issues, row_issues = {}, {}
+    for issue in validation["issues"]:
+        cell_issues.setdefault((issue["row"], issue["column"]), []).append(issue)
+        row_issues.setdefault(issue["row"], []).append(issue)
+
+    def header_cells(sheet, names):
+        cells = []
+        for name in names:
+            cell = WriteOnlyCell(sheet, name)
+            cell.font = bold
+            cells.append(cell)
+        return cells
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Upload")
+    header = None
+    for df in iter_upload_chunks(filepath):
+        if header is None:
+            header = [str(column) for column in df.columns]
+            sheet.append(header_cells(sheet, header + ["Issues"]))
+        values = df.astype(object).where(df.notna(), None)
+        for row, cells in zip(values.index.tolist(), values.itertuples(index=False, name=None)):
+            issues = row_issues.get(row)
+            if not issues:
+                sheet.append(cells)
+                continue
+            cells = list(cells)
+            for position, column in enumerate(header):
+                found = cell_issues.get((row, column))
+                if found:
+                    cell = WriteOnlyCell(sheet, cells[position])
+                    severity = "error" if any(issue["severity"] == "error" for issue in found) else "warning"
+                    cell.fill = fills[severity]
+                    cell.comment = Comment("\n".join(issue["message"] for issue in found), "Validation")
+                    cells[position] = cell
+            cells.append("; ".join(f"{issue['column']}: {issue['message']}" for issue in issues))
+            sheet.append(cells)
+
+    issues_sheet = workbook.create_sheet("Issues")
+    columns = ["row", "column", "rule", "severity", "message", "value"]
+    issues_sheet.append(header_cells(issues_sheet, [column.title() for column in columns]))
+    for issue in validation["issues"]:
+        issues_sheet.append([issue[column] for column in columns])
+    if validation["truncated"]:
+        issues_sheet.append([None, None, None, None, f"Only the first {MAX_VALIDATION_ISSUES} issues are listed "
+                                                    f"({format_validation(validation)})"])
+
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix='.validation-', suffix='.xlsx')
+    os.close(fd)
+    try:
+        workbook.save(temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+def process_excel_file(filepath, mode='replace', progress=None, period=None, dry_run=False, validation=None):
+    """
+    Process an uploaded xlsx/xls/csv/parquet file and return (success, message)
+    Handles the specific column format provided
+
+    mode is 'replace' (the upload becomes the dataset) or 'upsert' (only
+    the uploaded institutes/branches are added or updated). Either way only
+    changed institutes are re-indexed, and nothing is written if the upload
+    matches the current data.
+
+    period, if given, is the (year, round) of counselling the cutoffs are
+    from. They are kept in each branch's history next to earlier periods,
+    and the latest period stays the branch's current cutoffs.
+
+    progress, if given, is called as progress(phase, rows_processed).
+
+    Every row is checked by an UploadValidator as it is read; any error
+    fails the upload before the live data is touched. validation, if
+    given, is a dict the validator's report is stored in. With dry_run
+    the upload is validated and diffed against the live data, but nothing
+    is written.
+    """
+    progress = progress or (lambda phase, rows: None)
+    warm_up()
+    try:
+        print(f"Processing upload: {filepath}")
+        timings = {"read": 0.0, "validate": 0.0, "transform": 0.0}
+        total_rows = 0
+        used_rows = 0
+        institutes = {}
+        validator = UploadValidator()
+
+        chunks = iter_upload_chunks(filepath)
+        while True:
+            started = time.perf_counter()
+            df = next(chunks, None)
+            timings["read"] += time.perf_counter() - started
+            if df is None:
+                break
+
+            progress("reading", total_rows)
+            started = time.perf_counter()
+            df_renamed = df.rename(columns=UPLOAD_COLUMN_MAPPING)
+            if total_rows == 0:
+                missing_columns = [col for col in UPLOAD_REQUIRED_COLUMNS if col not in df_renamed.columns]
+                if missing_columns:
+                    return False, f"Missing required columns: {', '.join(missing_columns)}"
+            total_rows += len(df_renamed)
+            timings["transform"] += time.perf_counter() - started
+            started = time.perf_counter()
+            validator.validate(df_renamed)
+            timings["validate"] += time.perf_counter() - started
+            started = time.perf_counter()
+            used_rows += transform_upload_chunk(df_renamed, institutes)
+            timings["transform"] += time.perf_counter() - started
+
+        report = validator.report()
+        if validation is not None:
+            validation.update(report)
+        if report["errors"]:
+            print(f"Rejected upload {filepath}: {format_validation(report)}")
+            return False, f"Upload rejected with {format_validation(report)}; nothing was changed"
+
+        # Institutes are listed by inst_code, as the old groupby did
+        try:
+            institutes = [institutes[inst_code] for inst_code in sorted(institutes)]
+        except TypeError:
+            institutes = list(institutes.values())
+        if period is not None:
+            year, counselling_round = period
+            for institute in institutes:
+                for branch in institute["branches"]:
+                    branch.update(year=year, round=counselling_round, history=[
+                        {"year": year, "round": counselling_round, "cutoffs": branch["cutoffs"]}])
+
+        with data_lock, storage_write_lock():
+            # Diff against the latest stored data, whichever worker wrote it
+            sync_data()
+            progress("diffing", total_rows)
+            started = time.perf_counter()
+            colleges_data = get_colleges_data()
+            old_institutes = colleges_data["institutes"]
+            merged, changes = merge_institutes(old_institutes, institutes, mode)
+            timings["diff"] = time.perf_counter() - started
+            total_branches = sum(len(inst.get('branches', [])) for inst in merged)
+
+            if has_changes(changes) and not dry_run:
+                # Patch the search table first so a failure leaves the live data alone
+                progress("indexing", total_rows)
+                started = time.perf_counter()
+                table = patch_cutoff_table(cutoff_table, old_institutes, merged)
+                timings["index"] = time.perf_counter() - started
+
+                # Store it for every worker and swap it in here
+                progress("saving", total_rows)
+                started = time.perf_counter()
+                saved = publish_data(dict(colleges_data, institutes=merged), table)
+                timings["save"] = time.perf_counter() - started
+                if not saved:
+                    return False, "Failed to save data to file"
+
+        for phase, seconds in timings.items():
+            metrics.observe("ingest_phase_seconds", seconds, phase=phase)
+        report = (f"{total_rows} rows read, {used_rows} used, {format_validation(report)}; " +
+                  ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in timings.items()))
+        summary = format_changes(changes)
+        if period is not None:
+            mode = f"{mode} {period[0]} round {period[1]}"
+        if dry_run:
+            print(f"Dry run: {len(merged)} institutes with {total_branches} branches ({mode}: {summary}; {report})")
+            return True, (f"Dry run passed: the upload would give {len(merged)} institutes with {total_branches} "
+                          f"branches ({mode}: {summary}; {report}); nothing was changed")
+        print(f"Processed {len(merged)} institutes with {total_branches} branches ({mode}: {summary}; {report})")
+
+        return True, (f"Successfully processed {len(merged)} institutes with {total_branches} branches "
+                      f"({mode}: {summary}; {report})")
+        
+    except Exception as e:
+        error_msg = f"Error processing Excel file: {str(e)}"
+        print(error_msg)
+        traceback.print_exc()
+        return False, error_msg
+
+def branch_keys(branches):
+    """Key each branch on (branch_code, occurrence) so duplicate codes pair up in order"""
+    seen = {}
+    keys = []
+    for branch in branches:
+        occurrence = seen.get(branch.get("branch_code"), 0)
+        seen[branch.get("branch_code")] = occurrence + 1
+        keys.append((branch.get("branch_code"), occurrence))
+    return keys
+
+def merge_branches(old_branches, new_branches, mode, changes):
+    """
+    Merge one institute's uploaded branches into its current ones and count
+    the changes. Unchanged branches are returned as the existing objects.
+    """
+    old_by_key = dict(zip(branch_keys(old_branches), old_branches))
+    new_keys = branch_keys(new_branches)
+    merged = []
+
+    if mode == 'replace':
+        for key, branch in zip(new_keys, new_branches):
+            old_branch = old_by_key.pop(key, None)
+            if old_branch is not None:
+                branch = carry_history(old_branch, branch)
+            if old_branch is None:
+                changes["branches_added"] += 1
+                merged.append(branch)
+            elif old_branch == branch:
+                merged.append(old_branch)
+            else:
+                changes["branches_updated"] += 1
+                merged.append(branch)
+        changes["branches_removed"] += len(old_by_key)
+        return merged
+
+    # Upsert: keep every current branch, update matches in place, append new ones
+    new_by_key = dict(zip(new_keys, new_branches))
+    for key, old_branch in old_by_key.items():
+        branch = new_by_key.pop(key, None)
+        if branch is None:
+            merged.append(old_branch)
+            continue
+        updated = carry_history(old_branch, dict(old_branch, **branch))
+        if updated == old_branch:
+            merged.append(old_branch)
+        else:
+            changes["branches_updated"] += 1
+            merged.append(updated)
+    changes["branches_added"] += len(new_by_key)
+    merged.extend(new_by_key.values())
+    return merged
+
+def carry_history(old_branch, branch):
+    """
+    Merge the cutoff history of a branch into its uploaded version. The
+    upload's cutoffs are filed under its period, or the branch's current
+    period if it has none, and the latest period's cutoffs become current.
+    """
+    if "year" in branch:
+        period = (branch["year"], branch["round"])
+    elif "year" in old_branch:
+        period = (old_branch["year"], old_branch["round"])
+    else:
+        return branch
+    history = {(entry["year"], entry["round"]): entry for entry in old_branch.get("history", [])}
+    history[period] = {"year": period[0], "round": period[1], "cutoffs": branch.get("cutoffs", {})}
+    entries = [history[key] for key in sorted(history)]
+    latest = entries[-1]
+    return dict(branch, cutoffs=latest["cutoffs"], year=latest["year"], round=latest["round"], history=entries)
+
+def merge_institutes(old_institutes, new_institutes, mode):
+    """
+    Diff uploaded institutes against the current ones, keyed on inst_code
+    and then (inst_code, branch_code).
+
+    replace: the upload becomes the whole dataset; anything missing from it
+    is removed. upsert: uploaded institutes/branches are added or updated
+    and everything else is left as it is.
+
+    Returns (institutes, changes). Institutes with no changes are the same
+    objects as before, which lets patch_cutoff_table() reuse their rows.
+    """
+    changes = {key: 0 for key in ("institutes_added", "institutes_updated", "institutes_removed",
+                                  "branches_added", "branches_updated", "branches_removed")}
+    old_by_code = {institute["inst_code"]: institute for institute in old_institutes}
+    new_by_code = {institute["inst_code"]: institute for institute in new_institutes}
+
+    def merge_one(old_institute, new_institute):
+        if old_institute is None:
+            changes["institutes_added"] += 1
+            changes["branches_added"] += len(new_institute["branches"])
+            return new_institute
+        branches = merge_branches(old_institute.get("branches", []), new_institute["branches"], mode, changes)
+        if mode == 'replace':
+            merged = dict(new_institute, branches=branches)
+        else:
+            merged = dict(old_institute, **{key: value for key, value in new_institute.items() if key != "branches"})
+            merged["branches"] = branches
+        if merged == old_institute and all(a is b for a, b in zip(branches, old_institute.get("branches", []))):
+            return old_institute
+        changes["institutes_updated"] += 1
+        return merged
+
+    if mode == 'replace':
+        merged = [merge_one(old_by_code.get(code), institute) for code, institute in new_by_code.items()]
+        for code, institute in old_by_code.items():
+            if code not in new_by_code:
+                changes["institutes_removed"] += 1
+                changes["branches_removed"] += len(institute.get("branches", []))
+        return merged, changes
+
+    merged = [merge_one(institute, new_by_code.pop(institute["inst_code"]))
+              if institute["inst_code"] in new_by_code else institute
+              for institute in old_institutes]
+    merged.extend(merge_one(None, institute) for institute in new_by_code.values())
+    return merged, changes
+
+def has_changes(changes):
+    return any(changes.values())
+
+def format_changes(changes):
+    """One-line summary of a merge_institutes() change count"""
+    if not has_changes(changes):
+        return "no changes"
+    return (f"institutes {changes['institutes_added']} added, {changes['institutes_updated']} updated, "
+            f"{changes['institutes_removed']} removed; branches {changes['branches_added']} added, "
+            f"{changes['branches_updated']} updated, {changes['branches_removed']} removed")
+
+class LRUCache:
+    """Thread-safe bounded LRU cache with a per-entry TTL and hit/miss counters"""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self.entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        if self.max_size <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical computations: the first caller for a key
+    runs it and later callers wait for that result instead of computing it
+    again. Keeps per-route counts of computations and coalesced callers.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flights = {}  # key -> in-flight call
+        self.counts = {}  # route -> [computations, coalesced callers, most waiters on one call]
+
+    def run(self, key, function, route):
+        with self.lock:
+            flight = self.flights.get(key)
+            if flight is None:
+                flight = self.flights[key] = {"done": threading.Event(), "route": route, "waiters": 0,
+                                              "started": time.monotonic(), "result": None, "error": None}
+                leader = True
+            else:
+                flight["waiters"] += 1
+                leader = False
+        if not leader:
+            flight["done"].wait()
+            if flight["error"] is not None:
+                raise flight["error"]
+            return flight["result"]
+
+        try:
+            flight["result"] = function()
+        except BaseException as e:
+            flight["error"] = e
+            raise
+        finally:
+            with self.lock:
+                del self.flights[key]
+                waiters = flight["waiters"]
+                counts = self.counts.setdefault(route, [0, 0, 0])
+                counts[0] += 1
+                counts[1] += waiters
+                counts[2] = max(counts[2], waiters)
+            flight["done"].set()
+            metrics.observe("coalesced_waiters", waiters, route=route)
+        return flight["result"]
+
+    def stats(self, top=10):
+        """Per-route counts and coalescing rate, and the in-flight keys with the most waiters"""
+        with self.lock:
+            counts = {route: list(values) for route, values in self.counts.items()}
+            flights = sorted(self.flights.items(), key=lambda item: -item[1]["waiters"])[:top]
+            in_flight = [{"route": flight["route"], "key": repr(key), "waiters": flight["waiters"],
+                          "age_ms": round((time.monotonic() - flight["started"]) * 1000, 1)}
+                         for key, flight in flights]
+            total_in_flight = len(self.flights)
+        routes = {route: {"computations": computations, "coalesced": coalesced, "max_waiters": max_waiters,
+                          "coalescing_rate": round(coalesced / (computations + coalesced), 4)
+                          if computations + coalesced else 0.0}
+                  for route, (computations, coalesced, max_waiters) in counts.items()}
+        return {"routes": routes, "in_flight": total_in_flight, "busiest": in_flight}
+
+search_cache = LRUCache(app.config['SEARCH_CACHE_SIZE'], app.config['SEARCH_CACHE_TTL'])
+# Identical cache misses arriving together are computed once
+search_flights = SingleFlight()
+
+# Compressors for cached response bodies by Content-Encoding, most preferred first
+RESPONSE_ENCODINGS = {"gzip": lambda data: gzip.compress(data, compresslevel=6, mtime=0)}
+if brotli is not None:
+    RESPONSE_ENCODINGS = {"br": lambda data: brotli.compress(data, quality=5), **RESPONSE_ENCODINGS}
+
+class CachedBody:
+    """
+    A serialized response body and its compressed copies, each made the
+    first time a client accepts that encoding, so a hot payload is
+    serialized and compressed once per data generation
+    """
+
+    def __init__(self, data, mimetype):
+        self.data = data
+        self.mimetype = mimetype
+        self.encoded = {}
+
+    def encode(self, encoding):
+        data = self.encoded.get(encoding)
+        if data is None:
+            data = self.encoded[encoding] = RESPONSE_ENCODINGS[encoding](self.data)
+        return data
+
+def cached_response(name, query_key, build, mimetype='application/json', private=False):
+    """
+    Response for data-derived content: build() returns the payload (a dict
+    to send as JSON, or a string of mimetype) for query_key, the normalized
+    query. Its weak ETag is made from the data generation and query_key, so
+    a GET whose If-None-Match carries it gets 304 before anything is looked
+    up or built. Otherwise the body comes from search_cache, built on a
+    miss, compressed if the client accepts it. Concurrent misses for the
+    same key wait on one build and share its body.
+    """
+    generation = data_generation
+    etag = response_etag(generation, name, query_key)
+    headers = {"Cache-Control": "private, no-cache" if private else "no-cache", "Vary": "Accept-Encoding"}
+    if request.method in ('GET', 'HEAD') and request.if_none_match.contains_weak(etag):
+        return not_modified(etag, headers)
+
+    cache_key = (name, generation, query_key)
+    body = search_cache.get(cache_key)
+    if body is None:
+        def compute():
+            payload = build()
+            with metrics.timer("search_stage_seconds", stage="serialize"):
+                data = payload if isinstance(payload, str) else app.json.dumps(payload)
+                computed = CachedBody(data.encode('utf-8'), mimetype)
+            # Cached before the flight ends, so no request can miss both
+            search_cache.put(cache_key, computed)
+            return computed
+
+        body = search_flights.run(cache_key, compute, name)
+
+    response = Response(body.data, mimetype=body.mimetype, headers=headers)
+    encoding = request.accept_encodings.best_match(RESPONSE_ENCODINGS) \
+        if len(body.data) >= COMPRESS_MIN_BYTES else None
+    if encoding:
+        response.set_data(body.encode(encoding))
+        response.headers["Content-Encoding"] = encoding
+    response.set_etag(etag, weak=True)
+    return response
+
+def response_etag(generation, name, query_key):
+    """ETag value of a data-derived response: the data generation and a digest of the normalized query"""
+    digest = hashlib.blake2b(repr((name, query_key)).encode('utf-8'), digest_size=12).hexdigest()
+    return f"{generation}-{digest}"
+
+def not_modified(etag, headers):
+    response = Response(status=304, headers=headers)
+    response.set_etag(etag, weak=True)
+    return response
+
+def request_data():
+    """
+    Parameters of a search request: the JSON body of a POST, or the query
+    string of a GET, where a repeated argument becomes a list
+    """
+    if request.method == 'POST':
+        return request.get_json()
+    return {key: values if len(values) > 1 else values[0] for key, values in request.args.lists()}
+
+# Request and hot-path metrics, exposed in the Prometheus text format by
+# /admin/metrics. Histograms are keyed by metric name and label values.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+METRIC_HELP = {
+    "request_duration_seconds": "Request latency by route, method and status",
+    "search_stage_seconds": "Time spent in each stage of a search",
+    "ingest_phase_seconds": "Time spent in each phase of an upload",
+    "coalesced_waiters": "Requests that waited on one in-flight computation instead of repeating it",
+    "simulation_seconds": "Time spent allocating seats for an /admin/simulate request",
+}
+# Metrics that count things rather than time them
+METRIC_BUCKETS = {"coalesced_waiters": COUNT_BUCKETS}
+
+class Histogram:
+    """Thread-safe latency histogram with fixed bucket upper bounds"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # The last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, seconds):
+        position = bisect.bisect_left(self.buckets, seconds)
+        with self.lock:
+            self.counts[position] += 1
+            self.sum += seconds
+            self.count += 1
+
+    def snapshot(self):
+        """(cumulative bucket counts, sum, count), read consistently"""
+        with self.lock:
+            return list(itertools.accumulate(self.counts)), self.sum, self.count
+
+class MetricsRegistry:
+    """Named histograms, one per combination of label values"""
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.setdefault(key, Histogram(METRIC_BUCKETS.get(name, LATENCY_BUCKETS)))
+        histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def render(self):
+        """Histograms in the Prometheus text exposition format"""
+        with self.lock:
+            histograms = sorted(self.histograms.items())
+        lines = []
+        current = None
+        for (name, labels), histogram in histograms:
+            metric = f"{self.prefix}_{name}"
+            if name != current:
+                current = name
+                lines.append(f"# HELP {metric} {METRIC_HELP.get(name, name)}")
+                lines.append(f"# TYPE {metric} histogram")
+            counts, total, count = histogram.snapshot()
+            for bound, cumulative in zip(list(histogram.buckets) + ["+Inf"], counts):
+                lines.append(f"{metric}_bucket{format_labels(labels + (('le', bound),))} {cumulative}")
+            lines.append(f"{metric}_sum{format_labels(labels)} {total}")
+            lines.append(f"{metric}_count{format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n" if lines else ""
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{escape_label_value(value)}"' for key, value in labels) + "}"
+
+def escape_label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+metrics = MetricsRegistry('rank_checker')
+
+class StackSampler:
+    """
+    Sampling profiler for request threads. One daemon thread wakes every
+    interval and records the Python stack of each registered thread as a
+    folded "outer;inner" string, the input format of flame graph tools.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.active = {}  # thread ident -> Counter of folded stacks
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def start(self, thread_id):
+        with self.lock:
+            self.active[thread_id] = Counter()
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name='stack-sampler', daemon=True)
+                self.thread.start()
+
+    def stop(self, thread_id):
+        """Stop sampling a thread and return its folded stack counts"""
+        with self.lock:
+            return self.active.pop(thread_id, Counter())
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self.lock:
+                for thread_id, stacks in self.active.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        stacks[fold_stack(frame)] += 1
+
+def fold_stack(frame):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+stack_sampler = StackSampler(PROFILE_INTERVAL) if PROFILE_SLOW_REQUESTS else None
+
+def save_request_profile(stacks, seconds, route):
+    """
+    Write the folded stacks of a slow request to PROFILE_FOLDER, keeping
+    only the PROFILE_KEEP slowest profiles. File names start with the
+    duration, so they sort slowest last.
+    """
+    os.makedirs(PROFILE_FOLDER, exist_ok=True)
+    name = f"{int(seconds * 1000):08d}ms-{int(time.time())}-{secure_filename(route) or 'root'}.folded"
+    with open(os.path.join(PROFILE_FOLDER, name), 'w', encoding='utf-8') as f:
+        f.writelines(f"{stack} {count}\n" for stack, count in stacks.most_common())
+    profiles = sorted(entry for entry in os.listdir(PROFILE_FOLDER) if entry.endswith('.folded'))
+    for stale in profiles[:-PROFILE_KEEP]:
+        try:
+            os.remove(os.path.join(PROFILE_FOLDER, stale))
+        except OSError:
+            pass
+
+# Generation of the live snapshot, bumped whenever the dataset changes; part
+# of every search cache key so a response computed against old data can
+# never be served. Workers serving the same snapshot agree on it, so cursors
+# stay valid across workers.
+data_generation = 0
+
+def bump_data_generation(generation=None):
+    global data_generation
+    data_generation = data_generation + 1 if generation is None else generation
+    search_cache.clear()
+
+def normalize_filter(value):
+    """Normalize an optional string filter so equivalent requests share a cache key"""
+    if not value:
+        return ''
+    return value.strip() if isinstance(value, str) else str(value)
+
+# Background upload jobs. A single worker keeps uploads in submission order;
+# parsing runs off the request thread and only the final swap takes data_lock.
+# Job records are files in JOB_FOLDER, so whichever worker process answers
+# /admin/jobs sees the jobs every other worker accepted. Only the worker
+# that accepted a job writes its record.
+ingest_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ingest')
+ingest_jobs_lock = threading.Lock()
+
+def submit_ingest_job(file, mode, period=None, dry_run=False):
+    """Save an uploaded file and queue it for processing (or only validation, with dry_run); returns the job"""
+    job_id = secrets.token_hex(8)
+    filename = secure_filename(file.filename)
+    filepath = os.path.join(app.config['UPLOAD_FOLDER'], f"{job_id}_{filename}")
+    file.save(filepath)
+
+    job = {
+        "id": job_id,
+        "filename": filename,
+        "mode": mode,
+        "period": list(period) if period else None,
+        "dry_run": dry_run,
+        "status": "queued",
+        "phase": "queued",
+        "rows_processed": 0,
+        "message": "",
+        "errors": [],
+        "validation": None,
+        "report": False,
+        "created_at": time.time(),
+        "started_at": None,
+        "finished_at": None
+    }
+    save_ingest_job(job)
+    jobs = list_ingest_jobs()
+    finished = [old["id"] for old in reversed(jobs) if old["status"] in ("succeeded", "failed")]
+    for key in finished[:max(0, len(jobs) - MAX_INGEST_JOBS)]:
+        for path in (ingest_job_path(key), validation_report_path(key)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    ingest_executor.submit(run_ingest_job, job_id, filepath, mode, period, dry_run)
+    return job
+
+def ingest_job_path(job_id):
+    return os.path.join(JOB_FOLDER, f"{job_id}.json")
+
+def save_ingest_job(job):
+    """Publish a job's record with a single rename, so readers in other processes never see half of it"""
+    write_file_atomically(ingest_job_path(job["id"]), json.dumps(job, ensure_ascii=False).encode('utf-8'))
+
+def get_ingest_job(job_id):
+    """Return a job's state, or None"""
+    if not re.fullmatch(r'[0-9a-f]{16}', job_id):
+        return None
+    try:
+        with open(ingest_job_path(job_id), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def list_ingest_jobs():
+    """Every job on record, newest first"""
+    jobs = [get_ingest_job(name[:-len('.json')]) for name in os.listdir(JOB_FOLDER) if name.endswith('.json')]
+    return sorted((job for job in jobs if job), key=lambda job: job["created_at"], reverse=True)
+
+def update_ingest_job(job_id, **fields):
+    with ingest_jobs_lock:
+        job = get_ingest_job(job_id)
+        if job is not None:
+            job.update(fields)
+            save_ingest_job(job)
+
+def validation_report_path(job_id):
+    """Where the annotated validation workbook of an upload job is kept"""
+    return os.path.join(app.config['UPLOAD_FOLDER'], f"{job_id}_validation.xlsx")
+
+def run_ingest_job(job_id, filepath, mode, period=None, dry_run=False):
+    update_ingest_job(job_id, status="running", phase="reading", started_at=time.time())
+    try:
+        validation = {}
+        success, message = process_excel_file(
+            filepath, mode,
+            progress=lambda phase, rows: update_ingest_job(job_id, phase=phase, rows_processed=rows),
+            period=period, dry_run=dry_run, validation=validation)
+        if validation:
+            update_ingest_job(job_id, validation=dict(validation, issues=validation["issues"][:MAX_JOB_ISSUES]))
+        if validation.get("issues"):
+            # Written while the upload is still on disk; the job keeps only the first issues
+            update_ingest_job(job_id, phase="reporting")
+            try:
+                write_validation_workbook(filepath, validation, validation_report_path(job_id))
+                update_ingest_job(job_id, report=True)
+            except Exception:
+                traceback.print_exc()
+        if success:
+            update_ingest_job(job_id, status="succeeded", phase="done", message=message)
+        else:
+            update_ingest_job(job_id, status="failed", phase="done", message=message, errors=[message])
+    except Exception as e:
+        traceback.print_exc()
+        update_ingest_job(job_id, status="failed", phase="done", message=str(e), errors=[str(e)])
+    finally:
+        update_ingest_job(job_id, finished_at=time.time())
+        if os.path.exists(filepath):
+            os.remove(filepath)
+
+# Seat-allocation simulator
+MERIT_LIST_COLUMNS = ('rank', 'category', 'gender', 'preferences')  # Required, matched case-insensitively
+PREFERENCE_SEPARATORS = str.maketrans(";,|", "   ")
+GIRL_VALUES = {"F", "FEMALE", "GIRL", "GIRLS"}
+BOY_VALUES = {"M", "MALE", "BOY", "BOYS"}
+simulation_executor = None  # Created by get_simulation_executor()
+simulation_executor_lock = threading.Lock()
+
+def seat_matrix(table):
+    """
+    Seats of every branch row split into the CUTOFF_KEYS pools, as an int64
+    rows x CUTOFF_KEYS matrix: SEAT_QUOTAS per category (largest remainder,
+    so each row's pools add up to its seats), then GIRLS_SEAT_SHARE of each
+    category's seats into its girls pool.
+    """
+    seats = np.nan_to_num(table_facets(table)["seats"], nan=0).clip(min=0).astype(np.int64)
+    shares = np.array([SEAT_QUOTAS[category] for category in categories])
+    exact = seats[:, None] * shares
+    per_category = np.floor(exact).astype(np.int64)
+    missing = seats - per_category.sum(axis=1)
+    order = np.argsort(-(exact - per_category), axis=1, kind='stable')
+    position = np.empty_like(order)
+    np.put_along_axis(position, order, np.arange(len(categories)), axis=1)
+    per_category += position < missing[:, None]
+
+    girls = np.round(per_category * GIRLS_SEAT_SHARE).astype(np.int64)
+    capacity = np.zeros((len(seats), len(CUTOFF_KEYS)), dtype=np.int64)
+    for position, keys in enumerate(categories.values()):
+        capacity[:, CUTOFF_KEYS.index(keys[0])] = per_category[:, position] - girls[:, position]
+        capacity[:, CUTOFF_KEYS.index(keys[1])] = girls[:, position]
+    return capacity
+
+def candidate_pools(category, girl):
+    """Seat pools (CUTOFF_KEYS columns) open to a candidate, in the order they are tried"""
+    pools = []
+    for pool_category in dict.fromkeys(("OC", category)):
+        general, girls = categories[pool_category]
+        pools.append(CUTOFF_KEYS.index(general))
+        if girl:
+            pools.append(CUTOFF_KEYS.index(girls))
+    return tuple(pools)
+
+def read_merit_list(filepath, table):
+    """
+    Read a merit list upload (Rank, Category, Gender and Preferences, a list
+    of INSTCODE-BRANCHCODE separated by ; , | or spaces) and return
+    (candidates, report). Candidates are sorted by rank, with their pool
+    tuple and an int32 candidates x preferences matrix of table rows padded
+    with -1.
+    """
+    import pandas as pd
+    facets = table_facets(table)
+    text_index = table_text_index(table)
+    branch_codes = [facets["branch_code"]["values"][code] for code in facets["branch_code"]["codes"].tolist()]
+    branch_rows = {}
+    for row, (entry, branch_code) in enumerate(zip(text_index["entry_rows"].tolist(), branch_codes)):
+        branch_rows.setdefault(f"{text_index['entries'][entry][0]}-{branch_code}".upper(), row)
+
+    class_pools = [candidate_pools(category, girl) for category in categories for girl in (False, True)]
+    category_numbers = {category: number for number, category in enumerate(categories)}
+    ranks, classes, matrices = [], [], []
+    report = {"rows": 0, "skipped_rows": 0, "unknown_preferences": 0, "errors": []}
+
+    def skip(row_number, message):
+        report["skipped_rows"] += 1
+        if len(report["errors"]) < 20:
+            report["errors"].append(f"Row {row_number}: {message}")
+
+    for df in iter_upload_chunks(filepath):
+        df = df.rename(columns=lambda column: str(column).strip().lower())
+        missing_columns = [column for column in MERIT_LIST_COLUMNS if column not in df.columns]
+        if missing_columns:
+            raise ValueError(f"Missing required columns: {', '.join(missing_columns)}")
+        first_row = report["rows"] + 2  # Row 1 is the header
+        report["rows"] += len(df)
+
+        rank_values, _ = coerce_numeric_column(df['rank'])
+        chunk_categories = df['category'].astype(str).str.strip().str.upper().str.replace('_', '-')
+        genders = df['gender'].astype(str).str.strip().str.upper()
+
+        # Preferences are split and looked up column-wise, then packed into a padded matrix
+        tokens = df['preferences'].fillna('').astype(str).str.upper()
+        tokens = tokens.str.translate(PREFERENCE_SEPARATORS).str.split().explode()
+        tokens = tokens[tokens != '']
+        token_rows = tokens.map(branch_rows)
+        report["unknown_preferences"] += int(token_rows.isna().sum())
+        token_rows = token_rows.dropna().astype(np.int64)
+        position = token_rows.groupby(level=0).cumcount().to_numpy()
+        keep = position < MAX_SIMULATION_PREFERENCES
+        owners = df.index.get_indexer(token_rows.index[keep])
+        matrix = np.full((len(df), int(position[keep].max()) + 1 if keep.any() else 0), -1, dtype=np.int32)
+        matrix[owners, position[keep]] = token_rows.to_numpy()[keep]
+
+        valid = np.zeros(len(df), dtype=bool)
+        for offset, (rank, category, gender) in enumerate(zip(rank_values.tolist(), chunk_categories.tolist(),
+                                                             genders.tolist())):
+            if not rank >= 1:
+                skip(first_row + offset, "rank must be a positive number")
+            elif category not in category_numbers:
+                skip(first_row + offset, f"unknown category '{category}'")
+            elif gender not in GIRL_VALUES and gender not in BOY_VALUES:
+                skip(first_row + offset, f"unknown gender '{gender}'")
+            else:
+                valid[offset] = True
+                ranks.append(int(rank))
+                classes.append(category_numbers[category] * 2 + (gender in GIRL_VALUES))
+        matrices.append(matrix[valid])
+
+    order = np.argsort(np.asarray(ranks, dtype=np.int64), kind='stable')
+    width = max((matrix.shape[1] for matrix in matrices), default=0)
+    matrix = np.concatenate([np.pad(matrix, ((0, 0), (0, width - matrix.shape[1])), constant_values=-1)
+                             for matrix in matrices]) if matrices else np.empty((0, 0), dtype=np.int32)
+    return {
+        "ranks": np.asarray(ranks, dtype=np.int64)[order],
+        "pools": [class_pools[number] for number in np.asarray(classes, dtype=np.int64)[order].tolist()],
+        "preferences": matrix[order]
+    }, report
+
+def perturb_preferences(preferences, probability, seed):
+    """Copy of a preference matrix with each adjacent pair swapped with the given probability"""
+    rng = np.random.default_rng(seed)
+    preferences = preferences.copy()
+    rows = np.arange(len(preferences))
+    for position in range(preferences.shape[1] - 1):
+        swap = rows[(rng.random(len(preferences)) < probability) & (preferences[:, position + 1] >= 0)]
+        preferences[swap, position], preferences[swap, position + 1] = (
+            preferences[swap, position + 1], preferences[swap, position])
+    return preferences
+
+def allocate_seats(capacity, ranks, pools, preferences):
+    """
+    One counselling-style allocation: candidates in rank order take their
+    first preference with a free seat in a pool open to them. Returns the
+    closing rank (0 if nobody was admitted) and the seats filled of every
+    pool, as flat rows * CUTOFF_KEYS arrays, and the number of candidates
+    placed.
+    """
+    remaining = capacity.ravel().tolist()
+    closing = [0] * len(remaining)
+    width = len(CUTOFF_KEYS)
+    placed = 0
+    for rank, candidate_pools, choices in zip(ranks.tolist(), pools, preferences.tolist()):
+        for branch in choices:
+            if branch < 0:
+                break
+            base = branch * width
+            for col in candidate_pools:
+                if remaining[base + col]:
+                    remaining[base + col] -= 1
+                    closing[base + col] = rank
+                    placed += 1
+                    break
+            else:
+                continue
+            break
+    return np.array(closing, dtype=np.int64), capacity.ravel() - np.array(remaining, dtype=np.int64), placed
+
+def run_simulation(state, run):
+    """Run number run of a simulation; run 0 uses the preferences as given"""
+    preferences = state["preferences"]
+    if run:
+        preferences = perturb_preferences(preferences, state["perturbation"], (state["seed"], run))
+    return allocate_seats(state["capacity"], state["ranks"], state["pools"], preferences)
+
+def run_simulations(state, runs):
+    return [run_simulation(state, run) for run in runs]
+
+def get_simulation_executor():
+    """
+    The simulation process pool, started on first use and kept for the life
+    of the process. Workers are spawned, not forked, so none inherits this
+    server's threads and locks.
+    """
+    global simulation_executor
+    with simulation_executor_lock:
+        if simulation_executor is None:
+            simulation_executor = ProcessPoolExecutor(max_workers=SIMULATION_WORKERS,
+                                                      mp_context=multiprocessing.get_context('spawn'))
+        return simulation_executor
+
+def simulate_allocation(table, candidates, runs=1, perturbation=0.1, seed=0):
+    """
+    Allocate seats for a merit list runs times, the first with the
+    preferences as given and the rest over randomly perturbed copies, in a
+    process pool. Returns per-pool closing ranks and seats filled stacked
+    as runs x pools arrays, and the candidates placed per run.
+    """
+    global simulation_executor
+    state = dict(candidates, capacity=seat_matrix(table), perturbation=perturbation, seed=seed)
+    workers = min(runs, SIMULATION_WORKERS)
+    if workers == 1:
+        outcomes = run_simulations(state, range(runs))
+    else:
+        # One contiguous slice of runs per worker, so the state is sent once per worker
+        bounds = [runs * worker // workers for worker in range(workers + 1)]
+        executor = get_simulation_executor()
+        try:
+            futures = [executor.submit(run_simulations, state, range(start, end))
+                       for start, end in zip(bounds, bounds[1:])]
+            outcomes = [outcome for future in futures for outcome in future.result()]
+        except BrokenProcessPool:
+            # A worker died; the next simulation starts a new pool
+            with simulation_executor_lock:
+                if simulation_executor is executor:
+                    simulation_executor = None
+            raise
+    closing, filled, placed = zip(*outcomes)
+    return state["capacity"], np.stack(closing), np.stack(filled), list(placed)
+
+def simulation_report(table, capacity, closing, filled):
+    """One row per branch and seat pool with seats: simulated closing ranks next to the current cutoff"""
+    facets = table_facets(table)
+    text_index = table_text_index(table)
+    slots = np.flatnonzero(capacity.ravel())
+    slot_closing = closing[:, slots].astype(np.float64)
+    slot_closing[slot_closing == 0] = np.nan
+    admitted = ~np.isnan(slot_closing).all(axis=0)
+    median = np.full(len(slots), np.nan)
+    median[admitted] = np.nanmedian(slot_closing[:, admitted], axis=0)
+    lowest = np.nanmin(np.where(admitted, slot_closing, 0), axis=0)
+    highest = np.nanmax(np.where(admitted, slot_closing, 0), axis=0)
+    mean_filled = filled[:, slots].mean(axis=0)
+
+    width = len(CUTOFF_KEYS)
+    results = []
+    for number, slot in enumerate(slots.tolist()):
+        row, col = divmod(slot, width)
+        inst_code, name, _ = text_index["entries"][int(text_index["entry_rows"][row])]
+        current = int(table["ranks"][row, col])
+        results.append({
+            "inst_code": inst_code,
+            "name": name,
+            "branch_code": facets["branch_code"]["values"][facets["branch_code"]["codes"][row]],
+            "branch": facets["branch"]["values"][facets["branch"]["codes"][row]],
+            "category": CUTOFF_CATEGORIES[col],
+            "cutoff_key": CUTOFF_KEYS[col],
+            "seats": int(capacity.ravel()[slot]),
+            "filled": round(float(mean_filled[number]), 2),
+            "closing_rank": int(median[number]) if admitted[number] else None,
+            "closing_rank_min": int(lowest[number]) if admitted[number] else None,
+            "closing_rank_max": int(highest[number]) if admitted[number] else None,
+            "current_cutoff": None if current == MISSING_CUTOFF else current
         })
+    return results
+
+# Static result shards. `flask export-shards` pre-renders the plain
+# "rank, category" /search answer of every rank into gzip JSON files that a
+# static file server or CDN can serve. A shard holds every hit within the
+# window of any rank in its bucket; the front end picks the hits for the
+# exact rank and orders and scores them the way /search does.
+
+def search_window(rank):
+    """The [lower, upper] cutoff window /search matches for rank"""
+    threshold = max(1000, int(rank * 0.1))
+    return max(1, rank - threshold), rank + threshold
+
+def shard_buckets(max_rank):
+    """(first, last) rank of the buckets covering 1..max_rank, widening with rank as the windows do"""
+    buckets = []
+    start = 1
+    while start <= max_rank:
+        width = max(SHARD_MIN_BUCKET, int(start * SHARD_BUCKET_SHARE) // SHARD_MIN_BUCKET * SHARD_MIN_BUCKET)
+        buckets.append((start, start + width - 1))
+        start += width
+    return buckets
+
+def shard_hits(table, category, start, end):
+    """
+    Hits within the window of any rank in [start, end], ordered by cutoff
+    rank, then row and column. Sorting by sort_keys also keeps the query on
+    the in-memory index, never on sqlite connections a forked worker shares.
+    """
+    lower_bound, upper_bound = search_window(start)[0], search_window(end)[1]
+    return find_hits(start, lower_bound, upper_bound, category, table=table,
+                     sort_keys=lambda hit_rows, hit_cols, hit_ranks: hit_ranks)
+
+def shard_row(college):
+    """The create_result() fields that depend only on the row"""
+    result = create_result(college, 0, "", "")
+    for field in ("cutoff_rank", "category", "gender", "admission_probability", "score"):
+        del result[field]
+    return result
+
+def row_fingerprints(table):
+    """uint64 hash of the shard_row() of every row of a table"""
+    return np.array([int.from_bytes(hashlib.blake2b(json.dumps(shard_row(college), sort_keys=True, default=str)
+                                                    .encode('utf-8'), digest_size=8).digest(), 'little')
+                     for college in table["colleges"]], dtype=np.uint64)
+
+def shard_digest(category, start, end, fingerprints, model, hits):
+    """Digest of everything a shard is rendered from: its bucket, rows, cutoffs and admission model"""
+    hit_rows, hit_cols, hit_ranks = hits
+    digest = hashlib.blake2b(f"{SHARD_FORMAT}:{category}:{start}:{end}".encode('utf-8'), digest_size=16)
+    for array in (fingerprints[hit_rows], hit_cols, hit_ranks,
+                  model["mean"][hit_rows, hit_cols], model["spread"][hit_rows, hit_cols]):
+        digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()
+
+def render_shard(table, category, hits):
+    """
+    Shard payload. rows holds the distinct rows in table order and hits one
+    [row number, column, cutoff rank, mean, spread] list per hit, with the
+    admission model's log-rank mean and spread for the client to score.
+    """
+    hit_rows, hit_cols, hit_ranks = hits
+    rows, numbers = np.unique(hit_rows, return_inverse=True)
+    model = table_admission_model(table)
+    colleges = table["colleges"]
+    return {
+        "format": SHARD_FORMAT,
+        "category": category,
+        "columns": [[category or CUTOFF_CATEGORIES[col], "GIRLS" if "GIRLS" in key else "BOYS"]
+                    for col, key in enumerate(CUTOFF_KEYS)],
+        "rows": [shard_row(colleges[row]) for row in rows.tolist()],
+        "hits": [list(hit) for hit in zip(numbers.tolist(), hit_cols.tolist(), hit_ranks.tolist(),
+                                          model["mean"][hit_rows, hit_cols].tolist(),
+                                          model["spread"][hit_rows, hit_cols].tolist())]
+    }
+
+def write_file_atomically(path, data):
+    """Write bytes to path through a temporary file, so readers never see a partial file"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(prefix='.partial-', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def export_shard(task):
+    """Render one (category, start, end, path, generation) shard; runs in a worker process"""
+    category, start, end, path, generation = task
+    warm_up()
+    if data_generation != generation:
+        raise RuntimeError(f"Data changed from generation {generation} to {data_generation} during the export")
+    table = cutoff_table
+    payload = render_shard(table, category, shard_hits(table, category, start, end))
+    data = gzip.compress(json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8'), mtime=0)
+    write_file_atomically(path, data)
+    return len(data)
+
+def export_shards(folder=SHARD_FOLDER, workers=SHARD_WORKERS):
+    """
+    Pre-render the shard of every category and rank bucket into folder and
+    write its manifest.json, stamped with the data generation. Shard files
+    are named by the digest of their input, so only shards whose rows,
+    cutoffs or model changed are rendered again, in a process pool, and a
+    CDN may cache them forever. Files the manifest no longer lists are
+    removed. Returns (manifest, shards rendered).
+    """
+    table = cutoff_table
+    generation = data_generation
+    fingerprints = row_fingerprints(table)
+    model = table_admission_model(table)
+    buckets = shard_buckets(int(table["ranks"].max(initial=0)))
+    manifest = {"format": SHARD_FORMAT, "version": generation, "generated_at": time.time(), "shards": {}}
+    tasks = []
+    for category in ("", *categories):
+        entries = manifest["shards"][category] = []
+        for start, end in buckets:
+            hits = shard_hits(table, category, start, end)
+            digest = shard_digest(category, start, end, fingerprints, model, hits)
+            name = f"{category or 'ALL'}/{start}-{end}.{digest[:16]}.json"
+            entries.append({"start": start, "end": end, "file": name, "count": len(hits[0])})
+            path = os.path.join(folder, name + '.gz')
+            if not os.path.exists(path):
+                tasks.append((category, start, end, path, generation))
+
+    if len(tasks) > 1 and workers > 1:
+        # Spawned workers load the stored data themselves; forked ones already have it
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), initializer=warm_up) as executor:
+            list(executor.map(export_shard, tasks))
+    else:
+        for task in tasks:
+            export_shard(task)
+
+    # The manifest goes out last, so it never lists a shard that is not there yet
+    write_file_atomically(os.path.join(folder, 'manifest.json'),
+                          json.dumps(manifest, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+    listed = {os.path.normpath(os.path.join(folder, entry["file"] + '.gz'))
+              for entries in manifest["shards"].values() for entry in entries}
+    for directory, _, names in os.walk(folder):
+        for name in names:
+            path = os.path.normpath(os.path.join(directory, name))
+            if name.endswith('.json.gz') and path not in listed:
+                os.remove(path)
+    return manifest, len(tasks)
+
+@app.cli.command('export-shards')
+@click.option('--out', default=SHARD_FOLDER, show_default=True, help="Folder to write the shards to")
+@click.option('--workers', default=SHARD_WORKERS, show_default=True, type=click.IntRange(1),
+              help="Processes rendering shards")
+def export_shards_command(out, workers):
+    """Pre-render /search answers into static shards (run: flask --app app export-shards)"""
+    warm_up()
+    started = time.perf_counter()
+    manifest, rendered = export_shards(out, workers)
+    total = sum(len(entries) for entries in manifest["shards"].values())
+    print(f"Exported generation {manifest['version']} to {out}: {rendered} of {total} shards rendered "
+          f"in {time.perf_counter() - started:.1f}s")
+
+# Public Routes
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    if stack_sampler is not None:
+        stack_sampler.start(threading.get_ident())
+
+@app.after_request
+def record_request_latency(response):
+    started = g.get('request_started')
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.observe("request_duration_seconds", time.perf_counter() - started,
+                        route=route, method=request.method, status=response.status_code)
+    return response
+
+@app.teardown_request
+def save_slow_request_profile(error=None):
+    if stack_sampler is None:
+        return
+    stacks = stack_sampler.stop(threading.get_ident())
+    started = g.get('request_started')
+    if started is None or not stacks:
+        return
+    seconds = time.perf_counter() - started
+    if seconds >= PROFILE_MIN_SECONDS:
+        try:
+            save_request_profile(stacks, seconds, request.url_rule.rule if request.url_rule else 'unmatched')
+        except OSError as e:
+            print(f"Error saving request profile: {e}")
+
+@app.before_request
+def refresh_data():
+    """Reload the data if another worker stored a new generation; one cheap check per request"""
+    warm_up()
+    identity = storage.identity()
+    if identity is None or identity == table_identity(cutoff_table):
+        return
+    # A writer in this process holds data_lock and remaps when it finishes
+    if data_lock.acquire(blocking=False):
+        try:
+            sync_data()
+        except Exception as e:
+            print(f"Error loading {storage.name} data: {e}")
+        finally:
+            data_lock.release()
+
+@app.route('/')
+def index():
+    try:
+        facets = table_facets(cutoff_table)
+        return cached_response("index", (), lambda: render_template('index.html', 
+                            categories=categories.keys(), 
+                            branch_names=sorted(facets["branch"]["present"]),
+                            college_types=sorted(facets["college_type"]["present"]),
+                            data_generation=data_generation,
+                            shard_url=SHARD_URL), mimetype='text/html')
+    except Exception as e:
+        print(f"Error in index route: {e}")
+        return "An error occurred", 500
+
+@app.route('/search', methods=['GET', 'POST'])
+def search():
+    try:
+        data = request_data()
+        if not data or not isinstance(data, dict):
+            return jsonify({"error": "Invalid or missing JSON data"}), 400
+            
+        query, error = parse_search_query(data)
+        if error:
+            return jsonify({"error": error}), 400
+        page, error = parse_page_options(data)
+        if error:
+            return jsonify({"error": error}), 400
         
+        if page["stream"]:
+            return stream_search(query, page)
+        
+        query_key = (query["rank"], query["lower_bound"], query["upper_bound"], query["category"],
+                     query["branch"], query["college_type"], query["filters"], query["fee_range"],
+                     query["college"], query["sort"], query["weights"], query["preferences"],
+                     page["limit"], page["cursor"], page["fields"])
+        return cached_response("search", query_key, lambda: search_page(query, page))
+        
+    except Exception as e:
+        app.logger.error(f"Error in search route: {str(e)}")
+        app.logger.error(traceback.format_exc())
+        return jsonify({
+            "success": False,
+            "error": "Internal server error",
+            "message": "Please try again later"
+        }), 500
+
+@app.route('/search/batch', methods=['POST'])
+def search_batch():
+    """
+    Run many searches in one request. Body: {"queries": [{rank, category,
+    branch, college_type}, ...], "format": "json" | "csv" | "xlsx"}
+    """
+    try:
+        data = request.get_json()
+        if not data or not isinstance(data, dict):
+            return jsonify({"error": "Invalid or missing JSON data"}), 400
+
+        raw_queries = data.get('queries')
+        if not isinstance(raw_queries, list) or not raw_queries:
+            return jsonify({"error": "queries must be a non-empty list"}), 400
+        if len(raw_queries) > MAX_BATCH_QUERIES:
+            return jsonify({"error": f"At most {MAX_BATCH_QUERIES} queries are allowed per batch"}), 400
+
+        export_format = (data.get('format') or request.args.get('format') or 'json').lower()
+        if export_format not in ('json', 'csv', 'xlsx'):
+            return jsonify({"error": "format must be one of json, csv, xlsx"}), 400
+
+        queries, errors = [], []
+        for raw_query in raw_queries:
+            query, error = parse_search_query(raw_query) if isinstance(raw_query, dict) else (None, "Query must be an object")
+            queries.append(query)
+            errors.append(error)
+
+        table = cutoff_table
+        valid_queries = [query for query in queries if query]
+        valid_hits = iter(find_hits_batch(valid_queries, table))
+
+        batch_results = []
+        for query, error in zip(queries, errors):
+            if error:
+                batch_results.append({"success": False, "error": error, "count": 0, "results": []})
+                continue
+            hits = next(valid_hits)
+            results = build_results(table, *hits, query["category"], rank=query["rank"],
+                                    scores=query_scores(table, query, hits))
+            batch_results.append({
+                "success": True,
+                "query": {key: query[key] for key in ('rank', 'category', 'branch', 'college_type', 'sort')},
+                "count": len(results),
+                "results": results
+            })
+
+        if export_format != 'json':
+            return export_batch_results(batch_results, export_format)
+
+        return jsonify({
+            "success": True,
+            "count": len(batch_results),
+            "results": batch_results
+        })
+
+    except Exception as e:
+        app.logger.error(f"Error in batch search route: {str(e)}")
+        app.logger.error(traceback.format_exc())
+        return jsonify({
+            "success": False,
+            "error": "Internal server error",
+            "message": "Please try again later"
+        }), 500
+
+@app.route('/search/facets', methods=['GET', 'POST'])
+def search_facets():
+    """
+    Result counts per facet value for a search. Body: the /search query
+    fields. Each facet is counted with every filter applied except its own,
+    so the counts say how many results picking that value would give.
+    """
+    try:
+        data = request_data()
+        if not data or not isinstance(data, dict):
+            return jsonify({"error": "Invalid or missing JSON data"}), 400
+
+        query, error = parse_search_query(data)
+        if error:
+            return jsonify({"error": error}), 400
+
+        query_key = (query["rank"], query["lower_bound"], query["upper_bound"], query["category"],
+                     query["branch"], query["college_type"], query["filters"], query["fee_range"],
+                     query["college"])
+
+        def build():
+            count, facets = facet_counts(cutoff_table, query)
+            return {"success": True, "count": count, "facets": facets}
+
+        return cached_response("facets", query_key, build)
+
     except Exception as e:
-        app.logger.error(f"Error in search route: {str(e)}")
+        app.logger.error(f"Error in facets route: {str(e)}")
         app.logger.error(traceback.format_exc())
         return jsonify({
             "success": False,
@@ -462,7 +3017,978 @@ def search():
             "message": "Please try again later"
         }), 500
 
-def create_result(college, cutoff_rank, category, cutoff_key):
+@app.route('/colleges/suggest')
+def suggest_colleges():
+    """Autocomplete institutes by name, inst_code or place. Args: q, limit"""
+    text = request.args.get('q', '')
+    if len(text) > MAX_TEXT_QUERY:
+        return jsonify({"error": f"q must be at most {MAX_TEXT_QUERY} characters"}), 400
+    try:
+        limit = int(request.args.get('limit', DEFAULT_SUGGEST_LIMIT))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    if not 1 <= limit <= MAX_SUGGEST_LIMIT:
+        return jsonify({"error": f"limit must be between 1 and {MAX_SUGGEST_LIMIT}"}), 400
+
+    def build():
+        text_index = table_text_index(cutoff_table)
+        with metrics.timer("search_stage_seconds", stage="suggest"):
+            numbers, scores = match_institutes(text_index, text)
+        suggestions = []
+        for number, score in zip(numbers[:limit].tolist(), scores[:limit].tolist()):
+            inst_code, name, place = text_index["entries"][number]
+            suggestions.append({"inst_code": inst_code, "name": name, "place": place, "score": round(score, 3)})
+        return {"query": text, "suggestions": suggestions}
+
+    return cached_response("suggest", (text, limit), build)
+
+@app.route('/shards/<path:name>')
+def shard_file(name):
+    """
+    Serve the shard folder as a static server with precompressed files
+    would (nginx gzip_static): shards are stored gzipped and sent as they
+    are. Shard names change with their content, so they never expire; the
+    manifest is revalidated on every use.
+    """
+    path = safe_join(SHARD_FOLDER, name if name == 'manifest.json' else name + '.gz')
+    if path is None or not name.endswith('.json') or not os.path.isfile(path):
+        return jsonify({"error": "Shard not found"}), 404
+    with open(path, 'rb') as f:
+        data = f.read()
+    response = Response(data, mimetype='application/json')
+    if name == 'manifest.json':
+        response.headers['Cache-Control'] = 'no-cache'
+    else:
+        response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+        response.headers['Vary'] = 'Accept-Encoding'
+        if request.accept_encodings.best_match(['gzip']):
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response.set_data(gzip.decompress(data))
+    response.add_etag()
+    return response.make_conditional(request)
+
+def export_batch_results(batch_results, export_format):
+    """Flatten batch results to one row per match and send them as CSV or Excel"""
+    import pandas as pd
+    rows = []
+    for number, batch_result in enumerate(batch_results, start=1):
+        query = batch_result.get("query", {})
+        for result in batch_result["results"]:
+            row = {
+                "query_number": number,
+                "query_rank": query.get("rank"),
+                "query_category": query.get("category"),
+                "query_branch": query.get("branch"),
+                "query_college_type": query.get("college_type")
+            }
+            row.update(result)
+            rows.append(row)
+    df = pd.DataFrame(rows)
+
+    output = io.BytesIO()
+    if export_format == 'csv':
+        output.write(df.to_csv(index=False).encode('utf-8'))
+        output.seek(0)
+        return send_file(output, as_attachment=True, download_name='EAPCET_Batch_Results.csv',
+                         mimetype='text/csv')
+
+    df.to_excel(output, sheet_name='Results', index=False, engine='openpyxl')
+    output.seek(0)
+    return send_file(output, as_attachment=True, download_name='EAPCET_Batch_Results.xlsx',
+                     mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+
+def parse_page_options(data):
+    """
+    Validate the optional limit/cursor/fields/stream options of a search
+    request and return (page, error)
+    """
+    limit = data.get('limit')
+    cursor = data.get('cursor') or None
+    fields = data.get('fields') or None
+    stream = bool(data.get('stream')) or 'application/x-ndjson' in request.headers.get('Accept', '')
+
+    if limit is None and cursor is not None:
+        limit = DEFAULT_SEARCH_LIMIT
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except (ValueError, TypeError):
+            return None, "limit must be a valid integer"
+        if not 1 <= limit <= MAX_SEARCH_LIMIT:
+            return None, f"limit must be between 1 and {MAX_SEARCH_LIMIT}"
+
+    after = None
+    if cursor is not None:
+        after = decode_cursor(cursor)
+        if after is None:
+            return None, "Invalid or expired cursor, please search again"
+
+    if fields is not None:
+        if isinstance(fields, str):
+            fields = [field.strip() for field in fields.split(',') if field.strip()]
+        if not isinstance(fields, list) or not all(field in RESULT_FIELDS for field in fields):
+            return None, f"fields must be a subset of: {', '.join(RESULT_FIELDS)}"
+        fields = tuple(dict.fromkeys(fields))
+
+    return {"limit": limit, "cursor": cursor, "after": after, "fields": fields, "stream": stream}, None
+
+def encode_cursor(hits, sort_keys, rank):
+    """
+    Opaque cursor for the position after the last of hits, tied to the data
+    generation. sort_keys is the hit_sort_keys() of the query (None for
+    proximity to rank).
+    """
+    sort_keys = sort_keys or distance_sort_keys(rank)
+    hit_rows, hit_cols, hit_ranks = (array[-1:] for array in hits)
+    return f"{data_generation}.{int(sort_keys(hit_rows, hit_cols, hit_ranks)[0])}.{hit_rows[0]}.{hit_cols[0]}"
+
+def decode_cursor(cursor):
+    """Return the (sort key, row, col) position of a cursor, or None if it is invalid or stale"""
+    try:
+        generation, sort_key, row, col = (int(part) for part in str(cursor).split('.'))
+    except ValueError:
+        return None
+    if generation != data_generation:
+        return None
+    return sort_key, row, col
+
+def search_page(query, page):
+    """Build the /search JSON payload for a query and its page options"""
+    table = cutoff_table
+    sort_keys = hit_sort_keys(table, query)
+    hits = find_hits(query["rank"], query["lower_bound"], query["upper_bound"], query["category"],
+                     query["branch"], query["college_type"], table, page["limit"], page["after"],
+                     query_row_mask(table, query), sort_keys)
+    with metrics.timer("search_stage_seconds", stage="create_result"):
+        results = build_results(table, *hits, query["category"], page["fields"], query["rank"],
+                                query_scores(table, query, hits))
+    payload = {
+        "success": True,
+        "count": len(results),
+        "results": results
+    }
+    if page["limit"] is not None:
+        has_more = len(results) == page["limit"]
+        payload["next_cursor"] = encode_cursor(hits, sort_keys, query["rank"]) if has_more else None
+    return payload
+
+def stream_search(query, page):
+    """
+    Stream search results as NDJSON, one result per line. Matching is done
+    up front on the arrays; result dicts are built and serialized as the
+    client reads, so the first byte goes out before the last dict exists.
+    """
+    table = cutoff_table
+    sort_keys = hit_sort_keys(table, query)
+    hits = find_hits(query["rank"], query["lower_bound"], query["upper_bound"], query["category"],
+                     query["branch"], query["college_type"], table, page["limit"], page["after"],
+                     query_row_mask(table, query), sort_keys)
+
+    headers = {"X-Result-Count": str(len(hits[0]))}
+    if page["limit"] is not None and len(hits[0]) == page["limit"]:
+        headers["X-Next-Cursor"] = encode_cursor(hits, sort_keys, query["rank"])
+
+    def generate():
+        for result in iter_results(table, *hits, query["category"], page["fields"], query["rank"],
+                                   query_scores(table, query, hits)):
+            yield app.json.dumps(result) + "\n"
+
+    return Response(generate(), mimetype='application/x-ndjson', headers=headers)
+
+def parse_search_query(data):
+    """
+    Validate one search request body and return (query, error). query holds
+    the rank, its window and the normalized filters.
+    """
+    rank_str = data.get('rank', '')
+    if not rank_str:
+        return None, "Rank parameter is required"
+
+    try:
+        rank = int(rank_str)
+        if rank <= 0:
+            return None, "Rank must be a positive integer"
+    except (ValueError, TypeError):
+        return None, "Rank must be a valid integer"
+
+    # Multi-value filters: a single branch/college_type stays a plain
+    # filter that picks a rank index; everything else becomes a row mask
+    single = {"branch": "", "college_type": ""}
+    filters = []
+    for field in FILTER_FIELDS:
+        values, error = parse_filter_values(field, data.get(field))
+        if error:
+            return None, error
+        if field in single and len(values) == 1:
+            single[field] = values[0]
+        elif values:
+            filters.append((field, values))
+
+    fee_range, error = parse_fee_range(data)
+    if error:
+        return None, error
+
+    scoring, error = parse_score_options(data)
+    if error:
+        return None, error
+    sort = data.get('sort') or ('score' if scoring else 'distance')
+    if sort not in SEARCH_SORTS:
+        return None, f"sort must be one of: {', '.join(SEARCH_SORTS)}"
+    if sort == 'score' and not scoring:
+        return None, f"sort=score needs a profile ({', '.join(SCORE_PROFILES)}), weights or preferences"
+    weights, preferences = scoring if sort == 'score' else ((), ())
+
+    college = data.get('college', '')
+    if not isinstance(college, str):
+        return None, "college must be a string"
+    if len(college) > MAX_TEXT_QUERY:
+        return None, f"college must be at most {MAX_TEXT_QUERY} characters"
+
+    lower_bound, upper_bound = search_window(rank)
+    return {
+        "rank": rank,
+        "lower_bound": lower_bound,
+        "upper_bound": upper_bound,
+        "category": normalize_filter(data.get('category', '')),
+        "branch": single["branch"],
+        "college_type": single["college_type"],
+        "filters": tuple(filters),
+        "fee_range": fee_range,
+        "college": normalize_text(college),
+        "sort": sort,
+        "weights": weights,
+        "preferences": preferences
+    }, None
+
+def parse_score_options(data):
+    """
+    Return ((weights, preferences), error) for the profile, weights and
+    prefer_* fields of a request, or (None, None) if it has none. weights
+    is a profile's weights updated with the given ones, e.g. {"fee": 2} or
+    "fee:2,safety:1"; a preference without a weight of its own counts 1.
+    """
+    profile = data.get('profile') or ''
+    raw_weights = data.get('weights') or {}
+    preferences = []
+    for fields in SCORE_PREFERENCES.values():
+        for field in fields:
+            values, error = parse_filter_values(f"prefer_{field}", data.get(f"prefer_{field}"))
+            if error:
+                return None, error
+            if values:
+                preferences.append((field, values))
+    if not profile and not raw_weights and not preferences:
+        return None, None
+
+    if profile not in ('', *SCORE_PROFILES):
+        return None, f"profile must be one of: {', '.join(SCORE_PROFILES)}"
+    if isinstance(raw_weights, str):
+        try:
+            raw_weights = dict(item.split(':', 1) for item in raw_weights.split(',') if item.strip())
+        except ValueError:
+            return None, "weights must look like fee:2,safety:1"
+    if not isinstance(raw_weights, dict):
+        return None, "weights must be an object of component weights"
+
+    weights = dict(SCORE_PROFILES.get(profile, {}))
+    for component, weight in raw_weights.items():
+        component = str(component).strip()
+        if component not in SCORE_COMPONENTS:
+            return None, f"weights must be among: {', '.join(SCORE_COMPONENTS)}"
+        try:
+            weight = float(weight)
+        except (ValueError, TypeError):
+            return None, f"weight of {component} must be a number"
+        if not 0 <= weight < np.inf:
+            return None, f"weight of {component} must be zero or more"
+        weights[component] = weight
+    preferred = {field for field, _ in preferences}
+    for component, fields in SCORE_PREFERENCES.items():
+        if component not in weights and preferred.intersection(fields):
+            weights[component] = 1.0
+    weights = {component: weight for component, weight in weights.items() if weight > 0}
+    if not weights:
+        return None, "At least one score weight must be above zero"
+    return (tuple(sorted(weights.items())), tuple(preferences)), None
+
+def parse_fee_range(data):
+    """Return ((min_fee, max_fee) or None, error) for the optional fee bounds of a request"""
+    if data.get('min_fee') in (None, '') and data.get('max_fee') in (None, ''):
+        return None, None
+    bounds = []
+    for name, default in (('min_fee', -np.inf), ('max_fee', np.inf)):
+        value = data.get(name)
+        try:
+            bounds.append(default if value in (None, '') else float(value))
+        except (ValueError, TypeError):
+            return None, f"{name} must be a number"
+    return tuple(bounds), None
+
+def parse_filter_values(field, raw):
+    """Return (sorted distinct values, error) for a filter given as a string or a list of strings"""
+    if raw is None or raw == '':
+        return (), None
+    if not isinstance(raw, list):
+        raw = [raw]
+    if len(raw) > MAX_FILTER_VALUES:
+        return None, f"At most {MAX_FILTER_VALUES} values are allowed for {field}"
+    if any(isinstance(value, (list, dict)) for value in raw):
+        return None, f"{field} must be a string or a list of strings"
+    return tuple(sorted({normalize_filter(value) for value in raw} - {''})), None
+
+def category_columns(selected_category):
+    """Return the cutoff matrix columns searched for a category ('' means all)"""
+    if not selected_category:
+        return list(range(len(CUTOFF_KEYS)))
+    category_keys = categories.get(selected_category, [])
+    return [col for col, key in enumerate(CUTOFF_KEYS) if key in category_keys]
+
+def select_rank_index(table, selected_branch="", college_type=""):
+    """
+    Pick the rank index (by name) and group code that covers the
+    branch/college_type filters, or (None, None) if a filter value is not
+    in the data
+    """
+    branch_code = table["branch_index"].get(selected_branch, -1) if selected_branch else None
+    type_code = table["type_index"].get(college_type, -1) if college_type else None
+    if branch_code == -1 or type_code == -1:
+        return None, None
+
+    if branch_code is not None and type_code is not None:
+        return "branch_type", branch_code * len(table["type_index"]) + type_code
+    if branch_code is not None:
+        return "branch", branch_code
+    if type_code is not None:
+        return "type", type_code
+    return "all", 0
+
+def clamp_window(lower_bound, upper_bound):
+    """Clamp a rank window to the int32 range of the cutoff matrix"""
+    return max(lower_bound, INT32_MIN), min(upper_bound, INT32_MAX)
+
+def distance_sort_keys(rank):
+    """Sort key function for hits ordered by proximity to rank"""
+    return lambda hit_rows, hit_cols, hit_ranks: np.abs(hit_ranks.astype(np.int64) - rank)
+
+# Components a preference score is made of, each in [0, 1] with 1 best:
+# safety is the admission probability and reach its complement (colleges
+# that close above the rank), closeness how near the cutoff is to the rank
+# within the search window, fee how cheap the tuition is against the
+# table's fee range, and the rest whether a row has a preferred value
+SCORE_COMPONENTS = ("safety", "reach", "closeness", "fee", "location", "college_type", "affiliation")
+# Named weightings of the components
+SCORE_PROFILES = {
+    "safe": {"safety": 3, "closeness": 1},
+    "dream": {"reach": 2, "closeness": 1},
+    "budget": {"fee": 3, "safety": 1},
+}
+# Preference components -> fields whose prefer_<field> values they match
+SCORE_PREFERENCES = {
+    "location": ("dist_code", "place"),
+    "college_type": ("college_type",),
+    "affiliation": ("affiliated_to",),
+}
+
+def hit_scores(table, query, hit_rows, hit_cols, hit_ranks):
+    """
+    Preference score in [0, 1] of each hit of a query sorted by score: the
+    weighted mean of its SCORE_COMPONENTS, each scored for all hits at once
+    """
+    weights = dict(query["weights"])
+    preferences = dict(query["preferences"])
+    facets = table_facets(table)
+    rank = query["rank"]
+    if "safety" in weights or "reach" in weights:
+        probabilities = admission_probability(table_admission_model(table), rank, hit_rows, hit_cols)
+
+    scores = np.zeros(len(hit_rows))
+    for component, weight in weights.items():
+        if component == "safety":
+            values = probabilities
+        elif component == "reach":
+            values = 1 - probabilities
+        elif component == "closeness":
+            values = 1 - np.abs(hit_ranks.astype(np.int64) - rank) / max(query["upper_bound"] - rank, 1)
+        elif component == "fee":
+            fees = facets["tuition_fee"]
+            known = fees[~np.isnan(fees)]
+            low, high = (known.min(), known.max()) if len(known) else (0.0, 0.0)
+            hit_fees = fees[hit_rows]
+            values = (high - hit_fees) / (high - low) if high > low else np.where(np.isnan(hit_fees), np.nan, 1.0)
+            # Rows without a fee score nothing for it
+            values = np.nan_to_num(values, nan=0.0)
+        else:
+            matched = np.zeros(len(hit_rows), dtype=bool)
+            for field in SCORE_PREFERENCES[component]:
+                facet = facets[field]
+                allowed = np.zeros(len(facet["values"]), dtype=bool)
+                for value in preferences.get(field, ()):
+                    if value in facet["index"]:
+                        allowed[facet["index"][value]] = True
+                matched |= allowed[facet["codes"][hit_rows]]
+            values = matched
+        scores += weight * np.clip(values, 0, 1)
+    return scores / sum(weights.values())
+
+def query_scores(table, query, hits):
+    """hit_scores() of a query's hits, or None when it is not sorted by score"""
+    return hit_scores(table, query, *hits) if query["sort"] == "score" else None
+
+def hit_sort_keys(table, query):
+    """
+    Sort key function (int64, smallest first) for the hits of a parsed
+    query, per its sort. None for the distance sort, which find_hits()
+    orders by itself, so the sqlite backend can answer it with one query.
+    """
+    if query["sort"] == "score":
+        return lambda hit_rows, hit_cols, hit_ranks: PROBABILITY_SCALE - np.round(
+            hit_scores(table, query, hit_rows, hit_cols, hit_ranks) * PROBABILITY_SCALE).astype(np.int64)
+    if query["sort"] == "probability":
+        model = table_admission_model(table)
+        rank = query["rank"]
+        return lambda hit_rows, hit_cols, hit_ranks: PROBABILITY_SCALE - np.round(
+            admission_probability(model, rank, hit_rows, hit_cols) * PROBABILITY_SCALE).astype(np.int64)
+    return None
+
+def merge_hits(rank, hit_rows, hit_cols, hit_ranks, limit=None, after=None, sort_keys=None):
+    """
+    Concatenate per-column hit slices and sort them by proximity to rank,
+    or by the int64 keys sort_keys(rows, cols, cutoff_ranks) gives them.
+    Ties keep the row-major order of the old per-record loop.
+
+    With limit, only the first limit hits (after the (sort key, row, col)
+    position in after, if given) are selected with a partial sort, so the
+    cost is O(n + k log k) rather than a full sort.
+    """
+    empty = np.empty(0, dtype=np.int64)
+    if not hit_rows:
+        return empty, empty, empty
+    hit_rows = np.concatenate(hit_rows)
+    hit_cols = np.concatenate(hit_cols)
+    hit_ranks = np.concatenate(hit_ranks).astype(np.int64)
+    distances = (sort_keys or distance_sort_keys(rank))(hit_rows, hit_cols, hit_ranks)
+
+    if after is not None:
+        after_distance, after_row, after_col = after
+        keep = ((distances > after_distance) |
+                ((distances == after_distance) &
+                 ((hit_rows > after_row) | ((hit_rows == after_row) & (hit_cols > after_col)))))
+        hit_rows, hit_cols, hit_ranks, distances = hit_rows[keep], hit_cols[keep], hit_ranks[keep], distances[keep]
+
+    if limit is not None and limit < len(distances):
+        if limit <= 0:
+            return empty, empty, empty
+        # Keep everything up to the limit-th smallest distance (ties included)
+        # and only sort that candidate set
+        cutoff_distance = np.partition(distances, limit - 1)[limit - 1]
+        candidates = np.flatnonzero(distances <= cutoff_distance)
+        order = candidates[np.lexsort((hit_cols[candidates], hit_rows[candidates],
+                                       distances[candidates]))][:limit]
+    else:
+        order = np.lexsort((hit_cols, hit_rows, distances))
+    return hit_rows[order], hit_cols[order], hit_ranks[order]
+
+def find_hits(rank, lower_bound, upper_bound, selected_category="", selected_branch="", college_type="",
+              table=None, limit=None, after=None, row_mask=None, sort_keys=None):
+    """
+    Return (rows, cols, cutoff_ranks) arrays for every cutoff in
+    [lower_bound, upper_bound] that passes the filters, sorted by proximity
+    to rank (or by sort_keys). limit/after select one page, see merge_hits().
+    row_mask, if given, is a boolean array over the table's rows that hits
+    must pass.
+    """
+    table = table or cutoff_table
+    if "sqlite" in table and row_mask is None and sort_keys is None:
+        return table["sqlite"].find_hits(rank, lower_bound, upper_bound, selected_category,
+                                         selected_branch, college_type, limit, after)
+    hit_rows, hit_cols, hit_ranks = [], [], []
+
+    with metrics.timer("search_stage_seconds", stage="filter"):
+        index_name, group = select_rank_index(table, selected_branch, college_type)
+        columns = category_columns(selected_category)
+    lower_bound, upper_bound = clamp_window(lower_bound, upper_bound)
+    if index_name is None or lower_bound > upper_bound:
+        return merge_hits(rank, hit_rows, hit_cols, hit_ranks)
+
+    with metrics.timer("search_stage_seconds", stage="match"):
+        index = table["rank_index"][index_name]
+        for col in columns:
+            start, end = rank_index_range(index, col, group, lower_bound, upper_bound)
+            if start == end:
+                continue
+            rows, ranks = index["rows"][start:end], index["ranks"][start:end]
+            if row_mask is not None:
+                keep = row_mask[rows]
+                rows, ranks = rows[keep], ranks[keep]
+            hit_rows.append(rows)
+            hit_ranks.append(ranks)
+            hit_cols.append(np.full(len(rows), col, dtype=np.int64))
+    with metrics.timer("search_stage_seconds", stage="sort"):
+        return merge_hits(rank, hit_rows, hit_cols, hit_ranks, limit, after, sort_keys)
+
+def find_hits_batch(queries, table=None):
+    """
+    Answer many parsed queries in one pass over the rank index: queries that
+    share an index run are grouped, and their windows are bisected against
+    the run together with one vectorized searchsorted per bound. Returns one
+    (rows, cols, cutoff_ranks) triple per query, as find_hits() would.
+    """
+    table = table or cutoff_table
+    hits = [([], [], []) for _ in queries]
+
+    # Queries with multi-value/fee/college filters or a probability/score sort run on their own
+    masked = {}
+    # (index name, group, col) -> [(query number, lower, upper)]
+    runs = {}
+    for number, query in enumerate(queries):
+        row_mask = query_row_mask(table, query)
+        if row_mask is not None or query["sort"] != "distance":
+            masked[number] = find_hits(query["rank"], query["lower_bound"], query["upper_bound"],
+                                       query["category"], query["branch"], query["college_type"],
+                                       table, row_mask=row_mask, sort_keys=hit_sort_keys(table, query))
+            continue
+        index_name, group = select_rank_index(table, query["branch"], query["college_type"])
+        lower_bound, upper_bound = clamp_window(query["lower_bound"], query["upper_bound"])
+        if index_name is None or lower_bound > upper_bound:
+            continue
+        for col in category_columns(query["category"]):
+            if (col, group) in table["rank_index"][index_name]["offsets"]:
+                runs.setdefault((index_name, group, col), []).append((number, lower_bound, upper_bound))
+
+    for (index_name, group, col), windows in runs.items():
+        index = table["rank_index"][index_name]
+        start, end = index["offsets"][(col, group)]
+        run = index["ranks"][start:end]
+        numbers, lowers, uppers = (np.array(values) for values in zip(*windows))
+        starts = start + np.searchsorted(run, lowers, side="left")
+        ends = start + np.searchsorted(run, uppers, side="right")
+        for number, hit_start, hit_end in zip(numbers.tolist(), starts.tolist(), ends.tolist()):
+            if hit_start == hit_end:
+                continue
+            hit_rows, hit_cols, hit_ranks = hits[number]
+            hit_rows.append(index["rows"][hit_start:hit_end])
+            hit_ranks.append(index["ranks"][hit_start:hit_end])
+            hit_cols.append(np.full(hit_end - hit_start, col, dtype=np.int64))
+
+    return [masked[number] if number in masked else merge_hits(query["rank"], *query_hits)
+            for number, (query, query_hits) in enumerate(zip(queries, hits))]
+
+# Fields /search/facets counts results by
+FACET_FIELDS = ("branch", "college_type", "place", "dist_code", "affiliated_to", "co_ed")
+# Fields /search filters on; each takes one value or a list of values
+FILTER_FIELDS = ("branch", "branch_code", "college_type", "co_ed", "dist_code", "place", "affiliated_to")
+# Number fields kept per row as float arrays (NaN when not a number)
+NUMERIC_FIELDS = ("tuition_fee", "seats")
+facets_lock = threading.Lock()
+
+def table_facets(table):
+    """
+    Facet and filter metadata of a cutoff table, built on first use and
+    kept on the table, so once per data generation. Maps each FACET_FIELDS
+    and FILTER_FIELDS name to {"codes": value code per row, "values": values
+    by code, "index": code by value, "occurs": whether each code is used by
+    a row, "present": the values used}, and each NUMERIC_FIELDS name to the
+    value of each row as a float array (NaN when it is not a number).
+    """
+    facets = table.get("facets")
+    if facets is None:
+        with facets_lock:
+            facets = table.get("facets")
+            if facets is None:
+                facets = table["facets"] = build_facets(table)
+    return facets
+
+def build_facets(table):
+    columns = {
+        "branch": (table["branch_codes"], list(table["branch_index"])),
+        "college_type": (table["type_codes"], list(table["type_index"]))
+    }
+    other_fields = [field for field in dict.fromkeys(FACET_FIELDS + FILTER_FIELDS + NUMERIC_FIELDS)
+                    if field not in columns]
+    if "snapshot" in table:
+        # Read the value ids straight from the snapshot instead of building every row
+        snapshot = table["snapshot"]
+        snapshot_columns = snapshot["columns"]
+        institute_ids = snapshot_columns["institute_fields"][snapshot_columns["row_institute"]]
+        for field in other_fields:
+            if field in BRANCH_FIELDS:
+                ids = snapshot_columns["branch_fields"][:, BRANCH_FIELDS.index(field)]
+            else:
+                ids = institute_ids[:, INSTITUTE_FIELDS.index(field)]
+            unique_ids, inverse = np.unique(ids, return_inverse=True)
+            defaults = {"affiliated_to": "Not Specified", "dist_code": "", "seats": "N/A"}
+            unique_values = [defaults.get(field) if value_id == ABSENT_VALUE else snapshot["values"][value_id]
+                             for value_id in unique_ids.tolist()]
+            # Different ids can stand for one value (a default and an explicit copy of it)
+            unique_codes, index = encode_column(unique_values)
+            columns[field] = (unique_codes[inverse.reshape(-1)], list(index))
+    else:
+        for field in other_fields:
+            codes, index = encode_column([row[field] for row in table["colleges"]])
+            columns[field] = (codes, list(index))
+
+    facets = {}
+    for field in NUMERIC_FIELDS:
+        codes, values = columns.pop(field)
+        facets[field] = np.array([numeric_value(value) for value in values], dtype=np.float64)[codes]
+    for field, (codes, values) in columns.items():
+        occurs = np.bincount(codes, minlength=len(values)) > 0
+        facets[field] = {
+            "codes": codes,
+            "values": values,
+            "index": {value: code for code, value in enumerate(values)},
+            "occurs": occurs.tolist(),
+            "present": [value for value, present in zip(values, occurs.tolist()) if present]
+        }
+    return facets
+
+def numeric_value(value):
+    """A fee or seat count as a float, or NaN if it is not a number"""
+    if isinstance(value, bool):
+        return np.nan
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return np.nan
+
+def filter_masks(table, query, rows=None):
+    """
+    Boolean masks for the filters of a parsed query, one per filtered field,
+    over rows (every row of the table if None). A field's values are ORed
+    through a lookup table of allowed codes; callers AND the masks.
+    """
+    facets = table_facets(table)
+    constraints = list(query["filters"])
+    constraints += [(field, (query[field],)) for field in ("branch", "college_type") if query[field]]
+    masks = {}
+    for field, values in constraints:
+        facet = facets[field]
+        allowed = np.zeros(len(facet["values"]), dtype=bool)
+        for value in values:
+            if value in facet["index"]:
+                allowed[facet["index"][value]] = True
+        masks[field] = allowed[facet["codes"] if rows is None else facet["codes"][rows]]
+    if query["fee_range"] is not None:
+        fees = facets["tuition_fee"] if rows is None else facets["tuition_fee"][rows]
+        min_fee, max_fee = query["fee_range"]
+        masks["tuition_fee"] = (fees >= min_fee) & (fees <= max_fee)
+    if query["college"]:
+        text_index = table_text_index(table)
+        matched = np.zeros(len(text_index["entries"]), dtype=bool)
+        matched[filter_institutes(text_index, query["college"])] = True
+        entry_rows = text_index["entry_rows"]
+        masks["college"] = matched[entry_rows if rows is None else entry_rows[rows]]
+    return masks
+
+def query_row_mask(table, query):
+    """
+    Mask of the rows passing a query's multi-value, fee and college name
+    filters, or None when it has none. Single branch/college_type filters
+    are left to the rank index find_hits() picks.
+    """
+    if not query["filters"] and query["fee_range"] is None and not query["college"]:
+        return None
+    row_mask = np.ones(len(table["ranks"]), dtype=bool)
+    for field, mask in filter_masks(table, query).items():
+        if field not in ("branch", "college_type") or dict(query["filters"]).get(field):
+            row_mask &= mask
+    return row_mask
+
+def window_rows(table, lower_bound, upper_bound, selected_category=""):
+    """
+    Row of every cutoff in [lower_bound, upper_bound] for the category, with
+    any branch or college type, unsorted. A row appears once per matching
+    cutoff column, as in search results.
+    """
+    lower_bound, upper_bound = clamp_window(lower_bound, upper_bound)
+    if lower_bound > upper_bound:
+        return np.empty(0, dtype=np.int64)
+    index = table["rank_index"]["all"]
+    parts = []
+    for col in category_columns(selected_category):
+        start, end = rank_index_range(index, col, 0, lower_bound, upper_bound)
+        parts.append(index["rows"][start:end])
+    return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+def table_history(table):
+    """
+    (years, int32 years x rows x CUTOFF_KEYS matrix) of the cutoff history
+    of a table's rows, each year holding its last counselling round. Built
+    from the rows on first use; snapshots store it.
+    """
+    history = table.get("history")
+    if history is None:
+        with facets_lock:
+            history = table.get("history")
+            if history is None:
+                history = table["history"] = build_history_matrix(table["colleges"])
+    return history
+
+def build_history_matrix(colleges):
+    by_year = {}
+    for row, college in enumerate(colleges):
+        # Entries are sorted by (year, round), so later rounds overwrite earlier ones
+        for entry in college.get("history") or ():
+            by_year.setdefault(entry["year"], {})[row] = entry["cutoffs"]
+    years = sorted(by_year)
+    history = np.full((len(years), len(colleges), len(CUTOFF_KEYS)), MISSING_CUTOFF, dtype=np.int32)
+    for position, year in enumerate(years):
+        rows = list(by_year[year])
+        history[position, rows] = build_cutoff_matrix([{"cutoffs": by_year[year][row]} for row in rows])
+    return years, history
+
+def table_admission_model(table):
+    """Admission model of a cutoff table, built on first use and kept on the table"""
+    model = table.get("admission_model")
+    if model is None:
+        history = table_history(table)
+        with facets_lock:
+            model = table.get("admission_model")
+            if model is None:
+                model = table["admission_model"] = build_admission_model(table["ranks"], *history)
+    return model
+
+def build_admission_model(ranks, years, history):
+    """
+    Predict next year's closing rank of every row and cutoff as a normal
+    distribution over log ranks, in bulk over the history matrix. The mean
+    follows a least-squares trend through the yearly closing ranks and the
+    spread is the scatter around it, floored at MIN_ADMISSION_SPREAD. Cells
+    without history use their current cutoff as the mean.
+    """
+    mean = np.log(np.maximum(ranks, 1)).astype(np.float64)
+    variance = np.zeros(ranks.shape)
+    if years:
+        valid = history > 0
+        logs = np.where(valid, np.log(np.maximum(history, 1)), 0.0)
+        # Years relative to the newest one, so the prediction is at t = 1
+        t = (np.asarray(years, dtype=np.float64) - years[-1])[:, None, None] * valid
+        n = valid.sum(axis=0)
+        sum_t, sum_y = t.sum(axis=0), logs.sum(axis=0)
+        sum_tt, sum_ty = (t * t).sum(axis=0), (t * logs).sum(axis=0)
+        denominator = n * sum_tt - sum_t * sum_t
+        slope = np.divide(n * sum_ty - sum_t * sum_y, denominator, out=np.zeros(ranks.shape),
+                          where=denominator > 0)
+        intercept = np.divide(sum_y - slope * sum_t, n, out=np.zeros(ranks.shape), where=n > 0)
+        residuals = np.where(valid, logs - (intercept + slope * t), 0.0)
+        # Two years fit a line exactly, so their spread is their difference
+        deviations = np.where(valid, logs - np.divide(sum_y, n, out=np.zeros(ranks.shape), where=n > 0), 0.0)
+        variance = np.select([n > 2, n == 2],
+                             [(residuals ** 2).sum(axis=0) / np.maximum(n - 2, 1), (deviations ** 2).sum(axis=0)])
+        mean = np.where(n > 0, intercept + slope, mean)
+    return {
+        "years": years,
+        "mean": mean.astype(np.float32),
+        "spread": np.sqrt(variance + MIN_ADMISSION_SPREAD ** 2).astype(np.float32)
+    }
+
+def normal_sf(z):
+    """Upper tail of the standard normal at z, vectorized (Abramowitz and Stegun 7.1.26, error < 1.5e-7)"""
+    x = np.abs(z) / np.sqrt(2)
+    t = 1 / (1 + 0.3275911 * x)
+    erfc = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    erfc *= np.exp(-x * x)
+    return np.where(z >= 0, erfc / 2, 1 - erfc / 2)
+
+def admission_probability(model, rank, hit_rows, hit_cols):
+    """Probability that rank is within next year's closing rank, for each (row, col) hit"""
+    z = (np.log(max(rank, 1)) - model["mean"][hit_rows, hit_cols]) / model["spread"][hit_rows, hit_cols]
+    return normal_sf(z.astype(np.float64))
+
+def normalize_text(text):
+    """Lowercase text and collapse everything but letters and digits to single spaces"""
+    return " ".join(re.sub(r'[^0-9a-z]+', ' ', str(text).lower()).split())
+
+def text_trigrams(tokens):
+    """Distinct trigrams of tokens, each padded with a space on both sides"""
+    return {f" {token} "[start:start + 3] for token in tokens for start in range(len(token))}
+
+def table_text_index(table):
+    """
+    Prefix and trigram index over the institute name, inst_code and place
+    of a cutoff table, built on first use and kept on the table like
+    table_facets(), so it is rebuilt once per upload.
+    """
+    text_index = table.get("text_index")
+    if text_index is None:
+        with facets_lock:
+            text_index = table.get("text_index")
+            if text_index is None:
+                text_index = table["text_index"] = build_text_index(table)
+    return text_index
+
+def institute_entries(table):
+    """(institute number of each row, [(inst_code, name, place)] by institute number)"""
+    if "snapshot" in table:
+        snapshot = table["snapshot"]
+        columns = snapshot["columns"]
+        fields = [INSTITUTE_FIELDS.index(field) for field in ("inst_code", "name", "place")]
+        entries = [tuple("" if value_id == ABSENT_VALUE else snapshot["values"][value_id] for value_id in ids)
+                   for ids in columns["institute_fields"][:, fields].tolist()]
+        return columns["row_institute"], entries
+    codes, index = encode_column([(row.get("inst_code", ""), row.get("name", ""), row.get("place", ""))
+                                  for row in table["colleges"]])
+    return codes, list(index)
+
+def build_text_index(table):
+    entry_rows, entries = institute_entries(table)
+    token_entries = set()
+    postings = {}
+    inst_codes = {}
+    for number, (inst_code, name, place) in enumerate(entries):
+        tokens = set(normalize_text(f"{inst_code} {name} {place}").split())
+        token_entries.update((token, number) for token in tokens)
+        for gram in text_trigrams(tokens):
+            postings.setdefault(gram, []).append(number)
+        inst_codes.setdefault(normalize_text(inst_code), []).append(number)
+    token_entries = sorted(token_entries)
+    name_order = np.empty(len(entries), dtype=np.int64)
+    name_order[sorted(range(len(entries)), key=lambda number: entries[number][1])] = np.arange(len(entries))
+    return {
+        "entry_rows": np.asarray(entry_rows, dtype=np.int64),
+        "entries": entries,
+        "tokens": [token for token, _ in token_entries],
+        "token_entries": np.array([number for _, number in token_entries], dtype=np.int64),
+        "trigrams": {gram: np.array(numbers, dtype=np.int64) for gram, numbers in postings.items()},
+        "inst_codes": inst_codes,
+        "name_order": name_order
+    }
+
+# How closely an institute matches a name/place/inst_code query, loosest first
+MATCH_FUZZY, MATCH_PREFIX, MATCH_WORDS, MATCH_INST_CODE = range(4)
+
+def score_institutes(text_index, text):
+    """
+    Score every institute against a name/place/inst_code query; returns
+    (scores, match tiers), 0 where it does not match. Fuzzy matches score
+    the share of the query's trigrams they contain; matching every query
+    word as a word prefix adds 1, as a whole word another 0.5, and an exact
+    inst_code 2.
+    """
+    tokens = set(normalize_text(text).split())
+    count = len(text_index["entries"])
+    if not tokens or not count:
+        return np.zeros(count), np.zeros(count, dtype=np.int64)
+
+    grams = text_trigrams(tokens)
+    postings = [text_index["trigrams"][gram] for gram in grams if gram in text_index["trigrams"]]
+    if postings:
+        scores = np.bincount(np.concatenate(postings), minlength=count) / len(grams)
+        scores[scores < MIN_TRIGRAM_SIMILARITY] = 0
+    else:
+        scores = np.zeros(count)
+
+    # Tokens are sorted, so the words a query word starts (or equals) are one range
+    prefixes = np.zeros(count, dtype=np.int64)
+    words = np.zeros(count, dtype=np.int64)
+    hit = np.zeros(count, dtype=bool)
+    for token in tokens:
+        start = bisect.bisect_left(text_index["tokens"], token)
+        whole = bisect.bisect_right(text_index["tokens"], token, start)
+        end = bisect.bisect_left(text_index["tokens"], token + "\x7f", whole)
+        hit[:] = False
+        hit[text_index["token_entries"][start:end]] = True
+        prefixes += hit
+        hit[:] = False
+        hit[text_index["token_entries"][start:whole]] = True
+        words += hit
+    all_prefixes, all_words = prefixes == len(tokens), words == len(tokens)
+    inst_code_matches = text_index["inst_codes"].get(normalize_text(text), [])
+    scores[all_prefixes] += 1
+    scores[all_words] += 0.5
+    scores[inst_code_matches] += 2
+
+    tiers = np.full(count, MATCH_FUZZY, dtype=np.int64)
+    tiers[all_prefixes] = MATCH_PREFIX
+    tiers[all_words] = MATCH_WORDS
+    tiers[inst_code_matches] = MATCH_INST_CODE
+    return scores, tiers
+
+def match_institutes(text_index, text):
+    """Institutes matching a name/place/inst_code query, best first, as (institute numbers, scores)"""
+    scores, _ = score_institutes(text_index, text)
+    matched = np.flatnonzero(scores)
+    order = np.lexsort((text_index["name_order"][matched], -scores[matched]))
+    return matched[order], scores[matched[order]]
+
+def filter_institutes(text_index, text):
+    """
+    Institutes a college filter keeps: those of the closest match tier any
+    institute reaches, so an exact inst_code or the full name of a
+    suggestion keeps that institute, and fuzzy matches only count when
+    nothing matches better
+    """
+    scores, tiers = score_institutes(text_index, text)
+    matched = np.flatnonzero(scores)
+    if not len(matched):
+        return matched
+    return matched[tiers[matched] == tiers[matched].max()]
+
+def facet_counts(table, query):
+    """
+    Return (result count, {field: [{"value", "count"}, ...]}) for a parsed
+    query. One pass: the window's rows are gathered once, the filters
+    become masks over them, and each facet is a bincount of its codes under
+    the masks of the other filters.
+    """
+    facets = table_facets(table)
+    rows = window_rows(table, query["lower_bound"], query["upper_bound"], query["category"])
+
+    masks = filter_masks(table, query, rows)
+    everything = np.ones(len(rows), dtype=bool)
+    for mask in masks.values():
+        everything &= mask
+
+    counts = {}
+    for field in FACET_FIELDS:
+        mask = np.ones(len(rows), dtype=bool)
+        for other, other_mask in masks.items():
+            if other != field:
+                mask &= other_mask
+        facet = facets[field]
+        value_counts = np.bincount(facet["codes"][rows[mask]], minlength=len(facet["values"])).tolist()
+        counts[field] = sorted(({"value": value, "count": count}
+                                for value, count, occurs in zip(facet["values"], value_counts, facet["occurs"])
+                                if occurs),
+                               key=lambda item: (-item["count"], str(item["value"])))
+    return int(everything.sum()), counts
+
+def iter_results(table, hit_rows, hit_cols, hit_ranks, selected_category="", fields=None, rank=None,
+                 scores=None):
+    """
+    Lazily turn hit arrays into create_result() dicts, projected to fields
+    if given. With the searched rank, results carry their admission
+    probability, scored for all hits at once; scores, if given, are the
+    hit_scores() of the hits.
+    """
+    rows = table["colleges"]
+    if rank is None:
+        probabilities = itertools.repeat(None)
+    else:
+        probabilities = np.round(admission_probability(table_admission_model(table), rank, hit_rows, hit_cols),
+                                 3).tolist()
+    scores = itertools.repeat(None) if scores is None else np.round(scores, 3).tolist()
+    for row, col, cutoff_rank, probability, score in zip(hit_rows.tolist(), hit_cols.tolist(), hit_ranks.tolist(),
+                                                         probabilities, scores):
+        result = create_result(rows[row], cutoff_rank, selected_category or CUTOFF_CATEGORIES[col], CUTOFF_KEYS[col],
+                               probability, score)
+        if fields:
+            result = {field: result[field] for field in fields}
+        yield result
+
+def build_results(table, hit_rows, hit_cols, hit_ranks, selected_category="", fields=None, rank=None,
+                  scores=None):
+    """Turn hit arrays into create_result() dicts"""
+    return list(iter_results(table, hit_rows, hit_cols, hit_ranks, selected_category, fields, rank, scores))
+
+# Keys of every create_result() dict, the valid values for fields=
+RESULT_FIELDS = ("name", "inst_code", "branch", "branch_code", "cutoff_rank", "category", "gender",
+                 "tuition_fee", "affiliated_to", "college_type", "co_ed", "place", "dist_code",
+                 "year_established", "website", "facilities", "seats", "duration", "admission_probability",
+                 "score")
+
+def create_result(college, cutoff_rank, category, cutoff_key, admission_probability=None, score=None):
     """Helper function to create a result dictionary"""
     return {
         "name": college.get("name", ""),
@@ -477,13 +4003,268 @@ def create_result(college, cutoff_rank, category, cutoff_key):
         "college_type": college.get("college_type", ""),
         "co_ed": college.get("co_ed", ""),
         "place": college.get("place", ""),
+        "dist_code": college.get("dist_code", ""),
         "year_established": college.get("year_established", ""),
         "website": college.get("website", ""),
         "facilities": college.get("facilities", ""),
         "seats": college.get("seats", ""),
-        "duration": college.get("duration", "")
+        "duration": college.get("duration", ""),
+        "admission_probability": admission_probability,
+        "score": score
+    }
+
+# Admin browsing and exports. Both read the rows of the live cutoff table,
+# so neither builds colleges_data for the whole catalog at once.
+
+# Sort fields of the admin browse API by level; the first is the default
+BROWSE_SORTS = {
+    "institutes": ("number", "inst_code", "name", "place", "branches"),
+    "branches": ("row", "inst_code", "name", "place", "branch", "branch_code", "college_type", "co_ed",
+                 "dist_code", "affiliated_to", "tuition_fee", "seats", *CUTOFF_KEYS)
+}
+
+EXPORT_MIMETYPES = {
+    "json": "application/json",
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+}
+
+def parse_browse_query(level, data):
+    """Validate the filters, sort and page of an admin browse request and return (query, error)"""
+    filters = []
+    for field in FILTER_FIELDS:
+        values, error = parse_filter_values(field, data.get(field))
+        if error:
+            return None, error
+        if values:
+            filters.append((field, values))
+    fee_range, error = parse_fee_range(data)
+    if error:
+        return None, error
+
+    college = data.get('q', '')
+    if not isinstance(college, str) or len(college) > MAX_TEXT_QUERY:
+        return None, f"q must be a string of at most {MAX_TEXT_QUERY} characters"
+    sort = data.get('sort') or BROWSE_SORTS[level][0]
+    if sort not in BROWSE_SORTS[level]:
+        return None, f"sort must be one of: {', '.join(BROWSE_SORTS[level])}"
+    order = data.get('order') or 'asc'
+    if order not in ('asc', 'desc'):
+        return None, "order must be asc or desc"
+    try:
+        limit = int(data.get('limit') or DEFAULT_BROWSE_LIMIT)
+    except (ValueError, TypeError):
+        return None, "limit must be a valid integer"
+    if not 1 <= limit <= MAX_BROWSE_LIMIT:
+        return None, f"limit must be between 1 and {MAX_BROWSE_LIMIT}"
+    cursor = data.get('cursor') or None
+    after = None
+    if cursor is not None:
+        after = decode_browse_cursor(cursor)
+        if after is None:
+            return None, "Invalid or expired cursor, please browse again"
+
+    # Shaped like a search query so filter_masks() and query_row_mask() take it
+    return {"filters": tuple(filters), "fee_range": fee_range, "college": normalize_text(college),
+            "branch": "", "college_type": "", "sort": sort, "order": order, "limit": limit,
+            "cursor": cursor, "after": after}, None
+
+def encode_browse_cursor(key, item):
+    return f"{data_generation}.{int(key)}.{int(item)}"
+
+def decode_browse_cursor(cursor):
+    """Return the (sort key, item) position of a browse cursor, or None if it is invalid or stale"""
+    try:
+        generation, key, item = (int(part) for part in str(cursor).split('.'))
+    except ValueError:
+        return None
+    if generation != data_generation:
+        return None
+    return key, item
+
+def value_ranks(values):
+    """Position of each value in the sorted order of values, compared as strings"""
+    ranks = np.empty(len(values), dtype=np.int64)
+    ranks[sorted(range(len(values)), key=lambda position: str(values[position]))] = np.arange(len(values))
+    return ranks
+
+def browse_sort_keys(table, level, sort):
+    """int64 sort key of every institute number or table row for a browse sort field"""
+    text_index = table_text_index(table)
+    entry_rows = text_index["entry_rows"]
+    if sort in ("inst_code", "name", "place"):
+        position = ("inst_code", "name", "place").index(sort)
+        keys = value_ranks([entry[position] for entry in text_index["entries"]])
+        return keys if level == "institutes" else keys[entry_rows]
+    if level == "institutes":
+        if sort == "branches":
+            return np.bincount(entry_rows, minlength=len(text_index["entries"])).astype(np.int64)
+        return np.arange(len(text_index["entries"]), dtype=np.int64)
+    if sort in CUTOFF_KEYS:
+        ranks = table["ranks"][:, CUTOFF_KEYS.index(sort)].astype(np.int64)
+        # Missing cutoffs sort last
+        return np.where(ranks == MISSING_CUTOFF, INT32_MAX + 1, ranks)
+    facets = table_facets(table)
+    if sort in NUMERIC_FIELDS:
+        # np.unique puts NaN (not a number) last
+        return np.unique(facets[sort], return_inverse=True)[1].reshape(-1).astype(np.int64)
+    if sort in facets:
+        return value_ranks(facets[sort]["values"])[facets[sort]["codes"]]
+    return np.arange(len(table["ranks"]), dtype=np.int64)
+
+def select_page(keys, items, limit, after=None):
+    """
+    The first limit (key, item) pairs in (key, item) order, after the
+    position in after if given, selected with a partial sort as
+    merge_hits() does. Returns (keys, items).
+    """
+    if after is not None:
+        after_key, after_item = after
+        keep = (keys > after_key) | ((keys == after_key) & (items > after_item))
+        keys, items = keys[keep], items[keep]
+    if limit < len(keys):
+        candidates = np.flatnonzero(keys <= np.partition(keys, limit - 1)[limit - 1])
+        keys, items = keys[candidates], items[candidates]
+    order = np.lexsort((items, keys))[:limit]
+    return keys[order], items[order]
+
+def browse_page(table, level, query):
+    """One page of the admin browse API: institutes or branch rows passing the filters, in sort order"""
+    text_index = table_text_index(table)
+    entry_rows = text_index["entry_rows"]
+    row_mask = query_row_mask(table, query)
+    if level == "institutes":
+        # An institute matches when any of its branches does
+        selected = np.zeros(len(text_index["entries"]), dtype=bool)
+        if row_mask is None:
+            selected[:] = True
+        else:
+            selected[entry_rows[row_mask]] = True
+    else:
+        selected = np.ones(len(table["ranks"]), dtype=bool) if row_mask is None else row_mask
+    items = np.flatnonzero(selected)
+    keys = browse_sort_keys(table, level, query["sort"])[items]
+    if query["order"] == "desc":
+        keys = -keys
+    keys, items = select_page(keys, items, query["limit"], query["after"])
+
+    colleges = table["colleges"]
+    results = []
+    if level == "institutes":
+        branches = np.bincount(entry_rows, minlength=len(text_index["entries"]))
+        first_rows = np.full(len(text_index["entries"]), -1, dtype=np.int64)
+        numbers, starts = np.unique(entry_rows, return_index=True)
+        first_rows[numbers] = starts
+        for number in items.tolist():
+            inst_code, name, place = text_index["entries"][number]
+            institute = {"number": number, "inst_code": inst_code, "name": name, "place": place}
+            if first_rows[number] >= 0:
+                college = colleges[int(first_rows[number])]
+                institute.update((field, college.get(field, "")) for field in
+                                 ("dist_code", "co_ed", "college_type", "year_established", "website"))
+            institute["branches"] = int(branches[number])
+            results.append(institute)
+    else:
+        for row in items.tolist():
+            branch = {"row": row}
+            branch.update((key, value) for key, value in colleges[row].items() if key != "history")
+            results.append(branch)
+
+    has_more = len(results) == query["limit"]
+    return {
+        "success": True,
+        "total": int(selected.sum()),
+        "count": len(results),
+        "items": results,
+        "next_cursor": encode_browse_cursor(keys[-1], items[-1]) if has_more else None
     }
 
+def iter_chunks(iterable, size):
+    """Lists of up to size consecutive items of iterable"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def iter_institutes(data, table):
+    """The institutes of colleges_data one at a time, rebuilt from the snapshot when it is not loaded"""
+    if data is None and "snapshot" in table:
+        snapshot = table["snapshot"]
+        return (snapshot_institute(snapshot, position) for position in range(snapshot["header"]["institutes"]))
+    return iter((data or get_colleges_data())["institutes"])
+
+def iter_json_export(institutes):
+    """The colleges_data document as JSON text, EXPORT_CHUNK_ROWS institutes at a time"""
+    yield '{"institutes": ['
+    separator = ''
+    for chunk in iter_chunks(institutes, EXPORT_CHUNK_ROWS):
+        yield separator + ', '.join(json.dumps(institute, ensure_ascii=False) for institute in chunk)
+        separator = ', '
+    yield ']}'
+
+def iter_export_rows(table):
+    """One row per branch in the upload template layout, header first, so an export can be uploaded again"""
+    fields = list(UPLOAD_COLUMN_MAPPING.values())
+    yield list(UPLOAD_COLUMN_MAPPING)
+    ranks = table["ranks"]
+    for row, college in enumerate(table["colleges"]):
+        values = dict(college, institute_name=college["name"], branch_name=college["branch"])
+        values.update((key, None if rank == MISSING_CUTOFF else rank)
+                      for key, rank in zip(CUTOFF_KEYS, ranks[row].tolist()))
+        yield [values.get(field) for field in fields]
+
+def iter_csv_export(table):
+    for chunk in iter_chunks(iter_export_rows(table), EXPORT_CHUNK_ROWS):
+        output = io.StringIO()
+        csv.writer(output).writerows(chunk)
+        yield output.getvalue()
+
+def iter_xlsx_export(table):
+    """
+    The export rows as an xlsx workbook. openpyxl's write-only mode streams
+    rows to disk as they are appended; the saved file is then sent in
+    chunks, so memory stays flat however large the data is.
+    """
+    from openpyxl import Workbook
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('College Data')
+    for row in iter_export_rows(table):
+        sheet.append(row)
+    fd, path = tempfile.mkstemp(prefix='.export-', suffix='.xlsx')
+    os.close(fd)
+    try:
+        workbook.save(path)
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(EXPORT_CHUNK_BYTES), b''):
+                yield chunk
+    finally:
+        os.remove(path)
+
+def export_response(export_format, as_attachment=True):
+    """
+    Stream the live data in export_format from a generator, with an ETag of
+    its data generation, so the whole document never exists in memory
+    """
+    with colleges_data_lock:
+        data, table, generation = colleges_data, cutoff_table, data_generation
+    etag = response_etag(generation, "export", (export_format,))
+    headers = {"Cache-Control": "private, no-cache"}
+    if request.if_none_match.contains_weak(etag):
+        return not_modified(etag, headers)
+    if as_attachment:
+        headers["Content-Disposition"] = f"attachment; filename=EAPCET_College_Data.{export_format}"
+    if export_format == 'json':
+        chunks = iter_json_export(iter_institutes(data, table))
+    elif export_format == 'csv':
+        chunks = iter_csv_export(table)
+    else:
+        chunks = iter_xlsx_export(table)
+    response = Response(chunks, mimetype=EXPORT_MIMETYPES[export_format], headers=headers)
+    response.set_etag(etag, weak=True)
+    return response
+
 # Admin Authentication Routes
 @app.route('/admin/login', methods=['GET', 'POST'])
 def admin_login():
@@ -529,8 +4310,8 @@ def admin_dashboard():
     return render_template('admin.html', 
                          total_colleges=total_colleges,
                          total_branches=total_branches,
-                         colleges_data=colleges_data,
-                         username=session.get('admin_username'))
+                         username=session.get('admin_username'),
+                         job_id=request.args.get('job', ''))
 
 @app.route('/admin/upload', methods=['GET', 'POST'])
 @admin_required
@@ -548,37 +4329,41 @@ def admin_upload():
         
         if file and allowed_file(file.filename):
             try:
-                filename = secure_filename(file.filename)
-                filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                file.save(filepath)
-                
-                success, message = process_excel_file(filepath)
+                mode = request.form.get('mode', 'replace')
+                if mode not in UPLOAD_MODES:
+                    flash('Invalid upload mode', 'error')
+                    return redirect(request.url)
+
+                period = None
+                if request.form.get('year'):
+                    try:
+                        period = (int(request.form['year']), int(request.form.get('round') or 1))
+                    except ValueError:
+                        flash('Year and round must be whole numbers', 'error')
+                        return redirect(request.url)
+                    if not 1900 <= period[0] <= 2100 or not 1 <= period[1] <= 20:
+                        flash('Year must be between 1900 and 2100 and round between 1 and 20', 'error')
+                        return redirect(request.url)
                 
-                if success:
-                    flash(f'Data uploaded successfully! {message}', 'success')
-                    global colleges_data, colleges
-                    colleges_data = load_colleges_data()
-                    colleges = process_colleges_data()
+                dry_run = request.form.get('dry_run') == '1'
+                job = submit_ingest_job(file, mode, period, dry_run)
+                if dry_run:
+                    flash(f'Dry run queued as job {job["id"]}. The file is only validated; the data is not changed.', 'success')
                 else:
-                    flash(f'Error processing Excel file: {message}', 'error')
-                
-                if os.path.exists(filepath):
-                    os.remove(filepath)
-                
-                return redirect(url_for('admin_dashboard'))
+                    flash(f'Upload queued as job {job["id"]}. Search keeps serving the current data until it finishes.', 'success')
+                return redirect(url_for('admin_dashboard', job=job["id"]))
                 
             except Exception as e:
                 flash(f'Error processing file: {str(e)}', 'error')
                 return redirect(request.url)
         else:
-            flash('Invalid file type. Please upload Excel files only (.xlsx, .xls)', 'error')
+            flash('Invalid file type. Please upload .xlsx, .xls, .csv or .parquet files only', 'error')
             return redirect(request.url)
     
     total_colleges, total_branches = get_college_stats()
     return render_template('upload.html',
                          total_colleges=total_colleges,
-                         total_branches=total_branches,
-                         colleges_data=colleges_data)
+                         total_branches=total_branches)
 
 @app.route('/admin/download-template')
 @admin_required
@@ -602,19 +4387,45 @@ def download_template():
 @app.route('/admin/data')
 @admin_required
 def admin_data():
-    return jsonify(colleges_data)
+    return export_response('json', as_attachment=False)
+
+@app.route('/admin/browse/<level>')
+@admin_required
+def admin_browse(level):
+    """
+    Page through institutes or branches with server-side filters and
+    sorting. Args: the /search filter fields (repeatable), min_fee,
+    max_fee, q (institute name, code or place), sort, order (asc or desc),
+    limit, and cursor (the next_cursor of the previous page).
+    """
+    if level not in BROWSE_SORTS:
+        return jsonify({"error": f"level must be one of: {', '.join(BROWSE_SORTS)}"}), 404
+    query, error = parse_browse_query(level, request_data())
+    if error:
+        return jsonify({"error": error}), 400
+    query_key = (level, query["filters"], query["fee_range"], query["college"], query["sort"],
+                 query["order"], query["limit"], query["cursor"])
+    return cached_response("browse", query_key, lambda: browse_page(cutoff_table, level, query), private=True)
+
+@app.route('/admin/export')
+@admin_required
+def admin_export():
+    """Stream the whole dataset as JSON (the colleges_data layout) or as upload-template CSV or xlsx. Args: format"""
+    export_format = (request.args.get('format') or 'json').lower()
+    if export_format not in EXPORT_MIMETYPES:
+        return jsonify({"error": f"format must be one of: {', '.join(EXPORT_MIMETYPES)}"}), 400
+    return export_response(export_format)
 
 @app.route('/admin/clear', methods=['POST'])
 @admin_required
 def admin_clear():
     try:
-        colleges_data["institutes"] = []
-        if save_colleges_data(colleges_data):
-            global colleges
-            colleges = process_colleges_data()
-            flash('All data cleared successfully!', 'success')
-        else:
-            flash('Error clearing data', 'error')
+        with data_lock, storage_write_lock():
+            sync_data()
+            if publish_data(dict(get_colleges_data(), institutes=[]), build_cutoff_table([])):
+                flash('All data cleared successfully!', 'success')
+            else:
+                flash('Error clearing data', 'error')
     except Exception as e: 
         flash(f'Error: {str(e)}', 'error')
     
@@ -627,8 +4438,162 @@ def admin_stats():
     return jsonify({
         'total_colleges': total_colleges,
         'total_branches': total_branches,
-        'data_entries': len(colleges_data['institutes'])
+        'data_entries': total_colleges,
+        'data_generation': data_generation,
+        'storage': storage.stats(cutoff_table),
+        'startup_ms': {phase: round(seconds * 1000, 1) for phase, seconds in startup_timings.items()},
+        'worker_pid': os.getpid(),
+        'search_cache': search_cache.stats(),
+        'coalescing': search_flights.stats()
+    })
+
+@app.route('/admin/jobs')
+@admin_required
+def admin_jobs():
+    return jsonify({'jobs': list_ingest_jobs()})
+
+@app.route('/admin/jobs/<job_id>')
+@admin_required
+def admin_job_status(job_id):
+    job = get_ingest_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+@app.route('/admin/jobs/<job_id>/report')
+@admin_required
+def admin_job_report(job_id):
+    """Download an upload job's validation issues as an annotated copy of the upload"""
+    job = get_ingest_job(job_id)
+    if job is None or not job["report"]:
+        return jsonify({'error': 'Report not found'}), 404
+    return send_file(os.path.abspath(validation_report_path(job_id)), as_attachment=True,
+                     download_name=f"{os.path.splitext(job['filename'])[0]}_validation.xlsx",
+                     mimetype=EXPORT_MIMETYPES["xlsx"])
+
+@app.route('/admin/metrics')
+def admin_metrics():
+    """
+    Metrics in the Prometheus text format. Needs an admin session or, when
+    METRICS_TOKEN is set, an "Authorization: Bearer <token>" header.
+    """
+    authorization = request.headers.get('Authorization', '')
+    if not session.get('admin_logged_in') and not (
+            METRICS_TOKEN and secrets.compare_digest(authorization, f"Bearer {METRICS_TOKEN}")):
+        return Response("Unauthorized\n", status=401, mimetype='text/plain')
+
+    cache = search_cache.stats()
+    values = [
+        ("data_generation", "gauge", "Generation of the data this worker serves", data_generation),
+        ("search_cache_entries", "gauge", "Responses in the search cache", cache["size"]),
+        ("search_cache_hits_total", "counter", "Search cache hits", cache["hits"]),
+        ("search_cache_misses_total", "counter", "Search cache misses", cache["misses"]),
+    ]
+    lines = []
+    for name, kind, help_text, value in values:
+        lines += [f"# HELP {metrics.prefix}_{name} {help_text}", f"# TYPE {metrics.prefix}_{name} {kind}",
+                  f"{metrics.prefix}_{name} {value}"]
+    return Response(metrics.render() + "\n".join(lines) + "\n",
+                    mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/admin/profiles')
+@admin_required
+def admin_profiles():
+    """Folded-stack profiles of the slowest requests, slowest first"""
+    names = sorted((name for name in os.listdir(PROFILE_FOLDER) if name.endswith('.folded')), reverse=True) \
+        if os.path.isdir(PROFILE_FOLDER) else []
+    return jsonify({
+        'enabled': stack_sampler is not None,
+        'profiles': [{'name': name, 'duration_ms': int(name.split('ms-', 1)[0]),
+                      'url': url_for('admin_profile', name=name)} for name in names]
     })
 
+@app.route('/admin/profiles/<name>')
+@admin_required
+def admin_profile(name):
+    path = os.path.join(PROFILE_FOLDER, secure_filename(name))
+    if not name.endswith('.folded') or not os.path.exists(path):
+        return jsonify({'error': 'Profile not found'}), 404
+    return send_file(os.path.abspath(path), mimetype='text/plain', as_attachment=True, download_name=name)
+
+@app.route('/admin/simulate', methods=['POST'])
+@admin_required
+def admin_simulate():
+    """
+    Simulate seat allocation for an uploaded merit list (file) against the
+    current seat matrix. Form/query args: runs, perturbation (chance of
+    swapping each adjacent pair of preferences in runs after the first),
+    seed and format (json, csv or xlsx).
+    """
+    export_format = (request.values.get('format') or 'json').lower()
+
+    def fail(message):
+        if export_format == 'json':
+            return jsonify({"error": message}), 400
+        flash(message, 'error')
+        return redirect(url_for('admin_dashboard'))
+
+    if export_format not in ('json', 'csv', 'xlsx'):
+        return fail("format must be one of json, csv, xlsx")
+    file = request.files.get('file')
+    if not file or not file.filename:
+        return fail("No merit list file selected")
+    if not allowed_file(file.filename):
+        return fail("Merit lists must be .xlsx, .xls, .csv or .parquet files")
+    try:
+        runs = int(request.values.get('runs', 1))
+        perturbation = float(request.values.get('perturbation', 0.1))
+        seed = int(request.values.get('seed', 0))
+    except ValueError:
+        return fail("runs and seed must be integers and perturbation a number")
+    if not 1 <= runs <= MAX_SIMULATION_RUNS:
+        return fail(f"runs must be between 1 and {MAX_SIMULATION_RUNS}")
+    if not 0 <= perturbation <= 1:
+        return fail("perturbation must be between 0 and 1")
+
+    filepath = os.path.join(app.config['UPLOAD_FOLDER'], f"merit_{secrets.token_hex(8)}_{secure_filename(file.filename)}")
+    file.save(filepath)
+    try:
+        started = time.perf_counter()
+        table = cutoff_table
+        try:
+            candidates, report = read_merit_list(filepath, table)
+        except ValueError as e:
+            return fail(str(e))
+        with metrics.timer("simulation_seconds", phase="allocate"):
+            capacity, closing, filled, placed = simulate_allocation(table, candidates, runs, perturbation, seed)
+        results = simulation_report(table, capacity, closing, filled)
+    finally:
+        if os.path.exists(filepath):
+            os.remove(filepath)
+    summary = dict(report, candidates=len(candidates["ranks"]), runs=runs, perturbation=perturbation,
+                   seats=int(capacity.sum()), placed=placed[0],
+                   placed_mean=round(sum(placed) / len(placed), 1),
+                   seconds=round(time.perf_counter() - started, 3))
+    print(f"Simulated allocation of {summary['candidates']} candidates over {runs} runs "
+          f"in {summary['seconds']}s ({summary['placed']} placed)")
+
+    if export_format == 'json':
+        return jsonify(dict(summary, success=True, results=results))
+
+    import pandas as pd
+    df = pd.DataFrame(results)
+    output = io.BytesIO()
+    if export_format == 'csv':
+        output.write(df.to_csv(index=False).encode('utf-8'))
+        output.seek(0)
+        return send_file(output, as_attachment=True, download_name='EAPCET_Allocation_Simulation.csv',
+                         mimetype='text/csv')
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        df.to_excel(writer, sheet_name='Closing Ranks', index=False)
+        pd.DataFrame([{key: value for key, value in summary.items() if key != "errors"}]).to_excel(
+            writer, sheet_name='Summary', index=False)
+    output.seek(0)
+    return send_file(output, as_attachment=True, download_name='EAPCET_Allocation_Simulation.xlsx',
+                     mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+
+startup_timings["import"] = time.perf_counter() - IMPORT_STARTED
+
 if __name__ == '__main__':
+    warm_up()
     app.run(debug=True)
\ No newline at end of file
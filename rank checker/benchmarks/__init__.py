@@ -0,0 +1,14 @@
+"""
+Benchmarks for the rank checker app.
+
+Run from the "rank checker" directory:
+
+    python -m benchmarks.generate --sizes 100 1000 10000 --out bench_data
+    python -m benchmarks.run --sizes 100 1000 10000 --output results.json
+    python -m benchmarks.run --sizes 1000 --compare results.json
+
+generate.py writes synthetic catalogs (colleges_data.json plus the same
+data as an upload workbook) and run.py times the search, upload, clear and
+reload paths against them, writing percentiles, throughput and peak memory
+as JSON.
+"""
@@ -0,0 +1,191 @@
+"""
+Synthetic catalog generator.
+
+Catalogs have the shape process_excel_file() produces, so uploading the
+workbook of a catalog over its own colleges_data.json changes nothing.
+Everything is drawn from a seeded random.Random, so a (size, seed) pair
+always produces the same files.
+"""
+import argparse
+import json
+import math
+import os
+import random
+
+SIZES = (100, 1000, 10000)
+
+# (branch code, branch name, demand). Higher demand means better (lower)
+# closing ranks for the same institute.
+BRANCHES = [
+    ("CSE", "COMPUTER SCIENCE AND ENGINEERING", 3.0),
+    ("CSM", "COMPUTER SCIENCE AND ENGINEERING (AI AND ML)", 2.6),
+    ("CSD", "COMPUTER SCIENCE AND ENGINEERING (DATA SCIENCE)", 2.4),
+    ("INF", "INFORMATION TECHNOLOGY", 2.2),
+    ("ECE", "ELECTRONICS AND COMMUNICATION ENGINEERING", 1.8),
+    ("EEE", "ELECTRICAL AND ELECTRONICS ENGINEERING", 1.2),
+    ("MEC", "MECHANICAL ENGINEERING", 0.9),
+    ("CIV", "CIVIL ENGINEERING", 0.8),
+    ("CHE", "CHEMICAL ENGINEERING", 0.8),
+    ("AUT", "AUTOMOBILE ENGINEERING", 0.6),
+    ("BME", "BIO-MEDICAL ENGINEERING", 0.6),
+    ("MIN", "MINING ENGINEERING", 0.5),
+]
+
+# Branch counts per institute and how often each occurs
+BRANCH_COUNT_WEIGHTS = {1: 4, 2: 6, 3: 10, 4: 14, 5: 16, 6: 14, 7: 12, 8: 9, 9: 6, 10: 4, 11: 3, 12: 2}
+
+# Closing rank of each category relative to OC, and how often the
+# category has no cutoff at all for a branch
+CATEGORY_FACTORS = {
+    "OC": (1.0, 0.0),
+    "BC_A": (1.9, 0.05),
+    "BC_B": (1.4, 0.03),
+    "BC_C": (2.4, 0.35),
+    "BC_D": (1.3, 0.03),
+    "BC_E": (1.6, 0.08),
+    "SC": (2.8, 0.04),
+    "ST": (3.0, 0.15),
+    "EWS": (1.5, 0.10),
+}
+
+MAX_RANK = 200000
+
+DISTRICTS = [("HYD", "HYDERABAD"), ("RNG", "GHATKESAR"), ("RNG", "IBRAHIMPATNAM"), ("MDL", "MEDCHAL"),
+             ("WGL", "WARANGAL"), ("KRM", "KARIMNAGAR"), ("KMM", "KHAMMAM"), ("NLG", "NALGONDA"),
+             ("MBN", "MAHABUBNAGAR"), ("SRD", "SANGAREDDY"), ("NZB", "NIZAMABAD"), ("ADB", "ADILABAD")]
+COLLEGE_TYPES = [("PVT", 80), ("UNIV", 6), ("SF", 10), ("GOV", 4)]
+AFFILIATIONS = [("JNTUH", 70), ("OU", 15), ("KU", 10), ("MGU", 5)]
+
+# Workbook headers, as in create_template_excel(), and the catalog keys
+# they hold. Cutoff headers map to the cutoffs dict.
+TEMPLATE_COLUMNS = [
+    ("Inst Code", "inst_code"), ("Institute Name", "name"), ("Place", "place"), ("Dist Code", "dist_code"),
+    ("Co Education", "co_ed"), ("College Type", "college_type"), ("Year of Estab", "year_established"),
+    ("Branch Code", "branch_code"), ("Branch Name", "branch_name"),
+    ("OC BOYS", "OC_BOYS"), ("OC GIRLS", "OC_GIRLS"), ("BC_A BOYS", "BC_A_BOYS"), ("BC_A GIRLS", "BC_A_GIRLS"),
+    ("BC_B BOYS", "BC_B_BOYS"), ("BC_B GIRLS", "BC_B_GIRLS"), ("BC_C BOYS", "BC_C_BOYS"),
+    ("BC_C GIRLS", "BC_C_GIRLS"), ("BC_D BOYS", "BC_D_BOYS"), ("BC_D GIRLS", "BC_D_GIRLS"),
+    ("BC_E BOYS", "BC_E_BOYS"), ("BC_E GIRLS", "BC_E_GIRLS"), ("SC BOYS", "SC_BOYS"), ("SC GIRLS", "SC_GIRLS"),
+    ("ST BOYS", "ST_BOYS"), ("ST GIRLS", "ST_GIRLS"), ("EWS GEN OU", "EWS_GEN_OU"),
+    ("EWS GIRLS OU", "EWS_GIRLS_OU"), ("Tuition Fee", "tuition_fee"), ("Affiliated To", "affiliated_to"),
+    ("Seats", "seats"),
+]
+
+def weighted_choice(rng, weighted):
+    values, weights = zip(*weighted.items()) if isinstance(weighted, dict) else zip(*weighted)
+    return rng.choices(values, weights)[0]
+
+def clip_rank(value):
+    return max(1, min(MAX_RANK, int(round(value))))
+
+def generate_cutoffs(rng, oc_rank):
+    """Cutoffs dict for one branch whose OC boys closing rank is oc_rank"""
+    cutoffs = {}
+    for category, (factor, missing) in CATEGORY_FACTORS.items():
+        if rng.random() < missing:
+            continue
+        boys = clip_rank(oc_rank * factor * rng.uniform(0.85, 1.15))
+        girls = clip_rank(boys * rng.uniform(1.0, 1.25))
+        if category == "EWS":
+            cutoffs["EWS_GEN_OU"], cutoffs["EWS_GIRLS_OU"] = boys, girls
+        else:
+            cutoffs[f"{category}_BOYS"], cutoffs[f"{category}_GIRLS"] = boys, girls
+    return cutoffs
+
+def generate_institute(rng, number):
+    # Institute quality is log-normal: a few top colleges close early, most
+    # close in the tens of thousands
+    quality = math.exp(rng.gauss(10.2, 0.9))
+    dist_code, place = rng.choice(DISTRICTS)
+    count = weighted_choice(rng, BRANCH_COUNT_WEIGHTS)
+    branches = []
+    for code, name, demand in sorted(rng.sample(BRANCHES, count), key=BRANCHES.index):
+        oc_rank = quality / demand * rng.uniform(0.7, 1.3)
+        branches.append({
+            "branch_code": code,
+            "name": name,
+            "tuition_fee": int(min(200000, max(35000, 2.2e8 / (quality + 1500))) // 5000 * 5000),
+            "affiliated_to": weighted_choice(rng, AFFILIATIONS),
+            "cutoffs": generate_cutoffs(rng, oc_rank),
+            # A fixed pattern rather than an rng draw, so every other value is seeded as before
+            "seats": 60 * (1 + (number + len(branches)) % 3)
+        })
+    return {
+        "inst_code": f"C{number:05d}",
+        "name": f"COLLEGE {number} OF ENGINEERING AND TECHNOLOGY",
+        "place": place,
+        "dist_code": dist_code,
+        "co_ed": "GIRLS" if rng.random() < 0.06 else "COED",
+        "college_type": weighted_choice(rng, COLLEGE_TYPES),
+        "year_established": rng.randint(1960, 2022),
+        "branches": branches
+    }
+
+def generate_catalog(institutes, seed=0):
+    """Return a colleges_data dict with the given number of institutes"""
+    rng = random.Random(f"{institutes}-{seed}")
+    return {"institutes": [generate_institute(rng, number) for number in range(institutes)]}
+
+def perturb_catalog(catalog, fraction, seed=0):
+    """
+    Copy of catalog with the cutoffs of about fraction of its institutes
+    shifted, as a yearly update would. Returns (catalog, changed institutes).
+    """
+    rng = random.Random(f"perturb-{seed}")
+    changed = []
+    institutes = []
+    for institute in catalog["institutes"]:
+        if rng.random() < fraction:
+            institute = dict(institute, branches=[
+                dict(branch, cutoffs={key: clip_rank(value * rng.uniform(0.9, 1.1))
+                                      for key, value in branch["cutoffs"].items()})
+                for branch in institute["branches"]])
+            changed.append(institute)
+        institutes.append(institute)
+    return {"institutes": institutes}, changed
+
+def catalog_rows(institutes):
+    """One workbook row (header -> value) per branch"""
+    rows = []
+    for institute in institutes:
+        for branch in institute["branches"]:
+            values = dict(institute, branch_code=branch["branch_code"], branch_name=branch["name"],
+                          tuition_fee=branch["tuition_fee"], affiliated_to=branch["affiliated_to"],
+                          seats=branch["seats"], **branch["cutoffs"])
+            rows.append({header: values.get(key) for header, key in TEMPLATE_COLUMNS})
+    return rows
+
+def write_workbook(institutes, path):
+    """Write institutes as an upload file; the format follows the extension"""
+    import pandas as pd
+    df = pd.DataFrame(catalog_rows(institutes), columns=[header for header, _ in TEMPLATE_COLUMNS])
+    if path.endswith('.csv'):
+        df.to_csv(path, index=False)
+    else:
+        df.to_excel(path, index=False, engine='openpyxl')
+    return path
+
+def write_catalog(catalog, directory, workbook_format='xlsx'):
+    """Write colleges_data.json and upload.<format> for a catalog into directory"""
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, 'colleges_data.json'), 'w', encoding='utf-8') as f:
+        json.dump(catalog, f, ensure_ascii=False)
+    write_workbook(catalog["institutes"], os.path.join(directory, f'upload.{workbook_format}'))
+
+def main():
+    parser = argparse.ArgumentParser(description="Write synthetic colleges catalogs")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(SIZES), help="institutes per catalog")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--format', choices=('xlsx', 'csv'), default='xlsx', help="upload workbook format")
+    parser.add_argument('--out', default='bench_data', help="one subdirectory per size is written here")
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        catalog = generate_catalog(size, args.seed)
+        directory = os.path.join(args.out, str(size))
+        write_catalog(catalog, directory, args.format)
+        branches = sum(len(institute["branches"]) for institute in catalog["institutes"])
+        print(f"{directory}: {size} institutes, {branches} branches")
+
+if __name__ == '__main__':
+    main()
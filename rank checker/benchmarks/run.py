@@ -0,0 +1,351 @@
+"""
+Benchmark scenarios.
+
+Each catalog size gets a fresh temporary working directory holding a
+generated colleges_data.json, and a fresh copy of the app module loaded
+from it, so sizes never share data, caches or snapshot files. Every
+scenario is timed over a number of iterations, then run once more under
+tracemalloc to find its peak Python/NumPy allocation. Search answers are
+checked against a full scan of the cutoff matrix after each iteration,
+outside the timed part.
+"""
+import argparse
+import contextlib
+import datetime
+import importlib.util
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from . import generate
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(APP_DIR, 'app.py')
+
+# Rank ranges the search scenarios draw from: toppers, the dense middle
+# and the tail
+RANK_RANGES = [(1, 2000), (2000, 20000), (20000, 80000), (80000, 200000)]
+# The dense middle alone, where a search without a category returns the
+# most results
+WIDE_RANK_RANGES = [(20000, 80000)]
+
+def present_values(codes, index):
+    """Distinct values of a cutoff table's categorical column that occur in at least one row"""
+    vocab = list(index)
+    return [vocab[code] for code in sorted(set(codes.tolist()))]
+
+def reference_hits(app, table, query):
+    """
+    Every hit of a /search query, found by scanning the whole cutoff matrix
+    rather than the rank indexes, as (distance, inst_code, branch_code,
+    category, gender, cutoff_rank) tuples
+    """
+    rank = int(query["rank"])
+    lower_bound, upper_bound = app.search_window(rank)
+    ranks = table["ranks"]
+    mask = (ranks >= lower_bound) & (ranks <= upper_bound)
+    if query.get("category"):
+        mask &= np.array([category == query["category"] for category in app.CUTOFF_CATEGORIES])
+    if query.get("branch"):
+        mask &= (table["branch_codes"] == table["branch_index"].get(query["branch"], -1))[:, None]
+    if query.get("college_type"):
+        mask &= (table["type_codes"] == table["type_index"].get(query["college_type"], -1))[:, None]
+    hits = []
+    for row, col in zip(*(positions.tolist() for positions in np.nonzero(mask))):
+        college, cutoff_rank = table["colleges"][row], int(ranks[row, col])
+        hits.append((abs(cutoff_rank - rank), college["inst_code"], college["branch_code"],
+                     app.CUTOFF_CATEGORIES[col], "GIRLS" if "GIRLS" in app.CUTOFF_KEYS[col] else "BOYS",
+                     cutoff_rank))
+    return hits
+
+def check_search(app, table, query, answer):
+    """Raise if a /search answer is not the reference scan's hits, closest first"""
+    rank = int(query["rank"])
+    hits = [(abs(result["cutoff_rank"] - rank), result["inst_code"], result["branch_code"],
+             result["category"], result["gender"], result["cutoff_rank"]) for result in answer["results"]]
+    expected = sorted(reference_hits(app, table, query))
+    distances = [hit[0] for hit in hits]
+    if distances != sorted(distances):
+        raise RuntimeError(f"/search {query} is not in distance order")
+    if "next_cursor" in answer:
+        # A first page: the closest hits, whichever of any tied ones
+        wrong = Counter(hits) - Counter(expected)
+        if wrong or distances != [hit[0] for hit in expected[:len(hits)]]:
+            raise RuntimeError(f"/search {query} page differs from a full scan")
+    elif sorted(hits) != expected:
+        raise RuntimeError(f"/search {query} returned {len(hits)} hits, a full scan finds {len(expected)}")
+
+class Bench:
+    """State shared by the scenarios of one catalog size"""
+
+    def __init__(self, size, seed, directory):
+        self.size = size
+        self.directory = directory
+        self.rng = random.Random(seed)
+        self.catalog = generate.generate_catalog(size, seed)
+        generate.write_catalog(self.catalog, directory)
+        self.updated, changed = generate.perturb_catalog(self.catalog, 1.0, seed)
+        generate.write_workbook(self.updated["institutes"], os.path.join(directory, 'update.xlsx'))
+        generate.write_workbook(changed[:max(1, size // 100)], os.path.join(directory, 'upsert.xlsx'))
+        self.uploads = 0
+        self.searches = []  # (query, response) pairs check() has yet to verify
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            spec = importlib.util.spec_from_file_location(f"bench_app_{size}", APP_PATH)
+            self.app = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(self.app)
+            self.app.warm_up()
+        self.client = self.app.app.test_client()
+        with self.client.session_transaction() as session:
+            session['admin_logged_in'] = True
+            session['admin_username'] = 'bench'
+        table = self.app.cutoff_table
+        self.branches = sorted(present_values(table["branch_codes"], table["branch_index"]))
+        self.college_types = sorted(present_values(table["type_codes"], table["type_index"]))
+
+    def rank(self, ranges=RANK_RANGES):
+        low, high = self.rng.choice(ranges)
+        return self.rng.randint(low, high)
+
+    def search(self, ranges=RANK_RANGES, **query):
+        # Every search is a cache miss; the cache would otherwise time dict lookups
+        self.app.search_cache.clear()
+        query = dict(query, rank=str(self.rank(ranges)))
+        response = self.client.post('/search', json=query)
+        if response.status_code != 200:
+            raise RuntimeError(f"/search returned {response.status_code}: {response.get_data(as_text=True)}")
+        self.searches.append((query, response))
+        return response
+
+    def check(self):
+        """Verify the searches made since the last check against a reference scan"""
+        table = self.app.cutoff_table
+        for query, response in self.searches:
+            answer = response.get_json()
+            if "queries" in query:
+                for batch_query, batch_answer in zip(query["queries"], answer["results"]):
+                    check_search(self.app, table, batch_query, batch_answer)
+            else:
+                check_search(self.app, table, query, answer)
+        self.searches.clear()
+
+    def restore(self):
+        """Put the original catalog back without timing it"""
+        app = self.app
+        with contextlib.redirect_stdout(io.StringIO()), app.data_lock, app.storage_write_lock():
+            app.sync_data()
+            table = app.build_cutoff_table([row for institute in self.catalog["institutes"]
+                                            for row in app.flatten_institute(institute)])
+            app.publish_data({"institutes": self.catalog["institutes"]}, table)
+
+def scenario_search(bench):
+    bench.search()
+
+def scenario_search_wide(bench):
+    """No category in the densest ranks: thousands of results, many sharing a row"""
+    bench.search(WIDE_RANK_RANGES)
+
+def scenario_search_category(bench):
+    bench.search(category=bench.rng.choice(list(bench.app.categories)))
+
+def scenario_search_branch(bench):
+    bench.search(category=bench.rng.choice(list(bench.app.categories)),
+                 branch=bench.rng.choice(bench.branches),
+                 college_type=bench.rng.choice(bench.college_types))
+
+def scenario_search_page(bench):
+    bench.search(limit=50)
+
+def scenario_search_batch(bench):
+    queries = [{"rank": str(bench.rank()), "category": bench.rng.choice(list(bench.app.categories))}
+               for _ in range(100)]
+    response = bench.client.post('/search/batch', json={"queries": queries})
+    if response.status_code != 200:
+        raise RuntimeError(f"/search/batch returned {response.status_code}")
+    bench.searches.append(({"queries": queries}, response))
+
+def scenario_upload_replace(bench):
+    # Alternate between the two catalogs so every upload changes every institute
+    bench.uploads += 1
+    path = os.path.join(bench.directory, 'update.xlsx' if bench.uploads % 2 else 'upload.xlsx')
+    with contextlib.redirect_stdout(io.StringIO()):
+        success, message = bench.app.process_excel_file(path, 'replace')
+    if not success:
+        raise RuntimeError(message)
+
+def scenario_upload_upsert(bench):
+    with contextlib.redirect_stdout(io.StringIO()):
+        success, message = bench.app.process_excel_file(os.path.join(bench.directory, 'upsert.xlsx'), 'upsert')
+    if not success:
+        raise RuntimeError(message)
+
+def scenario_clear(bench):
+    response = bench.client.post('/admin/clear')
+    if response.status_code != 302:
+        raise RuntimeError(f"/admin/clear returned {response.status_code}")
+
+def scenario_reload(bench):
+    """Load the stored data the way a newly started worker does"""
+    bench.app.storage.load()
+
+def scenario_reload_json(bench):
+    """Parse and index colleges_data.json, the JSON import path"""
+    data = bench.app.load_colleges_data()
+    bench.app.build_cutoff_table([row for institute in data["institutes"]
+                                  for row in bench.app.flatten_institute(institute)])
+
+# name -> (function, default iterations, when to restore() the original
+# catalog: None, "after" the scenario or after "each" iteration)
+SCENARIOS = {
+    "search": (scenario_search, 200, None),
+    "search_wide": (scenario_search_wide, 50, None),
+    "search_category": (scenario_search_category, 200, None),
+    "search_branch": (scenario_search_branch, 200, None),
+    "search_page": (scenario_search_page, 200, None),
+    "search_batch": (scenario_search_batch, 20, None),
+    "upload_replace": (scenario_upload_replace, 4, "after"),
+    "upload_upsert": (scenario_upload_upsert, 4, "after"),
+    "clear": (scenario_clear, 4, "each"),
+    "reload": (scenario_reload, 10, None),
+    "reload_json": (scenario_reload_json, 4, None),
+}
+
+def percentile(sorted_values, fraction):
+    """Linear-interpolated percentile of an already sorted list"""
+    position = (len(sorted_values) - 1) * fraction
+    low = int(position)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (position - low)
+
+def max_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def run_scenario(bench, name, iterations):
+    function, _, restore = SCENARIOS[name]
+    latencies = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        function(bench)
+        latencies.append(time.perf_counter() - started)
+        bench.check()
+        if restore == "each":
+            bench.restore()
+    total = sum(latencies)
+
+    tracemalloc.start()
+    try:
+        function(bench)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    bench.check()
+    if restore:
+        bench.restore()
+
+    latencies.sort()
+    return {
+        "size": bench.size,
+        "scenario": name,
+        "iterations": iterations,
+        "mean_ms": round(total / iterations * 1000, 3),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p90_ms": round(percentile(latencies, 0.90) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3),
+        "throughput_per_s": round(iterations / total, 2) if total else None,
+        "peak_alloc_mb": round(peak / (1024 * 1024), 2),
+        "max_rss_mb": max_rss_mb()
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=APP_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare_results(baseline, results):
+    """Print p50/p99 changes against a previous results file"""
+    previous = {(result["size"], result["scenario"]): result for result in baseline["results"]}
+    print(f"\nCompared with {baseline.get('commit') or 'baseline'} ({baseline.get('started_at')}):")
+    for result in results:
+        old = previous.get((result["size"], result["scenario"]))
+        if not old:
+            continue
+        changes = []
+        for key in ("p50_ms", "p99_ms"):
+            if old[key]:
+                changes.append(f"{key} {old[key]:.2f} -> {result[key]:.2f} "
+                               f"({(result[key] - old[key]) / old[key] * 100:+.0f}%)")
+        print(f"  {result['size']:>6} {result['scenario']:<16} " + ", ".join(changes))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark search, upload, clear and reload")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(generate.SIZES))
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--iterations', type=int, help="override the per-scenario iteration counts")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--backend', choices=('snapshot', 'sqlite'), help="STORAGE_BACKEND to benchmark")
+    parser.add_argument('--output', help="write results as JSON to this file")
+    parser.add_argument('--compare', help="results JSON of an earlier run to compare against")
+    args = parser.parse_args()
+
+    if args.backend:
+        os.environ['STORAGE_BACKEND'] = args.backend
+    report = {
+        "started_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "backend": os.environ.get('STORAGE_BACKEND', 'snapshot'),
+        "seed": args.seed,
+        "results": []
+    }
+
+    original_directory = os.getcwd()
+    print(f"{'size':>6} {'scenario':<16} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'ops/s':>9} {'peak MB':>8}")
+    for size in args.sizes:
+        directory = tempfile.mkdtemp(prefix=f'rank-bench-{size}-')
+        try:
+            # The app keeps its files relative to the working directory
+            os.chdir(directory)
+            bench = Bench(size, args.seed, directory)
+            for name in args.scenarios:
+                result = run_scenario(bench, name, args.iterations or SCENARIOS[name][1])
+                report["results"].append(result)
+                print(f"{size:>6} {name:<16} {result['p50_ms']:>9.2f} {result['p90_ms']:>9.2f} "
+                      f"{result['p99_ms']:>9.2f} {result['throughput_per_s']:>9.1f} {result['peak_alloc_mb']:>8.1f}")
+        finally:
+            os.chdir(original_directory)
+            shutil.rmtree(directory, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare_results(json.load(f), report["results"])
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Shared fixtures. Every app fixture is a fresh copy of the app module
+loaded in its own temporary working directory, which holds a generated
+catalog (colleges_data.json plus the same data as upload.xlsx), since the
+app keeps its data files relative to the working directory.
+
+Run from the "rank checker" directory: python -m pytest -q tests
+"""
+import contextlib
+import importlib.util
+import io
+import itertools
+import os
+import sys
+
+import pytest
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+from benchmarks import generate  # noqa: E402
+
+INSTITUTES = 200
+module_numbers = itertools.count()
+
+def load_app(directory, backend='snapshot', institutes=INSTITUTES, catalog=True):
+    """
+    Load app.py over a generated catalog in directory and return the module.
+    With catalog=False the directory's files are used as they are, so a second
+    module acts as another worker process sharing the first one's data.
+    """
+    directory = str(directory)
+    if catalog:
+        generate.write_catalog(generate.generate_catalog(institutes, 0), directory)
+    previous_backend = os.environ.get('STORAGE_BACKEND')
+    os.environ['STORAGE_BACKEND'] = backend
+    os.chdir(directory)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            spec = importlib.util.spec_from_file_location(
+                f"rank_app_{backend}_{os.path.basename(directory)}_{next(module_numbers)}",
+                os.path.join(APP_DIR, 'app.py'))
+            module = importlib.util.module_from_spec(spec)
+            # Flask finds templates/ from the module registered under its name
+            sys.modules[spec.name] = module
+            spec.loader.exec_module(module)
+            module.warm_up()
+    finally:
+        if previous_backend is None:
+            del os.environ['STORAGE_BACKEND']
+        else:
+            os.environ['STORAGE_BACKEND'] = previous_backend
+    module.workdir = directory
+    return module
+
+def use(module, monkeypatch):
+    """Make module's directory the working directory and start from an empty cache"""
+    monkeypatch.chdir(module.workdir)
+    module.search_cache.clear()
+    return module
+
+@pytest.fixture(scope="session")
+def snapshot_app(tmp_path_factory):
+    return load_app(tmp_path_factory.mktemp("snapshot"), 'snapshot')
+
+@pytest.fixture(scope="session")
+def sqlite_app(tmp_path_factory):
+    return load_app(tmp_path_factory.mktemp("sqlite"), 'sqlite')
+
+@pytest.fixture
+def app(snapshot_app, monkeypatch):
+    """The shared snapshot-backed app; tests must not change its data"""
+    return use(snapshot_app, monkeypatch)
+
+@pytest.fixture
+def sqlite(sqlite_app, monkeypatch):
+    """The shared sqlite-backed app; tests must not change its data"""
+    return use(sqlite_app, monkeypatch)
+
+@pytest.fixture
+def fresh_app(tmp_path, monkeypatch):
+    """An app of its own, for tests that upload or clear data"""
+    return use(load_app(tmp_path, 'snapshot', 50), monkeypatch)
+
+@pytest.fixture
+def client(app):
+    return app.app.test_client()
+
+def admin_client(module):
+    """A test client logged in as an admin"""
+    client = module.app.test_client()
+    with client.session_transaction() as session:
+        session['admin_logged_in'] = True
+        session['admin_username'] = 'test'
+    return client
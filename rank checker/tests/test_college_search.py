@@ -0,0 +1,42 @@
+def institute_search(app, institute_number):
+    """(inst_code, name, a rank with hits at that institute)"""
+    institute = app.get_colleges_data()["institutes"][institute_number]
+    cutoff = institute["branches"][0]["cutoffs"]["OC_BOYS"]
+    return institute["inst_code"], institute["name"], cutoff
+
+def test_picking_a_suggestion_narrows_search_to_that_institute(app, client):
+    inst_code, name, rank = institute_search(app, 12)
+    suggestions = client.get('/colleges/suggest', query_string={"q": name[:12]}).get_json()["suggestions"]
+    picked = next(suggestion for suggestion in suggestions if suggestion["inst_code"] == inst_code)
+
+    everything = client.get('/search', query_string={"rank": rank}).get_json()
+    # index.html puts the suggestion's name in the college input
+    narrowed = client.get('/search', query_string={"rank": rank, "college": picked["name"]}).get_json()
+    assert narrowed["count"] > 0
+    assert narrowed["count"] < everything["count"]
+    assert {result["inst_code"] for result in narrowed["results"]} == {inst_code}
+
+def test_exact_inst_code_keeps_only_that_institute(app, client):
+    inst_code, _, rank = institute_search(app, 40)
+    results = client.get('/search', query_string={"rank": rank, "college": inst_code.lower()}).get_json()["results"]
+    assert results
+    assert {result["inst_code"] for result in results} == {inst_code}
+
+def test_word_prefix_beats_fuzzy_matches(client):
+    results = client.get('/search', query_string={"rank": 40000, "college": "ibrahim"}).get_json()["results"]
+    assert results
+    assert {result["place"] for result in results} == {"IBRAHIMPATNAM"}
+
+def test_typos_fall_back_to_fuzzy_matches(client):
+    results = client.get('/search', query_string={"rank": 40000, "college": "hyderabd"}).get_json()["results"]
+    assert results
+    assert {result["place"] for result in results} == {"HYDERABAD"}
+
+def test_suggest_ranks_exact_inst_code_first(app, client):
+    inst_code, _, _ = institute_search(app, 7)
+    suggestions = client.get('/colleges/suggest', query_string={"q": inst_code}).get_json()["suggestions"]
+    assert suggestions[0]["inst_code"] == inst_code
+
+def test_unknown_college_matches_nothing(client):
+    response = client.get('/search', query_string={"rank": 40000, "college": "zzqqxx"}).get_json()
+    assert response["count"] == 0
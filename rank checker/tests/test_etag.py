@@ -0,0 +1,58 @@
+import gzip
+
+from conftest import admin_client
+
+SEARCH = "/search?rank=5000&category=OC"
+
+def test_matching_if_none_match_gets_304_without_searching(app, client, monkeypatch):
+    response = client.get(SEARCH)
+    etag = response.headers["ETag"]
+    assert response.status_code == 200 and etag.startswith('W/"')
+
+    def fail(*args):
+        raise AssertionError("a 304 should not search")
+    monkeypatch.setattr(app, "search_page", fail)
+    app.search_cache.clear()
+    response = client.get(SEARCH, headers={"If-None-Match": etag})
+    assert response.status_code == 304 and response.data == b""
+    assert response.headers["ETag"] == etag
+
+def test_etag_follows_the_query(client):
+    etag = client.get(SEARCH).headers["ETag"]
+    assert client.get(SEARCH).headers["ETag"] == etag
+    # The same query spelled differently normalizes to the same ETag
+    assert client.get("/search?category=%20OC%20&rank=5000").headers["ETag"] == etag
+    other = client.get("/search?rank=5000&category=SC")
+    assert other.headers["ETag"] != etag
+    assert client.get("/search?rank=5000&category=SC", headers={"If-None-Match": etag}).status_code == 200
+
+def test_post_is_never_answered_with_304(client):
+    etag = client.get(SEARCH).headers["ETag"]
+    response = client.post("/search", json={"rank": "5000", "category": "OC"}, headers={"If-None-Match": etag})
+    assert response.status_code == 200 and response.get_json()["results"]
+
+def test_compressed_body_matches_the_plain_one(client):
+    plain = client.get("/search?rank=20000")
+    compressed = client.get("/search?rank=20000", headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in compressed.headers["Vary"]
+    assert gzip.decompress(compressed.data) == plain.data
+    assert compressed.headers["ETag"] == plain.headers["ETag"]
+
+def test_new_data_changes_every_etag(fresh_app):
+    client = admin_client(fresh_app)
+    search_etag = client.get(SEARCH).headers["ETag"]
+    export_etag = client.get("/admin/data").headers["ETag"]
+    assert client.get("/admin/data", headers={"If-None-Match": export_etag}).status_code == 304
+
+    institutes = fresh_app.get_colleges_data()["institutes"][1:]
+    with fresh_app.data_lock, fresh_app.storage_write_lock():
+        fresh_app.sync_data()
+        table = fresh_app.build_cutoff_table([row for institute in institutes
+                                              for row in fresh_app.flatten_institute(institute)])
+        assert fresh_app.publish_data({"institutes": institutes}, table)
+
+    response = client.get(SEARCH, headers={"If-None-Match": search_etag})
+    assert response.status_code == 200 and response.headers["ETag"] != search_etag
+    response = client.get("/admin/data", headers={"If-None-Match": export_etag})
+    assert response.status_code == 200 and response.headers["ETag"] != export_etag
@@ -0,0 +1,38 @@
+from collections import Counter
+
+import pytest
+
+from test_search import search
+
+QUERIES = [
+    {"rank": "5000"},
+    {"rank": "20000", "category": "BC-B"},
+    {"rank": "12000", "branch": "COMPUTER SCIENCE AND ENGINEERING"},
+    {"rank": "40000", "college_type": ["PVT", "UNIV"], "place": "HYDERABAD"},
+    {"rank": "9000", "co_ed": "COED", "max_fee": 60000, "college": "engineering"},
+]
+
+def facets(client, query):
+    response = client.post("/search/facets", json=query)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_facet_counts_match_search_results(app, client, query):
+    answer = facets(client, query)
+    results = search(client, **query)["results"]
+    assert results and answer["count"] == len(results)
+
+    for field, counts in answer["facets"].items():
+        # A facet is counted without its own filter, so it matches a search
+        # that leaves that filter out
+        unfiltered = search(client, **{key: value for key, value in query.items() if key != field})["results"]
+        expected = Counter(result[field] for result in unfiltered)
+        assert {item["value"]: item["count"] for item in counts if item["count"]} == expected, field
+        assert [item["count"] for item in counts] == sorted((item["count"] for item in counts), reverse=True)
+
+def test_facet_value_count_is_what_picking_it_gives(client):
+    query = {"rank": "15000", "category": "OC"}
+    for item in facets(client, query)["facets"]["college_type"]:
+        picked = search(client, **query, college_type=item["value"])
+        assert len(picked["results"]) == item["count"]
@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+from conftest import admin_client
+
+# Each /search order, with the extra fields that ask for it
+SORTS = {
+    "distance": {},
+    "probability": {"sort": "probability"},
+    "score_profile": {"profile": "safe"},
+    "score_weights": {"weights": {"fee": 2, "closeness": 1}, "prefer_dist_code": ["HYD"]},
+}
+
+QUERIES = [
+    {"rank": "5000"},
+    {"rank": "3000", "category": "BC-A"},
+    {"rank": "30000", "category": "SC", "college_type": "PVT"},
+    {"rank": "12000", "branch": "COMPUTER SCIENCE AND ENGINEERING", "place": ["HYDERABAD", "WARANGAL"]},
+]
+
+def search(client, **query):
+    response = client.post("/search", json=query)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+def all_pages(client, query, limit):
+    """Every result of query, following next_cursor page by page"""
+    results, cursor = [], None
+    while True:
+        page = search(client, **query, limit=limit, **({"cursor": cursor} if cursor else {}))
+        assert len(page["results"]) <= limit
+        results.extend(page["results"])
+        cursor = page.get("next_cursor")
+        if cursor is None:
+            assert len(page["results"]) < limit or page["results"] == []
+            return results
+
+@pytest.mark.parametrize("sort", SORTS)
+@pytest.mark.parametrize("query", QUERIES)
+def test_cursor_pages_add_up_to_the_unpaged_results(client, sort, query):
+    query = dict(query, **SORTS[sort])
+    full = search(client, **query)["results"]
+    assert full
+    for limit in (1, 7, len(full)):
+        assert all_pages(client, query, limit) == full
+
+@pytest.mark.parametrize("sort", SORTS)
+def test_results_come_in_sort_order(client, sort):
+    rank = 20000
+    results = search(client, rank=str(rank), **SORTS[sort])["results"]
+    if sort == "distance":
+        keys = [abs(result["cutoff_rank"] - rank) for result in results]
+    elif sort == "probability":
+        keys = [-result["admission_probability"] for result in results]
+    else:
+        keys = [-result["score"] for result in results]
+    assert keys == sorted(keys)
+
+def test_stream_matches_the_unpaged_results(client):
+    query = {"rank": "8000", "category": "OC", "profile": "dream"}
+    response = client.post("/search", json=dict(query, stream=True))
+    assert response.mimetype == "application/x-ndjson"
+    streamed = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert streamed == search(client, **query)["results"]
+
+def test_fields_project_every_page(client):
+    page = search(client, rank="5000", limit=5, fields="inst_code,cutoff_rank")
+    assert page["results"] and all(set(result) == {"inst_code", "cutoff_rank"} for result in page["results"])
+    page = search(client, rank="5000", limit=5, fields="inst_code,cutoff_rank", cursor=page["next_cursor"])
+    assert page["results"] and all(set(result) == {"inst_code", "cutoff_rank"} for result in page["results"])
+
+def test_malformed_cursor_is_rejected(client):
+    response = client.post("/search", json={"rank": "5000", "limit": 5, "cursor": "nonsense"})
+    assert response.status_code == 400
+
+def test_cursor_expires_with_the_data(fresh_app):
+    client = fresh_app.app.test_client()
+    cursor = search(client, rank="5000", limit=5)["next_cursor"]
+    assert admin_client(fresh_app).post("/admin/clear").status_code == 302
+    response = client.post("/search", json={"rank": "5000", "limit": 5, "cursor": cursor})
+    assert response.status_code == 400
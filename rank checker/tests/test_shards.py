@@ -0,0 +1,112 @@
+import gzip
+import json
+import os
+import re
+import shutil
+import subprocess
+
+import pytest
+
+from conftest import admin_client
+from test_search import search
+
+# The front end answers plain searches from shards with its own JavaScript,
+# so these tests run the functions of the served page under node
+NODE = shutil.which("node")
+pytestmark = pytest.mark.skipif(NODE is None, reason="needs node to run the front end's shard code")
+
+FRONT_END_FUNCTIONS = ("loadShardManifest", "searchWindow", "normalSf", "shardResultsFor")
+
+QUERIES = [("", 1), ("", 5000), ("OC", 999), ("OC", 1000), ("OC", 20000), ("BC-B", 45678),
+           ("SC", 120000), ("ST", 7000), ("BC-E", 150000)]
+
+def front_end(client):
+    """The shard code of the page the app serves, with its constants filled in"""
+    page = client.get("/").get_data(as_text=True)
+    sources = [re.search(rf"^ *const {name} = .*;$", page, re.M).group(0)
+               for name in ("DATA_GENERATION", "SHARD_URL")]
+    sources.append("let shardManifest = null;")
+    for name in FRONT_END_FUNCTIONS:
+        sources.append(re.search(rf"^( *)function {name}\(.*?^\1}}$", page, re.M | re.S).group(0))
+    return "\n".join(sources)
+
+def run_front_end(client, script, data):
+    """Run script after the page's shard code, with data as `input`; returns what it prints as JSON"""
+    source = front_end(client) + "\nconst input = JSON.parse(require('fs').readFileSync(0, 'utf8'));\n" + script
+    output = subprocess.run([NODE, "-e", source], input=json.dumps(data), capture_output=True, text=True,
+                            check=True, timeout=60).stdout
+    return json.loads(output)
+
+def read_manifest(folder):
+    with open(os.path.join(folder, "manifest.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+def shard_results(client, folder, queries):
+    """The results the front end shows for each (category, rank), from the shards in folder"""
+    manifest = read_manifest(folder)
+    shards, tasks = {}, []
+    for category, rank in queries:
+        entry = next(entry for entry in manifest["shards"][category] if entry["start"] <= rank <= entry["end"])
+        if entry["file"] not in shards:
+            with gzip.open(os.path.join(folder, entry["file"] + ".gz")) as f:
+                shards[entry["file"]] = json.load(f)
+        tasks.append([entry["file"], rank])
+    script = ("process.stdout.write(JSON.stringify("
+              "input.tasks.map(([file, rank]) => shardResultsFor(input.shards[file], rank))));")
+    return run_front_end(client, script, {"shards": shards, "tasks": tasks})
+
+def manifest_check(client, manifest):
+    """What the page's loadShardManifest() makes of manifest: itself if it may be used, else None"""
+    script = ("fetch = () => Promise.resolve({ok: true, json: () => input});"
+              "loadShardManifest().then(manifest => process.stdout.write(JSON.stringify(manifest)));")
+    return run_front_end(client, script, manifest)
+
+def shard_files(folder):
+    return {os.path.relpath(os.path.join(directory, name), folder)
+            for directory, _, names in os.walk(folder) for name in names if name.endswith(".json.gz")}
+
+def test_shard_results_match_search(app, client, tmp_path):
+    folder = str(tmp_path / "shards")
+    manifest, rendered = app.export_shards(folder, workers=1)
+    assert manifest["version"] == app.data_generation
+    assert rendered == sum(len(entries) for entries in manifest["shards"].values())
+
+    answers = shard_results(client, folder, QUERIES)
+    for (category, rank), results in zip(QUERIES, answers):
+        query = {"rank": str(rank), **({"category": category} if category else {})}
+        assert results == search(client, **query)["results"], (category, rank)
+    assert sum(len(results) > 1 for results in answers) > len(QUERIES) // 2
+
+def test_stale_manifest_is_ignored_and_stale_shards_pruned(fresh_app):
+    client = admin_client(fresh_app)
+    folder = fresh_app.SHARD_FOLDER
+    manifest, _ = fresh_app.export_shards(folder, workers=1)
+    assert manifest_check(client, manifest) == manifest
+    assert client.get("/shards/manifest.json").get_json() == manifest
+    before = shard_files(folder)
+
+    institutes = fresh_app.get_colleges_data()["institutes"][1:]
+    with fresh_app.data_lock, fresh_app.storage_write_lock():
+        fresh_app.sync_data()
+        table = fresh_app.build_cutoff_table([row for institute in institutes
+                                              for row in fresh_app.flatten_institute(institute)])
+        assert fresh_app.publish_data({"institutes": institutes}, table)
+    # The page now carries the new generation, so the old manifest is not used
+    assert manifest["version"] != fresh_app.data_generation
+    assert manifest_check(client, manifest) is None
+
+    stray = os.path.join(folder, "OC", "1-1000.0000000000000000.json.gz")
+    with open(stray, "wb") as f:
+        f.write(gzip.compress(b"{}"))
+    manifest, rendered = fresh_app.export_shards(folder, workers=1)
+    assert manifest_check(client, manifest) == manifest
+    listed = {entry["file"] + ".gz" for entries in manifest["shards"].values() for entry in entries}
+    # Only shards the dropped institute was in are rendered again, and unlisted files are removed
+    assert 0 < rendered < len(listed)
+    assert shard_files(folder) == listed
+    assert before - listed and not os.path.exists(stray)
+
+    queries = [("", 5000), ("OC", 20000), ("SC", 60000)]
+    for (category, rank), results in zip(queries, shard_results(client, folder, queries)):
+        query = {"rank": str(rank), **({"category": category} if category else {})}
+        assert results == search(client, **query)["results"], (category, rank)
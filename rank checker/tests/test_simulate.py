@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+def pool(app, key):
+    return app.CUTOFF_KEYS.index(key)
+
+def hand_built_table(app):
+    """Two institutes of one branch each, with cutoffs and seats chosen by hand"""
+    institutes = [
+        {"inst_code": "AAA1", "name": "ALPHA COLLEGE", "place": "HYDERABAD", "co_ed": "COED", "college_type": "PVT",
+         "branches": [{"branch_code": "CSE", "name": "COMPUTER SCIENCE", "seats": 10,
+                       "cutoffs": {"OC_BOYS": 100, "OC_GIRLS": 150}}]},
+        {"inst_code": "BBB2", "name": "BETA COLLEGE", "place": "WARANGAL", "co_ed": "COED", "college_type": "PVT",
+         "branches": [{"branch_code": "ECE", "name": "ELECTRONICS", "seats": 3,
+                       "cutoffs": {"OC_BOYS": 900}}]}
+    ]
+    return app.build_cutoff_table([row for institute in institutes for row in app.flatten_institute(institute)])
+
+def test_allocate_seats_fills_pools_in_rank_order(app):
+    capacity = np.zeros((2, len(app.CUTOFF_KEYS)), dtype=np.int64)
+    capacity[0, pool(app, "OC_BOYS")] = 1
+    capacity[0, pool(app, "OC_GIRLS")] = 1
+    capacity[0, pool(app, "BC_A_BOYS")] = 1
+    capacity[1, pool(app, "OC_BOYS")] = 2
+    candidates = [  # rank, category, girl, preferences
+        (1, "OC", False, [0, 1]),   # Branch 0, OC boys
+        (2, "BC-A", True, [0]),     # OC boys is full: OC girls
+        (3, "BC-A", False, [0, 1]), # OC seats are full: BC-A boys
+        (4, "OC", True, [0, 1]),    # Branch 0 is full for them: branch 1
+        (5, "OC", False, [0]),      # Nothing left
+        (6, "SC", False, []),
+        (7, "OC", False, [1]),
+    ]
+    ranks = np.array([rank for rank, _, _, _ in candidates], dtype=np.int64)
+    pools = [app.candidate_pools(category, girl) for _, category, girl, _ in candidates]
+    preferences = np.full((len(candidates), 2), -1, dtype=np.int32)
+    for number, (_, _, _, choices) in enumerate(candidates):
+        preferences[number, :len(choices)] = choices
+
+    closing, filled, placed = app.allocate_seats(capacity, ranks, pools, preferences)
+    closing = closing.reshape(capacity.shape)
+    filled = filled.reshape(capacity.shape)
+    assert placed == 5
+    assert closing[0, pool(app, "OC_BOYS")] == 1
+    assert closing[0, pool(app, "OC_GIRLS")] == 2
+    assert closing[0, pool(app, "BC_A_BOYS")] == 3
+    assert closing[1, pool(app, "OC_BOYS")] == 7
+    assert np.count_nonzero(closing) == 4
+    np.testing.assert_array_equal(filled, capacity)
+
+def test_seat_matrix_splits_every_seat(app):
+    capacity = app.seat_matrix(hand_built_table(app))
+    assert capacity.sum(axis=1).tolist() == [10, 3]
+    assert (capacity >= 0).all()
+    # Ten seats: 4 OC, of which a third (rounded) are for girls
+    assert capacity[0, pool(app, "OC_BOYS")] + capacity[0, pool(app, "OC_GIRLS")] == 4
+    assert capacity[0, pool(app, "OC_GIRLS")] == 1
+
+def write_merit_list(path, rows, columns=("Rank", "Category", "Gender", "Preferences")):
+    pd.DataFrame(rows, columns=list(columns)).to_csv(path, index=False)
+    return str(path)
+
+def test_simulation_is_deterministic_and_run_zero_unperturbed(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(app, "SIMULATION_WORKERS", 1)
+    table = hand_built_table(app)
+    rows = [(rank, "OC" if rank % 3 else "BC-B", "F" if rank % 2 else "M",
+             "AAA1-CSE; BBB2-ECE" if rank % 4 else "bbb2-ece,aaa1-cse") for rank in range(1, 21)]
+    candidates, report = app.read_merit_list(write_merit_list(tmp_path / "merit.csv", rows), table)
+    assert report["rows"] == 20 and report["skipped_rows"] == 0 and report["unknown_preferences"] == 0
+
+    capacity, closing, filled, placed = app.simulate_allocation(table, candidates, runs=4, perturbation=0.5, seed=1)
+    assert closing.shape == filled.shape == (4, capacity.size) and len(placed) == 4
+    # Only the OC and BC-B boys pools and OC girls have seats these candidates may take: 5 + 2
+    assert placed == filled.sum(axis=1).tolist() == [7] * 4
+    # Run 0 uses the preferences as given, whatever the seed
+    expected = app.allocate_seats(capacity, candidates["ranks"], candidates["pools"], candidates["preferences"])
+    np.testing.assert_array_equal(closing[0], expected[0])
+    np.testing.assert_array_equal(filled[0], expected[1])
+    _, other_closing, _, _ = app.simulate_allocation(table, candidates, runs=4, perturbation=0.5, seed=2)
+    np.testing.assert_array_equal(other_closing[0], closing[0])
+    # The same seed gives the same runs
+    _, again, _, _ = app.simulate_allocation(table, candidates, runs=4, perturbation=0.5, seed=1)
+    np.testing.assert_array_equal(again, closing)
+    assert any((run != closing[0]).any() for run in closing[1:])
+
+    # Ranks 1-3 fill ALPHA's OC boys seats and 5 (a girl) its OC girls seat; 6 (BC-B) its BC-B
+    # boys seat. Rank 4 lists BETA first; 7 and 8 find nothing left and 9 (BC-B) takes BETA's last seat.
+    closing = closing[0].reshape(capacity.shape)
+    assert {(row, app.CUTOFF_KEYS[col]): int(closing[row, col]) for row, col in zip(*np.nonzero(closing))} == {
+        (0, "OC_BOYS"): 3, (0, "OC_GIRLS"): 5, (0, "BC_B_BOYS"): 6, (1, "OC_BOYS"): 4, (1, "BC_B_BOYS"): 9}
+
+def test_merit_list_needs_every_column(app, tmp_path):
+    path = write_merit_list(tmp_path / "merit.csv", [(1, "OC", "M")], columns=("rank", "CATEGORY", " Gender "))
+    with pytest.raises(ValueError, match="Missing required columns: preferences"):
+        app.read_merit_list(path, hand_built_table(app))
+
+def test_merit_list_skips_bad_ranks(app, tmp_path):
+    rows = [(5, "OC", "M", "AAA1-CSE"), ("abc", "OC", "M", "AAA1-CSE"), (0, "OC", "F", "AAA1-CSE"),
+            (-3, "OC", "F", "AAA1-CSE"), (None, "OC", "M", "AAA1-CSE"), (2, "oc", "girl", "AAA1-CSE NOPE-X"),
+            (3, "XX", "M", "AAA1-CSE"), (4, "SC", "?", "AAA1-CSE")]
+    candidates, report = app.read_merit_list(write_merit_list(tmp_path / "merit.csv", rows), hand_built_table(app))
+    assert candidates["ranks"].tolist() == [2, 5]
+    assert candidates["preferences"].tolist() == [[0], [0]]
+    assert report["rows"] == 8 and report["skipped_rows"] == 6 and report["unknown_preferences"] == 1
+    assert report["errors"] == [f"Row {row}: rank must be a positive number" for row in (3, 4, 5, 6)] + [
+        "Row 8: unknown category 'XX'", "Row 9: unknown gender '?'"]
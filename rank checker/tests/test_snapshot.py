@@ -0,0 +1,151 @@
+import json
+import struct
+
+import numpy as np
+import pytest
+
+def test_snapshot_rows_are_built_once(app, monkeypatch):
+    table = app.load_snapshot_table(app.read_snapshot(app.SNAPSHOT_FILE))
+    rows = table["colleges"]
+    built = []
+    flatten = app.flatten_institute
+    monkeypatch.setattr(app, "flatten_institute", lambda institute: built.append(1) or flatten(institute))
+
+    first = rows[5]
+    assert rows[5] is first and rows[-len(rows) + 5] is first
+    assert rows[3:7][2] is first
+    assert len(built) == 4
+    assert list(rows) == [row for institute in app.get_colleges_data()["institutes"]
+                          for row in flatten(institute)]
+
+def sample_institutes():
+    """Institutes that exercise every way a value is stored: shared, extra keys, odd cutoffs"""
+    return [
+        {"inst_code": "AAA1", "name": "ALPHA COLLEGE", "place": "HYDERABAD", "dist_code": "HYD", "co_ed": "COED",
+         "college_type": "PVT", "year_established": 1999, "facilities": ["Library", "Hostel"], "accredited": True,
+         "branches": [
+             {"branch_code": "CSE", "name": "COMPUTER SCIENCE", "tuition_fee": 75000, "seats": 60,
+              "cutoffs": {"OC_BOYS": 1200, "OC_GIRLS": 1500}},
+             # Cutoffs the matrix cannot rebuild exactly are kept as values
+             {"branch_code": "ECE", "name": "ELECTRONICS", "tuition_fee": 75000,
+              "cutoffs": {"OC_GIRLS": "2500", "OC_BOYS": 2400}, "lateral": {"seats": 6}},
+             {"branch_code": "CIV", "name": "CIVIL ENGINEERING"}
+         ]},
+        {"inst_code": "BBB2", "name": "BETA INSTITUTE తె", "place": "WARANGAL", "co_ed": "GIRLS",
+         "college_type": "UNIV", "branches": [
+             {"branch_code": "CSE", "name": "COMPUTER SCIENCE", "tuition_fee": None, "affiliated_to": "JNTUH",
+              "cutoffs": {"SC_GIRLS": 40000}}
+         ]},
+        {"inst_code": "CCC3", "name": "GAMMA COLLEGE", "place": "HYDERABAD", "co_ed": "COED",
+         "college_type": "PVT", "branches": []}
+    ]
+
+def sample_table(app, institutes):
+    return app.build_cutoff_table([row for institute in institutes for row in app.flatten_institute(institute)])
+
+def write_sample(app, path, generation=7):
+    institutes = sample_institutes()
+    app.write_snapshot(str(path), institutes, sample_table(app, institutes), generation)
+    return institutes
+
+def test_snapshot_round_trip(app, tmp_path):
+    path = tmp_path / "data.snapshot"
+    institutes = write_sample(app, path)
+    snapshot = app.read_snapshot(str(path))
+    assert app.snapshot_institutes(snapshot) == institutes
+    assert snapshot["header"]["generation"] == 7
+    assert snapshot["header"]["institutes"] == 3 and snapshot["header"]["rows"] == 4
+
+    table, loaded = sample_table(app, institutes), app.load_snapshot_table(snapshot)
+    assert list(loaded["colleges"]) == table["colleges"]
+    np.testing.assert_array_equal(loaded["ranks"], table["ranks"])
+    assert loaded["generation"] == 7 and loaded["identity"] == app.snapshot_identity(str(path))
+    for name, index in table["rank_index"].items():
+        np.testing.assert_array_equal(loaded["rank_index"][name]["rows"], index["rows"])
+        assert loaded["rank_index"][name]["offsets"] == index["offsets"]
+
+def test_snapshot_columns_are_aligned_views(app, tmp_path):
+    path = tmp_path / "data.snapshot"
+    write_sample(app, path)
+    snapshot = app.read_snapshot(str(path))
+    header_length = struct.unpack_from("<II", snapshot["mapping"], len(app.SNAPSHOT_MAGIC))[1]
+    data_start = len(app.SNAPSHOT_MAGIC) + 8 + header_length
+    assert app.align_offset(data_start) % app.SNAPSHOT_ALIGNMENT == 0
+    for name, spec in snapshot["header"]["columns"].items():
+        column = snapshot["columns"][name]
+        assert spec["offset"] % app.SNAPSHOT_ALIGNMENT == 0, name
+        assert column.ctypes.data % app.SNAPSHOT_ALIGNMENT == 0, name
+        assert list(column.shape) == spec["shape"] and not column.flags.writeable
+    assert snapshot["columns"]["branch_start"].tolist() == [0, 3, 4, 4]
+    assert snapshot["columns"]["row_institute"].tolist() == [0, 0, 0, 1]
+
+def test_snapshot_value_table(app, tmp_path):
+    path = tmp_path / "data.snapshot"
+    write_sample(app, path)
+    snapshot = app.read_snapshot(str(path))
+    values, columns = snapshot["values"], snapshot["columns"]
+    branch_fields = columns["branch_fields"]
+    fee = app.BRANCH_FIELDS.index("tuition_fee")
+    # Equal values are stored once
+    assert branch_fields[0, fee] == branch_fields[1, fee] and values[int(branch_fields[0, fee])] == 75000
+    assert branch_fields[2, fee] == app.ABSENT_VALUE
+    assert values[int(branch_fields[3, fee])] is None
+    assert branch_fields[0, -1] == app.CUTOFFS_FROM_MATRIX
+    assert values[int(branch_fields[1, -1])] == {"OC_GIRLS": "2500", "OC_BOYS": 2400}
+    assert branch_fields[2, -1] == app.CUTOFFS_ABSENT
+    assert values[int(branch_fields[1, -2])] == {"lateral": {"seats": 6}}
+    assert values[int(columns["institute_fields"][0, -1])] == {"accredited": True}
+    # Lists and dicts are decoded fresh for each caller
+    facilities = int(columns["institute_fields"][0, app.INSTITUTE_FIELDS.index("facilities")])
+    assert values[facilities] == ["Library", "Hostel"] and values[facilities] is not values[facilities]
+    texts = [json.dumps(values[value_id]) for value_id in range(len(columns["value_offsets"]) - 1)]
+    assert len(texts) == len(set(texts))
+
+def test_snapshot_version_is_checked(app, tmp_path):
+    path = tmp_path / "data.snapshot"
+    write_sample(app, path)
+    data = bytearray(path.read_bytes())
+    struct.pack_into("<I", data, len(app.SNAPSHOT_MAGIC), app.SNAPSHOT_VERSION + 1)
+    path.write_bytes(bytes(data))
+    with pytest.raises(ValueError, match="Unsupported snapshot version"):
+        app.read_snapshot(str(path))
+
+@pytest.mark.parametrize("damage", ["magic", "empty", "header", "columns"])
+def test_damaged_snapshot_is_rejected(app, tmp_path, damage):
+    path = tmp_path / "data.snapshot"
+    write_sample(app, path)
+    data = path.read_bytes()
+    if damage == "magic":
+        data = b"NOTSNAP\0" + data[8:]
+    elif damage == "empty":
+        data = b""
+    elif damage == "header":
+        data = data[:40]
+    else:
+        data = data[:-100]
+    path.write_bytes(data)
+    message = "not a colleges snapshot" if damage in ("magic", "empty") else "truncated"
+    with pytest.raises(ValueError, match=message):
+        app.read_snapshot(str(path))
+
+def test_snapshot_is_replaced_atomically(app, tmp_path, monkeypatch):
+    path = tmp_path / "data.snapshot"
+    old = write_sample(app, path, generation=1)
+    snapshot = app.read_snapshot(str(path))
+
+    institutes = sample_institutes()[:2]
+    app.write_snapshot(str(path), institutes, sample_table(app, institutes), 2)
+    # A reader holding the old mapping still sees the old file
+    assert app.snapshot_institutes(snapshot) == old
+    assert snapshot["identity"] != app.snapshot_identity(str(path))
+    assert app.snapshot_institutes(app.read_snapshot(str(path))) == institutes
+    assert [entry.name for entry in tmp_path.iterdir()] == ["data.snapshot"]
+
+    # A write that fails part way leaves the published file and no temp file
+    def fail(*args):
+        raise OSError("disk full")
+    monkeypatch.setattr(app.os, "fsync", fail)
+    with pytest.raises(OSError):
+        app.write_snapshot(str(path), old, sample_table(app, old), 3)
+    assert [entry.name for entry in tmp_path.iterdir()] == ["data.snapshot"]
+    assert app.read_snapshot(str(path))["header"]["generation"] == 2
@@ -0,0 +1,96 @@
+import copy
+import random
+
+import pytest
+
+from conftest import load_app
+
+QUERIES = [
+    {"rank": "1500"},
+    {"rank": "20000", "category": "OC"},
+    {"rank": "45000", "category": "SC"},
+    {"rank": "30000", "branch": "COMPUTER SCIENCE AND ENGINEERING"},
+    {"rank": "60000", "category": "BC-B", "college_type": "PVT"},
+    {"rank": "90000", "branch": "CIVIL ENGINEERING", "college_type": "GOV"},
+    {"rank": "250000"},
+]
+
+def random_queries(count, seed=0):
+    rng = random.Random(seed)
+    return [{"rank": str(rng.randint(1, 150000)),
+             "category": rng.choice(["", "OC", "BC-A", "SC", "EWS"]),
+             "branch": rng.choice(["", "COMPUTER SCIENCE AND ENGINEERING", "MECHANICAL ENGINEERING"])}
+            for _ in range(count)]
+
+def test_sqlite_backend_answers_search_with_its_indexed_query(app, sqlite, monkeypatch):
+    calls = []
+    find_hits = sqlite.SqliteStorage.find_hits
+    monkeypatch.setattr(sqlite.SqliteStorage, "find_hits",
+                        lambda self, *args, **kwargs: calls.append(args) or find_hits(self, *args, **kwargs))
+    snapshot_client, sqlite_client = app.app.test_client(), sqlite.app.test_client()
+
+    for query in QUERIES + random_queries(40):
+        expected = snapshot_client.get('/search', query_string=query).get_json()
+        assert sqlite_client.get('/search', query_string=query).get_json() == expected
+    assert len(calls) == len(QUERIES) + 40
+
+@pytest.mark.parametrize("query", QUERIES[:5])
+def test_sqlite_pages_match_snapshot(app, sqlite, query):
+    snapshot_client, sqlite_client = app.app.test_client(), sqlite.app.test_client()
+    cursor = None
+    pages = 0
+    while True:
+        page = dict(query, limit="7", **({"cursor": cursor} if cursor else {}))
+        expected = snapshot_client.get('/search', query_string=page).get_json()
+        assert sqlite_client.get('/search', query_string=page).get_json() == expected
+        cursor = expected["next_cursor"]
+        pages += 1
+        if cursor is None or pages == 20:
+            break
+
+def test_sqlite_reloads_what_it_stored(sqlite):
+    data, table = sqlite.storage.load()
+    assert len(data["institutes"]) == len(sqlite.get_colleges_data()["institutes"])
+    assert len(table["colleges"]) == len(sqlite.cutoff_table["colleges"])
+    assert (table["ranks"] == sqlite.cutoff_table["ranks"]).all()
+
+def store(module, institutes):
+    """Store institutes as the next generation through module, the way an upload does"""
+    with module.data_lock, module.storage_write_lock():
+        module.sync_data()
+        table = module.build_cutoff_table([row for institute in institutes
+                                           for row in module.flatten_institute(institute)])
+        assert module.publish_data({"institutes": institutes}, table)
+
+@pytest.mark.parametrize("backend", ["snapshot", "sqlite"])
+def test_other_workers_serve_the_new_generation(tmp_path, monkeypatch, backend):
+    # Two modules over one directory stand in for two worker processes
+    first = load_app(tmp_path, backend, 50)
+    second = load_app(tmp_path, backend, catalog=False)
+    monkeypatch.chdir(tmp_path)
+    clients = [first.app.test_client(), second.app.test_client()]
+    query = {"rank": "20000", "category": "OC"}
+    old = clients[1].get("/search", query_string=query).get_json()
+    generation = second.data_generation
+
+    institutes = copy.deepcopy(first.get_colleges_data()["institutes"])
+    dropped = next(result["inst_code"] for result in old["results"])
+    institutes = [institute for institute in institutes if institute["inst_code"] != dropped]
+    institutes[0]["branches"][0]["cutoffs"]["OC_BOYS"] = 20000
+    store(first, institutes)
+    # The second worker remaps on its next request, not before
+    assert second.data_generation == generation
+
+    new = clients[1].get("/search", query_string=query).get_json()
+    assert second.data_generation == first.data_generation > generation
+    assert new == clients[0].get("/search", query_string=query).get_json() != old
+    assert dropped not in {result["inst_code"] for result in new["results"]}
+    assert any(result["inst_code"] == institutes[0]["inst_code"] and result["cutoff_rank"] == 20000
+               for result in new["results"])
+    assert second.get_colleges_data()["institutes"] == institutes
+
+    # ...and the other way round
+    store(second, institutes[1:])
+    assert clients[0].get("/search", query_string=query).get_json() == clients[1].get(
+        "/search", query_string=query).get_json()
+    assert first.data_generation == second.data_generation == generation + 2
@@ -0,0 +1,190 @@
+import copy
+import io
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import admin_client, load_app
+
+def upload_frame(module, frame, mode="upsert", dry_run=False, reader=None):
+    """
+    Upload frame as a CSV through /admin/upload and return the finished job,
+    as the reader module (by default the same one) reports it
+    """
+    form = {"file": (io.BytesIO(frame.to_csv(index=False).encode("utf-8")), "upload.csv"), "mode": mode}
+    if dry_run:
+        form["dry_run"] = "1"
+    response = admin_client(module).post("/admin/upload", data=form, content_type="multipart/form-data")
+    assert response.status_code == 302
+    client = admin_client(reader or module)
+    job = client.get("/admin/jobs").get_json()["jobs"][0]
+    deadline = time.time() + 30
+    while job["status"] not in ("succeeded", "failed") and time.time() < deadline:
+        time.sleep(0.05)
+        job = client.get(f"/admin/jobs/{job['id']}").get_json()
+    return job
+
+def catalog_frame(module):
+    """The generated catalog in the upload format"""
+    return pd.read_excel(f"{module.workdir}/upload.xlsx")
+
+def assert_same_table(patched, rebuilt):
+    assert list(patched["colleges"]) == rebuilt["colleges"]
+    np.testing.assert_array_equal(patched["ranks"], rebuilt["ranks"])
+    for column in ("branch", "type"):
+        vocab = list(rebuilt[f"{column}_index"])
+        patched_vocab = list(patched[f"{column}_index"])
+        assert ([patched_vocab[code] for code in patched[f"{column}_codes"].tolist()] ==
+                [vocab[code] for code in rebuilt[f"{column}_codes"].tolist()])
+    # Group codes may be numbered differently, so match each run to the
+    # rebuilt one by the values of its group
+    branches, types = list(patched["branch_index"]), list(patched["type_index"])
+    rebuilt_branches, rebuilt_types = list(rebuilt["branch_index"]), list(rebuilt["type_index"])
+    group_values = {
+        "all": lambda group, branches, types: None,
+        "branch": lambda group, branches, types: branches[group],
+        "type": lambda group, branches, types: types[group],
+        "branch_type": lambda group, branches, types: (branches[group // len(types)], types[group % len(types)])
+    }
+    for name, group_value in group_values.items():
+        index, expected = patched["rank_index"][name], rebuilt["rank_index"][name]
+        runs = {(col, group_value(group, branches, types)): span for (col, group), span in index["offsets"].items()}
+        expected_runs = {(col, group_value(group, rebuilt_branches, rebuilt_types)): span
+                         for (col, group), span in expected["offsets"].items()}
+        assert runs.keys() == expected_runs.keys()
+        for key, (start, end) in runs.items():
+            expected_start, expected_end = expected_runs[key]
+            np.testing.assert_array_equal(index["rows"][start:end], expected["rows"][expected_start:expected_end])
+            np.testing.assert_array_equal(index["ranks"][start:end], expected["ranks"][expected_start:expected_end])
+
+def edited_upload(institutes):
+    """An upload that changes a cutoff, renames a branch and adds an institute of a new type"""
+    upload = copy.deepcopy(institutes[3:6])
+    upload[0]["branches"][0]["cutoffs"]["OC_BOYS"] = 1
+    upload[1]["branches"][0]["name"] = "RENAMED BRANCH"
+    added = copy.deepcopy(institutes[0])
+    added["inst_code"] = "ZZNEW1"
+    added["college_type"] = "DEEMED"
+    for branch in added["branches"]:
+        branch["branch_code"] = "NEWB"
+        branch["cutoffs"] = {key: value + 7 for key, value in branch["cutoffs"].items()}
+    return upload + [added]
+
+@pytest.mark.parametrize("mode", ["upsert", "replace"])
+def test_patched_cutoff_table_matches_a_rebuild(app, mode):
+    institutes = app.colleges_data["institutes"]
+    upload = edited_upload(institutes)
+    if mode == "replace":
+        # ...and drops an institute
+        upload = institutes[:3] + upload + institutes[7:]
+    merged, changes = app.merge_institutes(institutes, upload, mode)
+    assert changes["institutes_added"] == 1 and changes["institutes_updated"] == 2
+    assert changes["institutes_removed"] == (mode == "replace")
+
+    patched = app.patch_cutoff_table(app.cutoff_table, institutes, merged)
+    rebuilt = app.build_cutoff_table([row for institute in merged for row in app.flatten_institute(institute)])
+    assert_same_table(patched, rebuilt)
+
+def test_upsert_upload_changes_only_the_uploaded_rows(fresh_app):
+    before = copy.deepcopy(fresh_app.get_colleges_data()["institutes"])
+    frame = catalog_frame(fresh_app)
+    rows = frame[frame["Inst Code"] == before[1]["inst_code"]].copy()
+    rows.iloc[0, rows.columns.get_loc("OC BOYS")] = 1
+
+    job = upload_frame(fresh_app, rows)
+    assert job["status"] == "succeeded", job
+    assert "institutes 0 added, 1 updated, 0 removed; branches 0 added, 1 updated" in job["message"]
+
+    after = fresh_app.get_colleges_data()["institutes"]
+    assert len(after) == len(before)
+    assert after[1]["branches"][0]["cutoffs"]["OC_BOYS"] == 1
+    assert after[:1] + after[2:] == before[:1] + before[2:]
+    rebuilt = fresh_app.build_cutoff_table([row for institute in after
+                                            for row in fresh_app.flatten_institute(institute)])
+    assert_same_table(fresh_app.cutoff_table, rebuilt)
+
+def test_upload_page_counts_without_loading_the_data(app, monkeypatch):
+    def fail():
+        raise AssertionError("the upload page should not load every institute")
+    monkeypatch.setattr(app, "get_colleges_data", fail)
+    response = admin_client(app).get("/admin/upload")
+    assert response.status_code == 200
+    assert f"<h3>{app.cutoff_table['snapshot']['header']['institutes']}</h3>" in response.get_data(as_text=True)
+
+def broken_frame(module):
+    """The first institute's rows with one issue of each error rule, as (frame, {(sheet row, column): rule})"""
+    frame = catalog_frame(module)
+    rows = frame[frame["Inst Code"] == frame["Inst Code"].iloc[0]].head(4).copy().astype(object)
+    rows = rows.reset_index(drop=True)
+    rows.loc[0, "OC BOYS"] = "abc"
+    rows.loc[1, "Branch Name"] = None
+    rows.loc[2, "Place"] = "ELSEWHERE"
+    rows.loc[3, "Branch Code"] = rows.loc[0, "Branch Code"]
+    # Sheet rows count the header as row 1
+    return rows, {(2, "OC BOYS"): "invalid_cutoff", (3, "Branch Name"): "missing_value",
+                  (4, "Place"): "inconsistent_institute", (5, "Branch Code"): "duplicate_branch"}
+
+@pytest.mark.parametrize("dry_run", [False, True])
+def test_invalid_upload_is_rejected_with_an_annotated_report(fresh_app, dry_run):
+    before = copy.deepcopy(fresh_app.get_colleges_data())
+    generation = fresh_app.data_generation
+    frame, expected = broken_frame(fresh_app)
+
+    job = upload_frame(fresh_app, frame, dry_run=dry_run)
+    assert job["status"] == "failed" and "nothing was changed" in job["message"]
+    validation = job["validation"]
+    assert validation["errors"] == len(expected) and not validation["truncated"]
+    assert {(issue["row"], issue["column"]): issue["rule"] for issue in validation["issues"]} == expected
+    assert fresh_app.get_colleges_data() == before and fresh_app.data_generation == generation
+
+    report = admin_client(fresh_app).get(f"/admin/jobs/{job['id']}/report")
+    assert report.status_code == 200
+    issues = pd.read_excel(io.BytesIO(report.data), sheet_name="Issues")
+    assert len(issues) == len(expected)
+    annotated = pd.read_excel(io.BytesIO(report.data), sheet_name=0)
+    assert annotated["Issues"].notna().tolist() == [True] * len(expected)
+
+def test_dry_run_reports_the_changes_without_making_them(fresh_app):
+    before = copy.deepcopy(fresh_app.get_colleges_data())
+    generation = fresh_app.data_generation
+    frame = catalog_frame(fresh_app)
+    rows = frame[frame["Inst Code"] == before["institutes"][2]["inst_code"]].copy()
+    rows.iloc[0, rows.columns.get_loc("OC GIRLS")] = 2
+
+    job = upload_frame(fresh_app, rows, dry_run=True)
+    assert job["status"] == "succeeded" and job["dry_run"]
+    assert job["message"].startswith("Dry run passed")
+    assert "institutes 0 added, 1 updated, 0 removed" in job["message"]
+    # Girls closing ahead of boys is only a warning; it gets a report but does not block
+    assert job["validation"]["errors"] == 0 and job["validation"]["rules"] == {"cutoff_order": 1}
+    assert job["report"]
+    assert fresh_app.get_colleges_data() == before and fresh_app.data_generation == generation
+
+    job = upload_frame(fresh_app, rows)
+    assert job["status"] == "succeeded"
+    assert fresh_app.get_colleges_data()["institutes"][2]["branches"][0]["cutoffs"]["OC_GIRLS"] == 2
+    assert fresh_app.data_generation > generation
+
+def test_jobs_are_shared_between_workers(fresh_app, monkeypatch):
+    # A second module over the same directory stands in for another worker process
+    other = load_app(fresh_app.workdir, catalog=False)
+    monkeypatch.chdir(fresh_app.workdir)
+    frame, expected = broken_frame(fresh_app)
+
+    job = upload_frame(fresh_app, frame, reader=other)
+    assert job["status"] == "failed" and job["phase"] == "done"
+    assert job["validation"]["errors"] == len(expected) and job["report"]
+    assert admin_client(other).get(f"/admin/jobs/{job['id']}").get_json() == job
+    report = admin_client(other).get(f"/admin/jobs/{job['id']}/report")
+    assert report.status_code == 200 and len(pd.read_excel(io.BytesIO(report.data), sheet_name="Issues")) == len(expected)
+    assert admin_client(other).get("/admin/jobs/../../etc").status_code == 404
+
+    # Old finished jobs are pruned along with their reports, whichever worker ran them
+    monkeypatch.setattr(other, "MAX_INGEST_JOBS", 1)
+    second = upload_frame(other, frame.head(1), dry_run=True, reader=fresh_app)
+    assert [listed["id"] for listed in admin_client(fresh_app).get("/admin/jobs").get_json()["jobs"]] == [second["id"]]
+    assert admin_client(fresh_app).get(f"/admin/jobs/{job['id']}/report").status_code == 404
+    assert not os.path.exists(os.path.join(fresh_app.workdir, other.validation_report_path(job["id"])))